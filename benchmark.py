@@ -0,0 +1,181 @@
+"""benchmark
+throughput and latency of the component methods against a local simulator
+
+Starts an openbts.simulator.NodeManagerSimulator and times every public
+component method against it.  Save a run as a baseline and compare later runs
+to it to catch performance regressions before a release:
+
+  $ python benchmark.py --save baseline.json
+  $ python benchmark.py --compare baseline.json --tolerance 0.2
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+
+from openbts.components import OpenBTS, SIPAuthServe, SMQueue
+from openbts.core import SocketPool
+from openbts.experimental import ExperimentalSMQueue
+from openbts.simulator import NodeManagerSimulator
+
+
+def percentile(samples, percent):
+  """Gets a percentile of sorted samples (nearest rank)."""
+  index = int(round((len(samples) - 1) * percent / 100.0))
+  return samples[index]
+
+
+def measure(operation, iterations):
+  """Calls operation repeatedly, timing each call.
+
+  Returns:
+    dict of ops per second and latency percentiles in milliseconds
+  """
+  latencies = []
+  start = time.time()
+  for i in range(iterations):
+    call_start = time.time()
+    operation(i)
+    latencies.append(time.time() - call_start)
+  elapsed = time.time() - start
+  latencies.sort()
+  return {
+    'ops_per_second': iterations / elapsed,
+    'p50_ms': percentile(latencies, 50) * 1000,
+    'p99_ms': percentile(latencies, 99) * 1000,
+  }
+
+
+def benchmarks(address, pool, batch_size):
+  """Builds the (name, operation) pairs to time.
+
+  Each operation takes the iteration number, so that operations that create
+  state (e.g. subscribers) can use unique values.
+  """
+  kwargs = {'address': address, 'socket_pool': pool, 'codec': 'auto'}
+  openbts = OpenBTS(**kwargs)
+  sipauthserve = SIPAuthServe(**kwargs)
+  pipelined = SIPAuthServe(pipelined=True, **kwargs)
+  smqueue = SMQueue(**kwargs)
+  messages = ExperimentalSMQueue(**kwargs)
+  pipelined_messages = ExperimentalSMQueue(pipelined=True, **kwargs)
+  cached = OpenBTS(config_cache_ttl=60, **kwargs)
+  config_keys = ['Sim.Key%s' % i for i in range(batch_size)]
+  imsis = itertools.count(10 ** 12)
+
+  def create_and_delete(i):
+    imsi = next(imsis)
+    sipauthserve.create_subscriber('bench', imsi, imsi)
+    sipauthserve.delete_subscriber(imsi)
+
+  def bulk_create_and_delete(component):
+    def operation(i):
+      batch = [('bench', imsi, imsi)
+               for imsi in itertools.islice(imsis, batch_size)]
+      component.create_subscribers(batch)
+      component.delete_subscribers(batch)
+    return operation
+
+  def submit_and_purge(i):
+    recipient = 'bench%s' % i
+    messages.submit_message('101', recipient, 'hello')
+    messages.purge_messages(match={'to': recipient})
+
+  def bulk_submit_and_purge(i):
+    recipient = 'bulk%s' % i
+    pipelined_messages.submit_messages(
+      ('101', recipient, 'hello') for _ in range(batch_size))
+    pipelined_messages.purge_messages(match={'to': recipient})
+
+  # the message reads list a queue of batch_size messages, which the other
+  # message benchmarks leave alone
+  pipelined_messages.submit_messages(
+    ('101', 'queued', 'hello') for _ in range(batch_size))
+
+  return [
+    ('get_version', lambda i: smqueue.get_version()),
+    ('read_config', lambda i: openbts.read_config('GSM.Radio.C0')),
+    ('read_config (cached)', lambda i: cached.read_config('GSM.Radio.C0')),
+    ('read_config_value', lambda i: openbts.read_config_value('GSM.Radio.C0')),
+    ('update_config', lambda i: openbts.update_config('Log.Alarms.Max', i)),
+    ('read_configs x%s' % batch_size,
+     lambda i: openbts.read_configs(config_keys)),
+    ('snapshot', lambda i: openbts.snapshot()),
+    ('apply_config', lambda i: openbts.apply_config({'Log.Alarms.Max': i})),
+    ('monitor', lambda i: openbts.monitor()),
+    ('monitor_sample', lambda i: openbts.monitor_sample()),
+    ('get_subscribers', lambda i: sipauthserve.get_subscribers()),
+    ('iter_subscribers',
+     lambda i: sum(1 for _ in sipauthserve.iter_subscribers())),
+    ('create_subscriber + delete_subscriber', create_and_delete),
+    ('create_subscribers + delete_subscribers x%s' % batch_size,
+     bulk_create_and_delete(sipauthserve)),
+    ('create_subscribers + delete_subscribers x%s (pipelined)' % batch_size,
+     bulk_create_and_delete(pipelined)),
+    ('get_messages', lambda i: messages.get_messages()),
+    ('iter_messages', lambda i: sum(1 for _ in messages.iter_messages())),
+    ('count_messages', lambda i: messages.count_messages()),
+    ('get_message', lambda i: messages.get_message('1')),
+    ('submit_message + purge_messages', submit_and_purge),
+    ('submit_messages + purge_messages x%s (pipelined)' % batch_size,
+     bulk_submit_and_purge),
+  ]
+
+
+def compare(results, baseline, tolerance):
+  """Lists the benchmarks whose throughput fell by more than tolerance."""
+  regressions = []
+  for name, result in results.items():
+    if name not in baseline:
+      continue
+    before = baseline[name]['ops_per_second']
+    after = result['ops_per_second']
+    if after < before * (1 - tolerance):
+      regressions.append('%s: %.0f -> %.0f ops/s' % (name, before, after))
+  return regressions
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+  parser.add_argument('--address', default='tcp://127.0.0.1:7990')
+  parser.add_argument('--iterations', type=int, default=200)
+  parser.add_argument('--batch-size', type=int, default=50)
+  parser.add_argument('--latency', type=float, default=0,
+                      help='simulated NodeManager latency in seconds')
+  parser.add_argument('--subscriber-count', type=int, default=1000)
+  parser.add_argument('--save', help='write the results to this json file')
+  parser.add_argument('--compare', help='baseline json file to compare to')
+  parser.add_argument('--tolerance', type=float, default=0.2,
+                      help='allowed fractional drop in throughput')
+  args = parser.parse_args()
+
+  simulator = NodeManagerSimulator(
+    args.address, latency=args.latency, config_size=args.batch_size,
+    subscriber_count=args.subscriber_count, seed=0)
+  pool = SocketPool()
+  results = {}
+  with simulator:
+    print('%-56s %10s %9s %9s' % ('benchmark', 'ops/s', 'p50 ms', 'p99 ms'))
+    for name, operation in benchmarks(args.address, pool, args.batch_size):
+      result = results[name] = measure(operation, args.iterations)
+      print('%-56s %10.0f %9.3f %9.3f' % (name, result['ops_per_second'],
+                                          result['p50_ms'], result['p99_ms']))
+  pool.clear()
+
+  if args.save:
+    with open(args.save, 'w') as f:
+      json.dump(results, f, indent=2, sort_keys=True)
+  if args.compare:
+    with open(args.compare) as f:
+      regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+      print('\nregressions:')
+      for regression in regressions:
+        print('  %s' % regression)
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,329 @@
+"""openbts.aio
+asyncio variants of the components
+
+Each class here behaves like its counterpart in openbts.components, but every
+NodeManager request is a coroutine that returns the same Response objects:
+
+  bts = AsyncOpenBTS()
+  response = await bts.monitor()
+
+Batches (create_subscribers, delete_subscribers, submit_messages) are sent
+one request at a time and awaited as a whole, and iter_subscribers and
+iter_messages are async generators:
+
+  async for subscriber in AsyncSIPAuthServe().iter_subscribers():
+    ...
+
+apply_config and watch are not available and raise NotImplementedError:
+a rollback must not be interleaved with other requests on the component,
+and a watcher polls from a thread of its own.
+
+Requires Python 3 and pyzmq's zmq.asyncio support.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+import zmq
+import zmq.asyncio
+
+from openbts.components import OpenBTS, SIPAuthServe, SMQueue
+from openbts.core import (BaseComponent, BatchReport, Response, SocketPool,
+                          _config_value, _request_kind, iter_response_data)
+from openbts.exceptions import (InvalidRequestError, InvalidResponseError,
+                                OpenBTSError, TimeoutError)
+from openbts.experimental import ExperimentalSMQueue
+from openbts.monitoring import flatten_sample
+from openbts.results import ConfigValue, MonitorSample, Subscriber
+from openbts.snapshot import ConfigSnapshot
+from openbts.tracing import RequestTrace
+
+
+_socket_pool = None
+_socket_pool_pid = None
+_socket_pool_lock = threading.Lock()
+
+def get_async_socket_pool():
+  """Gets the process-wide SocketPool of asyncio sockets.
+
+  Returns:
+    SocketPool instance built on zmq.asyncio.Context.instance()
+  """
+  global _socket_pool, _socket_pool_pid
+  with _socket_pool_lock:
+    if _socket_pool is None or _socket_pool_pid != os.getpid():
+      _socket_pool = SocketPool(context=zmq.asyncio.Context.instance())
+      _socket_pool_pid = os.getpid()
+    return _socket_pool
+
+
+class AsyncBaseComponent(BaseComponent):
+  """Manages an asyncio zeromq connection.
+
+  Requests on one component are serialised with a lock, as the REQ socket
+  allows only one outstanding request; use one component per node to poll
+  many nodes concurrently from a single event loop.
+
+  Kwargs:
+    same as BaseComponent, except that pipelined, config_cache_ttl and
+    thread_safe are not supported
+  """
+
+  def __init__(self, **kwargs):
+    if kwargs.pop('pipelined', False):
+      raise ValueError('pipelined transport is not available on async '
+                       'components')
+    if kwargs.pop('config_cache_ttl', None) is not None:
+      raise ValueError('config caching is not available on async components')
+    if kwargs.pop('thread_safe', False):
+      raise ValueError('thread-safe mode is not available on async '
+                       'components')
+    kwargs.setdefault('socket_pool', get_async_socket_pool())
+    super(AsyncBaseComponent, self).__init__(**kwargs)
+    self._lock = asyncio.Lock()
+
+  async def _send_and_receive(self, message, raw=False):
+    """Sending payloads to NM and returning Response instances.
+
+    The asyncio counterpart of BaseComponent._send_and_receive, with the same
+    timeout, reconnect, retry and circuit breaking behavior.
+
+    Args:
+      message: dict of a message to send to NM
+      raw: if True, return the raw reply unparsed and unchecked
+
+    Returns:
+      Response instance (or the raw reply) if the request succeeded
+
+    Raises:
+      TimeoutError: if nothing is received for the timeout, or if the
+          endpoint's circuit is open
+    """
+    async with self._lock:
+      trace = RequestTrace(message) if self.hooks else None
+      attempt = 0
+      while True:
+        if self.health and not self.health.allow():
+          error = TimeoutError('circuit open for %s' % self.address)
+          self._finish_trace(trace, None, error)
+          raise error
+        payload = self.codec.dumps(message)
+        if not isinstance(payload, bytes):
+          payload = payload.encode('utf-8')
+        if trace:
+          trace.mark('encode')
+          trace.attempts += 1
+        await self.socket.send(payload)
+        if trace:
+          trace.mark('send')
+        self._awaiting_reply = True
+        sent_at = time.time()
+        responses = await self.socket.poll(
+          timeout=self._request_timeout(message) * 1000)
+        if trace:
+          trace.mark('wait')
+        if responses:
+          raw_response_data = await self.socket.recv()
+          if self.health:
+            self.health.record_success(time.time() - sent_at,
+                                       _request_kind(message))
+          if trace:
+            trace.mark('recv')
+          self._awaiting_reply = False
+          if raw:
+            self._finish_trace(trace)
+            return raw_response_data
+          try:
+            response = Response(raw_response_data, self.codec)
+          except OpenBTSError as e:
+            self._finish_trace(trace, 'parse', e)
+            raise
+          self._finish_trace(trace, 'parse')
+          return response
+        if self.health:
+          self.health.record_failure()
+        if self.address:
+          self._reset_socket()
+        if not self.address or attempt >= self.retries:
+          error = TimeoutError('did not receive a response')
+          self._finish_trace(trace, None, error)
+          raise error
+        await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+        if trace:
+          trace.mark('backoff')
+        attempt += 1
+
+  async def read_config_value(self, key):
+    """Reads a config value into a compact ConfigValue, see read_config."""
+    return ConfigValue.from_response(key, await self.read_config(key))
+
+  async def read_configs(self, keys, max_in_flight=64):
+    """Reads many config values, one after another.
+
+    Args:
+      keys: iterable of config parameters to inspect
+      max_in_flight: ignored, the requests share one REQ socket
+
+    Returns:
+      dict mapping each key to its Response, or to the exception raised for
+      it (e.g. InvalidRequestError if the key does not exist)
+    """
+    results = {}
+    for key in keys:
+      if key in results:
+        continue
+      try:
+        results[key] = await self.read_config(key)
+      except OpenBTSError as e:
+        results[key] = e
+    return results
+
+  async def snapshot(self, keys=None):
+    """Copies the config into a ConfigSnapshot, see BaseComponent.snapshot."""
+    try:
+      response = await self._send_and_receive(self._read_config_message(''))
+      return ConfigSnapshot.from_response_data(response.data, self.address)
+    except InvalidRequestError:
+      if keys is None:
+        raise
+    except (ValueError, KeyError, AttributeError) as e:
+      if keys is None:
+        raise InvalidResponseError('unexpected config dump: %s' % e)
+    values = {}
+    for key, result in (await self.read_configs(keys)).items():
+      if not isinstance(result, Exception):
+        values[key] = _config_value(result.data)
+    return ConfigSnapshot(values, self.address)
+
+  def apply_config(self, changes, max_in_flight=64):
+    """Not available on async components, use a synchronous one.
+
+    Raises:
+      NotImplementedError
+    """
+    raise NotImplementedError('config transactions are not available on '
+                              'async components')
+
+  def watch(self, keys, callback, **kwargs):
+    """Not available on async components, use a synchronous one.
+
+    Raises:
+      NotImplementedError
+    """
+    raise NotImplementedError('watching config is not available on async '
+                              'components')
+
+  async def _send_batch(self, records, build_message, max_in_flight=64,
+                        callback=None):
+    """Sends records one after another and summarises the results.
+
+    The asyncio counterpart of BaseComponent._send_batch.
+
+    Args:
+      records: iterable of input records
+      build_message: callable turning a record into a message dict; should
+          raise ValueError, KeyError, IndexError or TypeError on bad records
+      max_in_flight: ignored, the requests share one REQ socket
+      callback: optional callable invoked as callback(record, result) for
+          every record, where result is a Response or an exception
+
+    Returns:
+      BatchReport instance
+    """
+    report = BatchReport()
+    for record in records:
+      try:
+        message = build_message(record)
+      except (ValueError, KeyError, IndexError, TypeError) as e:
+        result = InvalidRequestError('malformed record: %s' % e)
+      else:
+        try:
+          result = await self._send_and_receive(message)
+        except OpenBTSError as e:
+          result = e
+      report.add(record, result)
+      if callback:
+        callback(record, result)
+    return report
+
+  async def _pipeline(self, messages, max_in_flight=64, raw=False):
+    """Sends payloads one after another, yielding results as they arrive.
+
+    The asyncio counterpart of BaseComponent._pipeline, an async generator.
+
+    Yields:
+      (index, result) tuples, where result is a Response or OpenBTSError
+      instance
+    """
+    for index, message in enumerate(messages):
+      try:
+        yield index, await self._send_and_receive(message, raw=raw)
+      except OpenBTSError as e:
+        yield index, e
+
+
+class AsyncOpenBTS(AsyncBaseComponent, OpenBTS):
+  """Manages asyncio communication to an OpenBTS instance.
+
+  Args:
+    address: tcp socket for the zmq connection
+  """
+
+  async def monitor_sample(self):
+    """Gets monitoring data as a compact MonitorSample, see monitor."""
+    response = await self.monitor()
+    return MonitorSample(flatten_sample(response.data or {}))
+
+
+class AsyncSIPAuthServe(AsyncBaseComponent, SIPAuthServe):
+  """Manages asyncio communication to the SIPAuthServe service.
+
+  Args:
+    address: tcp socket for the zmq connection
+  """
+
+  async def iter_subscribers(self, match=None, typed=False):
+    """Iterates over subscribers, see SIPAuthServe.iter_subscribers.
+
+    Yields:
+      subscriber dicts, or Subscribers if typed
+    """
+    message = self._read_subscribers_message(match)
+    raw_response_data = await self._send_and_receive(message, raw=True)
+    for subscriber in iter_response_data(raw_response_data):
+      yield Subscriber.from_dict(subscriber) if typed else subscriber
+
+
+class AsyncSMQueue(AsyncBaseComponent, SMQueue):
+  """Manages asyncio communication to the SMQueue service.
+
+  Args:
+    address: tcp socket for the zmq connection
+  """
+  pass
+
+
+class AsyncExperimentalSMQueue(AsyncBaseComponent, ExperimentalSMQueue):
+  """Asyncio variant of experimental.ExperimentalSMQueue.
+
+  Args:
+    address: tcp socket for the zmq connection
+  """
+
+  async def iter_messages(self, match=None):
+    """Iterates over queued messages, see get_messages.
+
+    Yields:
+      message dicts
+    """
+    message = self._messages_message('read', match)
+    raw_response_data = await self._send_and_receive(message, raw=True)
+    for queued_message in iter_response_data(raw_response_data):
+      yield queued_message
+
+  async def count_messages(self, match=None):
+    """Gets the depth of the queue, see get_messages."""
+    response = await self.get_messages(match)
+    return len(response.data or [])
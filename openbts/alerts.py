@@ -0,0 +1,191 @@
+"""openbts.alerts
+threshold and rate-of-change alerting on monitor data
+"""
+
+import collections
+import threading
+import time
+
+from openbts.exceptions import OpenBTSError
+from openbts.monitoring import flatten_sample
+
+
+class Rule(object):
+  """A condition on one monitor field.
+
+  The rule is breached when the field's value is above/below a threshold, or
+  when its rate of change (units per second, from the previous sample of the
+  same node) is above/below a threshold.  Any combination of thresholds can
+  be given; the rule is breached if any of them is crossed.
+
+  Args:
+    name: name of the rule, passed along with its alerts
+    field: the flattened monitor field, e.g. 'noiseRSSI'
+
+  Kwargs:
+    above: breach when the value is greater than this
+    below: breach when the value is less than this
+    rate_above: breach when the value rises faster than this per second
+    rate_below: breach when the value changes slower than this per second,
+        e.g. -5 to catch drops of more than 5 per second
+    for_ticks: number of consecutive breached samples before the rule fires,
+        to debounce noisy fields (default 1)
+  """
+
+  def __init__(self, name, field, above=None, below=None, rate_above=None,
+               rate_below=None, for_ticks=1):
+    self.name = name
+    self.field = field
+    self.above = above
+    self.below = below
+    self.rate_above = rate_above
+    self.rate_below = rate_below
+    self.for_ticks = for_ticks
+
+  def __repr__(self):
+    return 'Rule %s on %s' % (self.name, self.field)
+
+  def breached(self, value, rate):
+    """Checks a value, and its rate of change if known, against the rule."""
+    if self.above is not None and value > self.above:
+      return True
+    if self.below is not None and value < self.below:
+      return True
+    if rate is not None:
+      if self.rate_above is not None and rate > self.rate_above:
+        return True
+      if self.rate_below is not None and rate < self.rate_below:
+        return True
+    return False
+
+
+class Alert(object):
+  """A rule that started or stopped firing on a node.
+
+  Attributes:
+    rule: the Rule
+    node: the node the sample came from, e.g. its address
+    value: the field value that triggered the change
+    timestamp: unix time of the sample
+    resolved: False when the rule starts firing, True when it recovers
+  """
+
+  def __init__(self, rule, node, value, timestamp, resolved=False):
+    self.rule = rule
+    self.node = node
+    self.value = value
+    self.timestamp = timestamp
+    self.resolved = resolved
+
+  def __repr__(self):
+    state = 'resolved' if self.resolved else 'firing'
+    return 'Alert %s %s on %s (%s=%s)' % (self.rule.name, state, self.node,
+                                          self.rule.field, self.value)
+
+
+class AlertEngine(object):
+  """Evaluates rules against monitor samples from many nodes.
+
+  Evaluation is incremental: rules are indexed by field, so a sample only
+  costs one dict lookup per field plus the rules on the fields it carries,
+  and the per-node state needed for rates and debouncing is updated in place.
+  The callback fires once when a rule starts firing on a node and once when
+  it resolves, not on every breached sample.  Samples may be evaluated from
+  many threads at once, e.g. from several attached pollers.
+
+  Args:
+    rules: iterable of Rules
+    callback: callable invoked with an Alert on every change of state
+  """
+
+  def __init__(self, rules, callback):
+    self.callback = callback
+    self._rules_by_field = collections.defaultdict(list)
+    for rule in rules:
+      self._rules_by_field[rule.field].append(rule)
+    # (node, field) -> (previous value, previous timestamp)
+    self._previous = {}
+    # (node, rule name) -> consecutive breached samples
+    self._breaches = collections.defaultdict(int)
+    self._firing = set()
+    self._lock = threading.Lock()
+
+  def firing(self):
+    """Gets the (node, rule name) pairs whose rules are currently firing."""
+    with self._lock:
+      return set(self._firing)
+
+  def evaluate(self, node, sample, timestamp=None):
+    """Checks one sample from one node against the rules.
+
+    Args:
+      node: the node the sample came from, e.g. its address
+      sample: dict mapping flattened field names to numbers
+      timestamp: unix time of the sample (defaults to now)
+    """
+    if timestamp is None:
+      timestamp = time.time()
+    alerts = []
+    with self._lock:
+      for field, value in sample.items():
+        rules = self._rules_by_field.get(field)
+        if not rules:
+          continue
+        previous = self._previous.get((node, field))
+        self._previous[(node, field)] = (value, timestamp)
+        rate = None
+        if previous is not None and timestamp > previous[1]:
+          rate = (value - previous[0]) / float(timestamp - previous[1])
+        for rule in rules:
+          alert = self._update(rule, node, value, rate, timestamp)
+          if alert is not None:
+            alerts.append(alert)
+    # call back outside the lock, so callbacks may use the engine
+    for alert in alerts:
+      self.callback(alert)
+
+  def evaluate_responses(self, results, timestamp=None):
+    """Checks monitor results from many nodes, e.g. from Fleet.monitor.
+
+    Results that are exceptions (failed or timed out polls) are skipped.
+
+    Args:
+      results: iterable of (node, result) tuples, where result is a monitor
+          Response or an exception
+      timestamp: unix time of the samples (defaults to now)
+    """
+    for node, result in results:
+      if isinstance(result, OpenBTSError):
+        continue
+      self.evaluate(node, flatten_sample(result.data or {}), timestamp)
+
+  def attach(self, poller, node):
+    """Evaluates every sample recorded by a MonitorPoller.
+
+    Args:
+      poller: MonitorPoller instance
+      node: the name to report the poller's samples under
+    """
+    poller.add_listener(
+      lambda sample, timestamp: self.evaluate(node, sample, timestamp))
+
+  def _update(self, rule, node, value, rate, timestamp):
+    """Updates the debounce state of one rule on one node.
+
+    Must be called with the lock held.
+
+    Returns:
+      the Alert to report if the rule changed state, else None
+    """
+    key = (node, rule.name)
+    if rule.breached(value, rate):
+      self._breaches[key] += 1
+      if self._breaches[key] >= rule.for_ticks and key not in self._firing:
+        self._firing.add(key)
+        return Alert(rule, node, value, timestamp)
+    else:
+      self._breaches.pop(key, None)
+      if key in self._firing:
+        self._firing.discard(key)
+        return Alert(rule, node, value, timestamp, resolved=True)
+    return None
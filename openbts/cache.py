@@ -0,0 +1,117 @@
+"""openbts.cache
+caching of config reads
+"""
+
+import collections
+import threading
+import time
+
+
+class ConfigCache(object):
+  """A size-bounded LRU cache of config read responses with a TTL.
+
+  Entries older than ttl seconds are treated as misses.  When the cache holds
+  max_size entries, adding one evicts the least recently used entry.  The
+  cache may be shared by threads (see BaseComponent's thread_safe mode).
+
+  Args:
+    ttl: seconds an entry stays valid
+    max_size: max number of entries
+    clock: callable returning the current time in seconds
+
+  Attributes:
+    hits: number of lookups answered from the cache
+    misses: number of lookups that were not cached or had expired
+    evictions: number of entries dropped to make room for new ones
+  """
+
+  def __init__(self, ttl=30, max_size=256, clock=time.time):
+    self.ttl = ttl
+    self.max_size = max_size
+    self.clock = clock
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._entries = collections.OrderedDict()
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self._entries)
+
+  def __contains__(self, key):
+    entry = self._entries.get(key)
+    return entry is not None and self.clock() < entry[0]
+
+  def get(self, key):
+    """Gets a cached response, counting the hit or miss.
+
+    Args:
+      key: the config key
+
+    Returns:
+      the cached Response instance, or None
+    """
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None or self.clock() >= entry[0]:
+        if entry is not None:
+          del self._entries[key]
+        self.misses += 1
+        return None
+      # move the key to the most recently used end
+      del self._entries[key]
+      self._entries[key] = entry
+      self.hits += 1
+      return entry[1]
+
+  def peek(self, key):
+    """Gets a cached response without counting a hit or miss or touching the
+    LRU order.
+
+    Args:
+      key: the config key
+
+    Returns:
+      the cached Response instance, or None
+    """
+    entry = self._entries.get(key)
+    if entry is None or self.clock() >= entry[0]:
+      return None
+    return entry[1]
+
+  def put(self, key, response):
+    """Caches a response.
+
+    Args:
+      key: the config key
+      response: the Response instance to cache
+    """
+    with self._lock:
+      self._entries.pop(key, None)
+      while len(self._entries) >= self.max_size:
+        self._entries.popitem(last=False)
+        self.evictions += 1
+      self._entries[key] = (self.clock() + self.ttl, response)
+
+  def invalidate(self, key):
+    """Drops a key from the cache, if present."""
+    with self._lock:
+      self._entries.pop(key, None)
+
+  def clear(self):
+    """Drops every entry."""
+    with self._lock:
+      self._entries.clear()
+
+  def stats(self):
+    """Gets the cache counters.
+
+    Returns:
+      dict with 'hits', 'misses', 'evictions' and 'size' keys
+    """
+    return {
+      'hits': self.hits,
+      'misses': self.misses,
+      'evictions': self.evictions,
+      'size': len(self._entries)
+    }
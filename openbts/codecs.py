@@ -0,0 +1,103 @@
+"""openbts.codecs
+pluggable json serializers for NodeManager messages
+"""
+
+import json
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+try:
+  import ujson
+except ImportError:
+  ujson = None
+
+
+class JSONCodec(object):
+  """Encodes and decodes messages with the standard library json module.
+
+  Args:
+    encoding: if set, messages are encoded to bytes with this encoding, as
+        zmq sockets require on Python 3
+  """
+
+  def __init__(self, encoding=None):
+    self.encoding = encoding
+    self.name = 'json-%s' % encoding if encoding else 'json'
+
+  def dumps(self, message):
+    if self.encoding:
+      return json.dumps(message).encode(self.encoding)
+    return json.dumps(message)
+
+  def loads(self, raw_data):
+    return json.loads(raw_data)
+
+
+class OrjsonCodec(object):
+  """Encodes and decodes messages with orjson, if it is installed."""
+
+  name = 'orjson'
+
+  def dumps(self, message):
+    return orjson.dumps(message)
+
+  def loads(self, raw_data):
+    return orjson.loads(raw_data)
+
+
+class UjsonCodec(object):
+  """Encodes and decodes messages with ujson, if it is installed."""
+
+  name = 'ujson'
+
+  def dumps(self, message):
+    payload = ujson.dumps(message)
+    if not isinstance(payload, bytes):
+      payload = payload.encode('utf-8')
+    return payload
+
+  def loads(self, raw_data):
+    return ujson.loads(raw_data)
+
+
+_codecs = {'json': JSONCodec(), 'json-utf8': JSONCodec('utf-8')}
+if orjson is not None:
+  _codecs['orjson'] = OrjsonCodec()
+if ujson is not None:
+  _codecs['ujson'] = UjsonCodec()
+
+default_codec = _codecs['json']
+
+
+def get_codec(codec=None):
+  """Looks up a codec.
+
+  The 'auto' codec is the fastest installed codec that encodes messages to
+  bytes, so it also works on Python 3.
+
+  Args:
+    codec: None for the stdlib json codec, a codec name ('json', 'json-utf8',
+        'orjson' or 'ujson'), 'auto' for the fastest installed codec, or a
+        codec object with dumps and loads methods
+
+  Returns:
+    codec object
+
+  Raises:
+    ValueError if the named codec is unknown or not installed
+  """
+  if codec is None:
+    return default_codec
+  if codec == 'auto':
+    for name in ('orjson', 'ujson', 'json-utf8'):
+      if name in _codecs:
+        return _codecs[name]
+  if hasattr(codec, 'dumps') and hasattr(codec, 'loads'):
+    return codec
+  try:
+    return _codecs[codec]
+  except KeyError:
+    raise ValueError('codec "%s" is unknown or not installed' % codec)
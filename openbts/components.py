@@ -2,18 +2,22 @@
 manages components in the OpenBTS application suite
 """
 
-from openbts.core import BaseComponent
+from openbts.core import BaseComponent, iter_response_data
+from openbts.monitoring import flatten_sample
+from openbts.results import MonitorSample, Subscriber
 
 class OpenBTS(BaseComponent):
   """Manages communication to an OpenBTS instance.
 
   Args:
     address: tcp socket for the zmq connection
+
+  Kwargs:
+    passed through to BaseComponent, e.g. socket_timeout
   """
 
-  def __init__(self, address='tcp://127.0.0.1:45060'):
-    super(OpenBTS, self).__init__()
-    self.socket.connect(address)
+  def __init__(self, address='tcp://127.0.0.1:45060', **kwargs):
+    super(OpenBTS, self).__init__(address=address, **kwargs)
 
   def __repr__(self):
     return 'OpenBTS component'
@@ -26,13 +30,28 @@ class OpenBTS(BaseComponent):
     Returns:
       Response instance
     """
-    message = {
+    return self._send_and_receive(self._monitor_message())
+
+  def monitor_sample(self):
+    """Gets monitoring data as a compact MonitorSample.
+
+    Nested fields are flattened into dotted names, and non-numeric fields are
+    dropped.
+
+    Returns:
+      results.MonitorSample instance
+    """
+    response = self.monitor()
+    return MonitorSample(flatten_sample(response.data or {}))
+
+  def _monitor_message(self):
+    """Builds the message sent by monitor."""
+    return {
       'command': 'monitor',
       'action': '',
       'key': '',
       'value': ''
     }
-    return self._send_and_receive(message)
 
 
 class SIPAuthServe(BaseComponent):
@@ -40,30 +59,54 @@ class SIPAuthServe(BaseComponent):
 
   Args:
     address: tcp socket for the zmq connection
+
+  Kwargs:
+    passed through to BaseComponent, e.g. socket_timeout
   """
 
-  def __init__(self, address='tcp://127.0.0.1:45064'):
-    super(SIPAuthServe, self).__init__()
-    self.socket.connect(address)
+  def __init__(self, address='tcp://127.0.0.1:45064', **kwargs):
+    super(SIPAuthServe, self).__init__(address=address, **kwargs)
 
   def __repr__(self):
     return 'SIPAuthServe component'
 
-  def get_subscribers(self):
+  def get_subscribers(self, match=None):
     """Gets all subscribers.
 
+    Args:
+      match: optional dict of subscriber fields (e.g. {'imsi': '...'}) that
+          NodeManager should filter the subscribers by
+
     Returns:
       Response instance
     """
-    message = {
-      'command': 'subscribers',
-      'action': 'read',
-      'key': '',
-      'value': ''
-    }
+    message = self._read_subscribers_message(match)
     response = self._send_and_receive(message)
     return response
 
+  def iter_subscribers(self, match=None, typed=False):
+    """Iterates over subscribers, decoding them one at a time.
+
+    The subscriber table still arrives in one reply, but it is decoded
+    incrementally rather than parsed into one big list up front.  The request
+    is sent when iteration starts.
+
+    Args:
+      match: optional dict of subscriber fields (e.g. {'imsi': '...'}) that
+          NodeManager should filter the subscribers by
+      typed: if True, yield compact results.Subscriber objects
+
+    Yields:
+      subscriber dicts, or Subscribers if typed
+
+    Raises:
+      the same errors as get_subscribers
+    """
+    message = self._read_subscribers_message(match)
+    raw_response_data = self._send_and_receive(message, raw=True)
+    for subscriber in iter_response_data(raw_response_data):
+      yield Subscriber.from_dict(subscriber) if typed else subscriber
+
   def create_subscriber(self, name, imsi, msisdn, ki=''):
     """Add a subscriber.
 
@@ -80,16 +123,7 @@ class SIPAuthServe(BaseComponent):
     Returns:
       Response instance
     """
-    message = {
-      'command': 'subscribers',
-      'action': 'create',
-      'fields': {
-        'name': name,
-        'imsi': str(imsi),
-        'msisdn': str(msisdn),
-        'ki': str(ki)
-      }
-    }
+    message = self._create_subscriber_message(name, imsi, msisdn, ki)
     response = self._send_and_receive(message)
     return response
 
@@ -102,15 +136,116 @@ class SIPAuthServe(BaseComponent):
     Returns:
       Response instance
     """
+    message = self._delete_subscriber_message(imsi)
+    response = self._send_and_receive(message)
+    return response
+
+  def create_subscribers(self, records, max_in_flight=64, callback=None):
+    """Add many subscribers, streaming them from an iterable.
+
+    Records may be (name, imsi, msisdn[, ki]) tuples, rows from csv.reader in
+    that column order, or dicts (e.g. rows from csv.DictReader) with 'name',
+    'imsi', 'msisdn' and optionally 'ki' keys.  Records are read lazily, so a
+    generator over a large file is never loaded into memory.  Use a
+    pipelined component to keep up to max_in_flight requests outstanding.
+
+    Args:
+      records: iterable of subscriber records
+      max_in_flight: max number of outstanding requests
+      callback: optional callable invoked as callback(record, result) for
+          every record, where result is a Response or an exception
+
+    Returns:
+      BatchReport instance
+    """
+    def build_message(record):
+      return self._create_subscriber_message(*self._subscriber_fields(record))
+    return self._send_batch(records, build_message, max_in_flight, callback)
+
+  def delete_subscribers(self, records, max_in_flight=64, callback=None):
+    """Delete many subscribers by IMSI, streaming them from an iterable.
+
+    Records may be bare IMSIs, one-column rows holding just the IMSI (e.g.
+    from csv.reader over a list of IMSIs), or any record accepted by
+    create_subscribers, so the same file can be used to provision and
+    deprovision a batch.
+
+    Args:
+      records: iterable of IMSIs or subscriber records
+      max_in_flight: max number of outstanding requests
+      callback: optional callable invoked as callback(record, result) for
+          every record, where result is a Response or an exception
+
+    Returns:
+      BatchReport instance
+    """
+    def build_message(record):
+      if isinstance(record, dict):
+        return self._delete_subscriber_message(record['imsi'])
+      if isinstance(record, (list, tuple)):
+        if len(record) == 1:
+          return self._delete_subscriber_message(record[0])
+        return self._delete_subscriber_message(
+          self._subscriber_fields(record)[1])
+      return self._delete_subscriber_message(record)
+    return self._send_batch(records, build_message, max_in_flight, callback)
+
+  @staticmethod
+  def _subscriber_fields(record):
+    """Turns a subscriber record into a (name, imsi, msisdn, ki) tuple.
+
+    Args:
+      record: (name, imsi, msisdn[, ki]) sequence or a dict with those keys
+
+    Returns:
+      tuple of strings
+
+    Raises:
+      KeyError, IndexError or TypeError if the record is malformed
+    """
+    if isinstance(record, dict):
+      fields = (record['name'], record['imsi'], record['msisdn'],
+                record.get('ki') or '')
+    elif 3 <= len(record) <= 4:
+      fields = tuple(record) + ('',) * (4 - len(record))
+    else:
+      raise TypeError('expected 3 or 4 fields, got %s' % len(record))
+    return tuple(str(field) for field in fields)
+
+  def _read_subscribers_message(self, match=None):
+    """Builds the message sent by get_subscribers and iter_subscribers."""
     message = {
+      'command': 'subscribers',
+      'action': 'read',
+      'key': '',
+      'value': ''
+    }
+    if match:
+      message['match'] = dict((k, str(v)) for k, v in match.items())
+    return message
+
+  def _create_subscriber_message(self, name, imsi, msisdn, ki=''):
+    """Builds the message sent by create_subscriber."""
+    return {
+      'command': 'subscribers',
+      'action': 'create',
+      'fields': {
+        'name': name,
+        'imsi': str(imsi),
+        'msisdn': str(msisdn),
+        'ki': str(ki)
+      }
+    }
+
+  def _delete_subscriber_message(self, imsi):
+    """Builds the message sent by delete_subscriber."""
+    return {
       'command': 'subscribers',
       'action': 'delete',
       'match': {
         'imsi': str(imsi)
       }
     }
-    response = self._send_and_receive(message)
-    return response
 
 
 class SMQueue(BaseComponent):
@@ -118,11 +253,13 @@ class SMQueue(BaseComponent):
 
   Args:
     address: tcp socket for the zmq connection
+
+  Kwargs:
+    passed through to BaseComponent, e.g. socket_timeout
   """
 
-  def __init__(self, address='tcp://127.0.0.1:45063'):
-    super(SMQueue, self).__init__()
-    self.socket.connect(address)
+  def __init__(self, address='tcp://127.0.0.1:45063', **kwargs):
+    super(SMQueue, self).__init__(address=address, **kwargs)
 
   def __repr__(self):
     return 'SMQueue component'
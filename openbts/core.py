@@ -2,29 +2,304 @@
 defines the base component and responses
 """
 
+import collections
+import itertools
 import json
+import os
+import re
+import threading
+import time
 
 import zmq
 
-from openbts.exceptions import (InvalidRequestError, InvalidResponseError,
+from openbts.cache import ConfigCache
+from openbts.codecs import default_codec, get_codec
+from openbts.exceptions import (ConfigTransactionError, InvalidRequestError,
+                                InvalidResponseError, OpenBTSError,
                                 TimeoutError)
+from openbts.health import EndpointHealth, get_endpoint_health
+from openbts.results import ConfigValue
+from openbts.snapshot import ConfigSnapshot
+from openbts.tracing import RequestTrace
+from openbts.watch import ConfigWatcher
+
+class SocketPool(object):
+  """Keeps idle zmq sockets that are already connected to an address.
+
+  Components check a socket out when they are created and check it back in
+  when they are closed, so building many short-lived components reuses a few
+  connections on one context instead of creating a new context each time.
+
+  Args:
+    context: zmq.Context used to create new sockets (defaults to the
+        process-wide zmq.Context.instance())
+    max_idle: number of idle sockets kept per address, extras are closed
+  """
+
+  def __init__(self, context=None, max_idle=8):
+    self.context = context or zmq.Context.instance()
+    self.max_idle = max_idle
+    self._idle = collections.defaultdict(list)
+    self._lock = threading.Lock()
+
+  def checkout(self, address, socket_type=zmq.REQ):
+    """Gets an idle socket connected to the address, or makes a new one.
+
+    Args:
+      address: tcp socket for the zmq connection
+      socket_type: zmq socket type, e.g. zmq.REQ
+
+    Returns:
+      a connected zmq socket
+    """
+    with self._lock:
+      idle = self._idle.get((address, socket_type))
+      if idle:
+        return idle.pop()
+    socket = self.context.socket(socket_type)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(address)
+    return socket
+
+  def checkin(self, address, socket, socket_type=zmq.REQ):
+    """Returns a socket to the pool.
+
+    The socket must not be waiting on a reply.  If the pool already holds
+    max_idle sockets for this address, the socket is closed instead.
+
+    Args:
+      address: the address the socket is connected to
+      socket: the zmq socket to return
+      socket_type: zmq socket type, e.g. zmq.REQ
+    """
+    with self._lock:
+      idle = self._idle[(address, socket_type)]
+      if len(idle) < self.max_idle:
+        idle.append(socket)
+        return
+    socket.close()
+
+  def clear(self):
+    """Closes every idle socket in the pool."""
+    with self._lock:
+      idle, self._idle = self._idle, collections.defaultdict(list)
+    for sockets in idle.values():
+      for socket in sockets:
+        socket.close()
+
+
+# ids tagging pipelined requests; shared by every component so that a late
+# reply on a reused DEALER socket never matches a newer request
+_request_ids = itertools.count()
+
+_socket_pool = None
+_socket_pool_pid = None
+_socket_pool_lock = threading.Lock()
+
+def get_socket_pool():
+  """Gets the process-wide SocketPool, creating it on first use.
+
+  zmq contexts cannot be shared across a fork, so a child process gets its own
+  pool (and context) the first time it asks for one.
+
+  Returns:
+    SocketPool instance
+  """
+  global _socket_pool, _socket_pool_pid
+  with _socket_pool_lock:
+    if _socket_pool is None or _socket_pool_pid != os.getpid():
+      _socket_pool = SocketPool()
+      _socket_pool_pid = os.getpid()
+    return _socket_pool
+
+
+class _SocketState(object):
+  """A component's socket and whether it is waiting on a reply."""
+
+  __slots__ = ('socket', 'pooled_socket', 'awaiting_reply')
+
+  def __init__(self, socket):
+    self.socket = socket
+    # the socket checked out of the pool, None once it has been released
+    self.pooled_socket = socket
+    self.awaiting_reply = False
+
+
+def _state_property(name):
+  """Exposes a _SocketState field as an attribute of the component."""
+  def get(self):
+    return getattr(self._socket_state(), name)
+  def set(self, value):
+    setattr(self._socket_state(), name, value)
+  return property(get, set)
+
+
+def _request_kind(message):
+  """Gets the kind of request health.EndpointHealth tracks latencies under."""
+  return (message.get('command'), message.get('action'))
+
+
+def _is_dump(message):
+  """Checks whether a message reads a whole table or config, not one key."""
+  return message.get('action') == 'read' and not message.get('key')
+
+
+def _config_value(data):
+  """Gets the value out of the data of a config read response."""
+  if isinstance(data, dict):
+    return data.get('value')
+  return data
+
 
 class BaseComponent(object):
   """Manages a zeromq connection.
 
   The intent is to create other components that inherit from this base class.
+  Sockets are created on a shared zmq context and, when an address is given,
+  checked out of a shared SocketPool.  Call close (or use the component as a
+  context manager) to hand the socket back for reuse.
+
+  zmq sockets must not be used by two threads at once.  A component created
+  with thread_safe=True can be shared between threads: each thread that uses
+  it transparently checks out its own socket, and sockets of threads that
+  have exited are returned to the pool.
 
   Kwargs:
+    address: tcp socket for the zmq connection; if omitted, the caller should
+        connect self.socket itself
     socket_timeout: time in seconds to wait on self.socket.recv before raising
         a TimeoutError
+    socket_pool: SocketPool to draw sockets from (defaults to the process-wide
+        pool)
+    retries: number of times to resend a request that timed out (default 0)
+    retry_backoff: seconds to wait before the first retry, doubled for each
+        subsequent retry
+    pipelined: if True, use a DEALER socket that can have many requests in
+        flight at once (see _pipeline) instead of a lockstep REQ socket
+    config_cache_ttl: if set, cache read_config responses for this many
+        seconds (see self.config_cache)
+    config_cache_size: max number of keys kept in the config cache
+    stats: optional metrics.ClientStats to record every request in; it is
+        added to the hooks
+    hooks: list of callables invoked with a tracing.RequestTrace after every
+        request (see self.hooks); with no hooks, no timings are taken
+    codec: json codec for messages and replies, see codecs.get_codec; the
+        stdlib json module is used by default
+    health: a health.EndpointHealth enabling adaptive timeouts and circuit
+        breaking, or True to share the process-wide one for the address
+        (see health.get_endpoint_health); off by default
+    thread_safe: if True, give every thread its own socket; requires address
   """
 
+  socket = _state_property('socket')
+  _pooled_socket = _state_property('pooled_socket')
+  _awaiting_reply = _state_property('awaiting_reply')
+
   def __init__(self, **kwargs):
-    context = zmq.Context()
-    # the component inheriting from BaseComponent should call connect on this
-    # socket with the appropriate address
-    self.socket = context.socket(zmq.REQ)
+    # kept so that helpers like watch can build a component of their own
+    self._kwargs = dict(kwargs)
+    self.address = kwargs.pop('address', None)
     self.socket_timeout = kwargs.pop('socket_timeout', 10)
+    self.socket_pool = kwargs.pop('socket_pool', None) or get_socket_pool()
+    self.retries = kwargs.pop('retries', 0)
+    self.retry_backoff = kwargs.pop('retry_backoff', 0.5)
+    self.pipelined = kwargs.pop('pipelined', False)
+    self.socket_type = zmq.DEALER if self.pipelined else zmq.REQ
+    self.stats = kwargs.pop('stats', None)
+    self.codec = get_codec(kwargs.pop('codec', None))
+    self.hooks = list(kwargs.pop('hooks', []))
+    if self.stats is not None:
+      self.hooks.append(self.stats)
+    self.health = kwargs.pop('health', None)
+    if self.health is True:
+      self.health = (get_endpoint_health(self.address) if self.address
+                     else EndpointHealth())
+    cache_ttl = kwargs.pop('config_cache_ttl', None)
+    cache_size = kwargs.pop('config_cache_size', 256)
+    self.config_cache = None
+    if cache_ttl is not None:
+      self.config_cache = ConfigCache(ttl=cache_ttl, max_size=cache_size)
+    self.thread_safe = kwargs.pop('thread_safe', False)
+    self._thread_states = {}
+    self._thread_states_lock = threading.Lock()
+    if self.thread_safe:
+      if not self.address:
+        raise ValueError('thread-safe components need an address')
+      self._local = threading.local()
+    else:
+      self._local = None
+      self._state = self._open_socket_state()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def __del__(self):
+    try:
+      self.close()
+    except Exception:
+      pass
+
+  def close(self):
+    """Releases the component's socket, or every thread's socket.
+
+    Pooled sockets are checked back in to the pool unless they are still
+    waiting on a reply, in which case they are closed.  A thread-safe
+    component checks out new sockets if it is used again.
+    """
+    if self._local is None:
+      self._release_socket_state(self._state)
+      return
+    with self._thread_states_lock:
+      states, self._thread_states = self._thread_states, {}
+      self._local = threading.local()
+    for state in states.values():
+      self._release_socket_state(state)
+
+  def _open_socket_state(self):
+    """Checks out a socket and wraps it in a _SocketState."""
+    if self.address:
+      socket = self.socket_pool.checkout(self.address, self.socket_type)
+    else:
+      # without an address the caller should call connect on this socket
+      socket = self.socket_pool.context.socket(self.socket_type)
+    return _SocketState(socket)
+
+  def _release_socket_state(self, state):
+    """Checks a state's socket back in to the pool, or closes it."""
+    socket, state.pooled_socket = state.pooled_socket, None
+    if socket is None:
+      return
+    in_use = socket is state.socket and state.awaiting_reply
+    if self.address and not in_use:
+      self.socket_pool.checkin(self.address, socket, self.socket_type)
+    else:
+      socket.close()
+
+  def _socket_state(self):
+    """Gets the _SocketState of the calling thread."""
+    if self._local is None:
+      return self._state
+    try:
+      return self._local.state
+    except AttributeError:
+      pass
+    state = self._local.state = self._open_socket_state()
+    current = threading.current_thread()
+    alive = set(thread.ident for thread in threading.enumerate())
+    stale = []
+    with self._thread_states_lock:
+      # idents of exited threads may be reused, so also release the state a
+      # previous thread left under this one's ident
+      for ident in list(self._thread_states):
+        if ident not in alive or ident == current.ident:
+          stale.append(self._thread_states.pop(ident))
+      self._thread_states[current.ident] = state
+    for old_state in stale:
+      self._release_socket_state(old_state)
+    return state
 
   def create_config(self, key, value):
     """Create a config parameter and initialize it.
@@ -45,6 +320,10 @@ class BaseComponent(object):
   def read_config(self, key):
     """Reads a config value.
 
+    If the component has a config cache, a fresh cached response is returned
+    without contacting NodeManager.  Responses flagged dirty are not cached,
+    as the value changes when the component restarts.
+
     Args:
       key: the config parameter to inspect
 
@@ -54,17 +333,152 @@ class BaseComponent(object):
     Raises:
       InvalidRequestError if the key does not exist
     """
-    message = {
+    if self.config_cache is not None:
+      response = self.config_cache.get(key)
+      if response is not None:
+        return response
+    response = self._send_and_receive(self._read_config_message(key))
+    if self.config_cache is not None and not response.dirty:
+      self.config_cache.put(key, response)
+    return response
+
+  def read_config_value(self, key):
+    """Reads a config value into a compact ConfigValue.
+
+    Args:
+      key: the config parameter to inspect
+
+    Returns:
+      results.ConfigValue instance
+
+    Raises:
+      InvalidRequestError if the key does not exist
+    """
+    return ConfigValue.from_response(key, self.read_config(key))
+
+  def read_configs(self, keys, max_in_flight=64):
+    """Reads many config values.
+
+    On a pipelined component the reads are in flight concurrently; otherwise
+    they are sent one after another.  The config cache, if any, is used as in
+    read_config.
+
+    Args:
+      keys: iterable of config parameters to inspect
+      max_in_flight: max number of outstanding requests
+
+    Returns:
+      dict mapping each key to its Response, or to the exception raised for
+      it (e.g. InvalidRequestError if the key does not exist)
+    """
+    results = {}
+    to_read = []
+    seen = set()
+    for key in keys:
+      if key in seen:
+        continue
+      seen.add(key)
+      cached = None
+      if self.config_cache is not None:
+        cached = self.config_cache.get(key)
+      if cached is not None:
+        results[key] = cached
+      else:
+        to_read.append(key)
+    messages = (self._read_config_message(key) for key in to_read)
+    for index, result in self._pipeline(messages, max_in_flight):
+      key = to_read[index]
+      results[key] = result
+      if (self.config_cache is not None and
+          not isinstance(result, Exception) and not result.dirty):
+        self.config_cache.put(key, result)
+    return results
+
+  def snapshot(self, keys=None):
+    """Copies the component's config into a ConfigSnapshot.
+
+    The whole config is fetched with a single empty-key read.  If NodeManager
+    rejects that and keys are given, those keys are read with read_configs
+    instead (keys that fail are left out of the snapshot).
+
+    Args:
+      keys: optional iterable of keys to fall back to
+
+    Returns:
+      ConfigSnapshot instance
+
+    Raises:
+      InvalidRequestError if the full read is rejected and no keys are given
+      InvalidResponseError if the full read returns something unexpected and
+          no keys are given
+    """
+    try:
+      response = self._send_and_receive(self._read_config_message(''))
+      return ConfigSnapshot.from_response_data(response.data, self.address)
+    except InvalidRequestError:
+      if keys is None:
+        raise
+    except (ValueError, KeyError, AttributeError) as e:
+      if keys is None:
+        raise InvalidResponseError('unexpected config dump: %s' % e)
+    values = {}
+    for key, result in self.read_configs(keys).items():
+      if not isinstance(result, Exception):
+        values[key] = _config_value(result.data)
+    return ConfigSnapshot(values, self.address)
+
+  def watch(self, keys, callback, **kwargs):
+    """Watches config keys for changes in a background thread.
+
+    Keys are polled adaptively, backing off while they stay the same, and
+    read together with as few requests as possible (see ConfigWatcher).
+
+    zmq sockets must not be shared between threads, so unless this component
+    is thread-safe the watcher polls through a thread-safe copy of it (same
+    class, address and kwargs), which is closed when the watcher stops.
+
+    Args:
+      keys: iterable of config keys to watch
+      callback: callable invoked with a dict mapping each changed key to an
+          (old value, new value) tuple
+
+    Kwargs:
+      passed to ConfigWatcher, e.g. interval, max_interval or backoff
+
+    Returns:
+      the started ConfigWatcher; call its stop method to stop watching
+
+    Raises:
+      ValueError if the component is not thread-safe and has no address
+    """
+    component = self
+    if not self.thread_safe:
+      if not self.address:
+        raise ValueError('watching needs a thread-safe component or an '
+                         'address to connect a copy to')
+      component = type(self)(**dict(self._kwargs, thread_safe=True))
+    watcher = ConfigWatcher(component, keys, callback,
+                            close_component=component is not self, **kwargs)
+    watcher.start()
+    return watcher
+
+  def _read_config_message(self, key):
+    """Builds the message sent by read_config."""
+    return {
       'command': 'config',
       'action': 'read',
       'key': key,
       'value': ''
     }
-    return self._send_and_receive(message)
 
   def update_config(self, key, value):
     """Updates a config value.
 
+    If the component has a config cache, a cached read of the key is updated
+    with the new value.  The key is dropped from the cache instead if the
+    update is dirty (only takes effect on restart) or if it is unclear
+    whether the update was applied.
+
     Args:
       key: the config parameter to update
       value: set the config parameter to this value
@@ -75,14 +489,109 @@ class BaseComponent(object):
     Raises:
       InvalidRequestError if the key does not exist
     """
-    message = {
+    message = self._update_config_message(key, value)
+    try:
+      response = self._send_and_receive(message)
+    except (InvalidResponseError, TimeoutError):
+      if self.config_cache is not None:
+        self.config_cache.invalidate(key)
+      raise
+    if self.config_cache is not None:
+      self._write_through(key, str(value), response)
+    return response
+
+  def apply_config(self, changes, max_in_flight=64):
+    """Updates many config values as one transaction.
+
+    The original values are read first, bypassing the config cache, then the
+    updates are sent (in flight concurrently on a pipelined component).  If
+    any update fails, no further updates are sent and every key that may have
+    changed is set back to its original value, again concurrently.
+
+    Args:
+      changes: dict or iterable of (key, value) pairs
+      max_in_flight: max number of outstanding requests
+
+    Returns:
+      ConfigChangeReport instance; its dirty attribute lists the keys that
+      only take effect once the component is restarted
+
+    Raises:
+      InvalidRequestError if reading an original value fails (nothing has
+          been changed at that point)
+      ConfigTransactionError if an update fails; the changes were rolled back
+    """
+    if isinstance(changes, dict):
+      changes = changes.items()
+    changes = [(key, str(value)) for key, value in changes]
+    report = ConfigChangeReport()
+    # the originals bypass the config cache, a stale value would be restored
+    # over a newer one on rollback
+    keys = []
+    for key, _ in changes:
+      if key not in keys:
+        keys.append(key)
+    messages = (self._read_config_message(key) for key in keys)
+    for index, result in self._pipeline(messages, max_in_flight):
+      if isinstance(result, Exception):
+        raise result
+      report.original[keys[index]] = _config_value(result.data)
+
+    sent = []
+    failures = []
+    def updates():
+      for key, value in changes:
+        # stop sending once something has failed
+        if failures:
+          return
+        sent.append(key)
+        yield self._update_config_message(key, value)
+    for index, result in self._pipeline(updates(), max_in_flight):
+      key = changes[index][0]
+      if isinstance(result, Exception):
+        failures.append((key, result))
+      else:
+        report.responses[key] = result
+    if self.config_cache is not None:
+      for key in sent:
+        self.config_cache.invalidate(key)
+    if not failures:
+      return report
+
+    # rejected updates did not change anything, everything else is reverted
+    rejected = set(key for key, error in failures
+                   if isinstance(error, InvalidRequestError))
+    to_revert = [key for key in sent if key not in rejected]
+    reverts = (self._update_config_message(key, report.original[key])
+               for key in to_revert)
+    for index, result in self._pipeline(reverts, max_in_flight):
+      if isinstance(result, Exception):
+        report.rollback_errors[to_revert[index]] = result
+      else:
+        report.rolled_back.append(to_revert[index])
+    key, cause = failures[0]
+    raise ConfigTransactionError('updating %s failed (%s), changes rolled back'
+                                 % (key, cause), key, cause, report)
+
+  def _update_config_message(self, key, value):
+    """Builds the message sent by update_config."""
+    return {
       'command': 'config',
       'action': 'update',
       'key': key,
       'value': str(value)
     }
-    response = self._send_and_receive(message)
-    return response
+
+  def _write_through(self, key, value, update_response):
+    """Updates the cached read of a key after a successful update."""
+    cached = self.config_cache.peek(key)
+    if (update_response.dirty or cached is None or
+        not isinstance(cached.data, dict)):
+      self.config_cache.invalidate(key)
+      return
+    data = dict(cached.data, value=value)
+    self.config_cache.put(key, Response.from_data(cached.code, data,
+                                                  cached.dirty))
 
   def delete_config(self, key):
     """Deletes a config value.
@@ -105,39 +614,361 @@ class BaseComponent(object):
     Returns:
       Response instance
     """
-    message = {
+    response = self._send_and_receive(self._version_message())
+    return response
+
+  def _version_message(self):
+    """Builds the message sent by get_version."""
+    return {
       'command': 'version',
       'action': '',
       'key': '',
       'value': ''
     }
-    response = self._send_and_receive(message)
-    return response
 
-  def _send_and_receive(self, message):
+  def _send_and_receive(self, message, raw=False):
     """Sending payloads to NM and returning Response instances.
 
     Or, if the action failed, an error will be raised during the instantiation
     of the Response.  Can also timeout if the socket receives no data for some
-    period.
+    period.  After a timeout the socket is replaced (see _reset_socket) so the
+    component stays usable, and the request is resent up to self.retries
+    times.
 
     Args:
       message: dict of a message to send to NM
+      raw: if True, return the raw reply unparsed and unchecked
 
     Returns:
-      Response instance if the request succeeded
+      Response instance (or the raw reply) if the request succeeded
 
     Raises:
-      TimeoutError: if nothing is received for the timeout
-    """
-    # send the message and poll for responses
-    self.socket.send(json.dumps(message))
-    responses = self.socket.poll(timeout=self.socket_timeout * 1000)
-    if responses:
-      raw_response_data = self.socket.recv()
-      return Response(raw_response_data)
+      TimeoutError: if nothing is received for the timeout, or if the
+          endpoint's circuit is open (see self.health)
+    """
+    if self.pipelined:
+      _, result = next(self._pipeline([message], raw=raw))
+      if isinstance(result, Exception):
+        raise result
+      return result
+    trace = RequestTrace(message) if self.hooks else None
+    attempt = 0
+    while True:
+      if self.health and not self.health.allow():
+        error = TimeoutError('circuit open for %s' % self.address)
+        self._finish_trace(trace, None, error)
+        raise error
+      # send the message and poll for responses
+      payload = self.codec.dumps(message)
+      if trace:
+        trace.mark('encode')
+        trace.attempts += 1
+      self.socket.send(payload)
+      if trace:
+        trace.mark('send')
+      self._awaiting_reply = True
+      sent_at = time.time()
+      responses = self.socket.poll(
+        timeout=self._request_timeout(message) * 1000)
+      if trace:
+        trace.mark('wait')
+      if responses:
+        raw_response_data = self.socket.recv()
+        if self.health:
+          self.health.record_success(time.time() - sent_at,
+                                     _request_kind(message))
+        if trace:
+          trace.mark('recv')
+        self._awaiting_reply = False
+        if raw:
+          self._finish_trace(trace)
+          return raw_response_data
+        try:
+          response = Response(raw_response_data, self.codec)
+        except OpenBTSError as e:
+          self._finish_trace(trace, 'parse', e)
+          raise
+        self._finish_trace(trace, 'parse')
+        return response
+      if self.health:
+        self.health.record_failure()
+      # we can only rebuild sockets for components that know their address
+      if self.address:
+        self._reset_socket()
+      if not self.address or attempt >= self.retries:
+        error = TimeoutError('did not receive a response')
+        self._finish_trace(trace, None, error)
+        raise error
+      time.sleep(self.retry_backoff * 2 ** attempt)
+      if trace:
+        trace.mark('backoff')
+      attempt += 1
+
+  def _request_timeout(self, message):
+    """Gets the seconds to wait on a reply, adapted if self.health is set.
+
+    Listings and full config reads always get the full socket_timeout, as
+    their replies grow with the data on the node.
+    """
+    if self.health and not _is_dump(message):
+      return self.health.timeout(self.socket_timeout, _request_kind(message))
+    return self.socket_timeout
+
+  def _finish_trace(self, trace, phase=None, error=None):
+    """Marks the last phase of a trace and hands it to the hooks.
+
+    Args:
+      trace: the RequestTrace, or None if the component has no hooks
+      phase: the phase that just ended, if any
+      error: the exception raised for the request, if any
+    """
+    if trace is None:
+      return
+    if phase:
+      trace.mark(phase)
+    trace.error = error
+    for hook in self.hooks:
+      hook(trace)
+
+  def _reset_socket(self):
+    """Replaces a REQ socket that is stuck waiting on a reply.
+
+    A REQ socket that timed out refuses to send again, so it is closed without
+    lingering and a fresh socket is checked out of the pool.  The shared
+    context (and its I/O thread) is left alone.
+    """
+    stale = self.socket
+    stale.setsockopt(zmq.LINGER, 0)
+    stale.close()
+    # if self.socket was swapped out, the original pooled socket is still good
+    if self._pooled_socket is not None and self._pooled_socket is not stale:
+      self.socket_pool.checkin(self.address, self._pooled_socket,
+                               self.socket_type)
+    self.socket = self.socket_pool.checkout(self.address, self.socket_type)
+    self._pooled_socket = self.socket
+    self._awaiting_reply = False
+
+  def _send_batch(self, records, build_message, max_in_flight=64,
+                  callback=None):
+    """Streams records through _pipeline and summarises the results.
+
+    Records are pulled from the iterable lazily, so at most max_in_flight of
+    them (plus the failures) are held at once.  A record that build_message
+    cannot turn into a message is counted as failed without being sent.
+
+    Args:
+      records: iterable of input records
+      build_message: callable turning a record into a message dict; should
+          raise ValueError, KeyError, IndexError or TypeError on bad records
+      max_in_flight: max number of outstanding requests
+      callback: optional callable invoked as callback(record, result) for
+          every record, where result is a Response or an exception
+
+    Returns:
+      BatchReport instance
+    """
+    report = BatchReport()
+    in_flight = {}
+    sent = itertools.count()
+
+    def record_result(record, result):
+      report.add(record, result)
+      if callback:
+        callback(record, result)
+
+    def messages():
+      for record in records:
+        try:
+          message = build_message(record)
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+          record_result(record, InvalidRequestError('malformed record: %s' % e))
+          continue
+        # _pipeline numbers messages in the order they are yielded
+        in_flight[next(sent)] = record
+        yield message
+
+    for index, result in self._pipeline(messages(), max_in_flight):
+      record_result(in_flight.pop(index), result)
+    return report
+
+  def _pipeline(self, messages, max_in_flight=64, raw=False):
+    """Sends many payloads to NM, yielding results as the replies arrive.
+
+    On a pipelined (DEALER) component up to max_in_flight requests are kept
+    outstanding at once.  Each is sent as [request id, '', payload] and NM's
+    REP socket echoes the id back, so replies are matched to requests in
+    whatever order they arrive.  Replies to requests that already timed out
+    are dropped.  On a REQ component the messages are sent one at a time.
+
+    Errors do not stop the batch: a failed request yields the exception
+    instance that _send_and_receive would have raised.  While the endpoint's
+    circuit is open (see self.health) messages fail fast without being sent.
+    The generator should be consumed before the component is used for
+    anything else; closing it with requests outstanding records a failure
+    with self.health.
+
+    Args:
+      messages: iterable of message dicts, consumed lazily
+      max_in_flight: max number of outstanding requests
+      raw: if True, yield raw replies rather than Response instances
+
+    Yields:
+      (index, result) tuples, where index is the position of the message in
+      the messages iterable and result is a Response or OpenBTSError instance
+    """
+    if not self.pipelined:
+      for index, message in enumerate(messages):
+        try:
+          yield index, self._send_and_receive(message, raw=raw)
+        except OpenBTSError as e:
+          yield index, e
+      return
+
+    messages = enumerate(messages)
+    pending = {}
+    exhausted = False
+    try:
+      while True:
+        # top up the window of outstanding requests
+        while not exhausted and len(pending) < max_in_flight:
+          allowed = not self.health or self.health.allow()
+          # wait for outstanding replies to settle a half-open circuit
+          if not allowed and pending:
+            break
+          try:
+            index, message = next(messages)
+          except StopIteration:
+            exhausted = True
+            break
+          trace = RequestTrace(message) if self.hooks else None
+          if not allowed:
+            error = TimeoutError('circuit open for %s' % self.address)
+            self._finish_trace(trace, None, error)
+            yield index, error
+            continue
+          request_id = str(next(_request_ids)).encode('ascii')
+          payload = self.codec.dumps(message)
+          if trace:
+            trace.mark('encode')
+            trace.attempts += 1
+          self.socket.send_multipart([request_id, b'', payload])
+          if trace:
+            trace.mark('send')
+          pending[request_id] = (index, trace, time.time(),
+                                 _request_kind(message),
+                                 self._request_timeout(message))
+        self._awaiting_reply = bool(pending)
+        if not pending:
+          return
+        # wait as long as the slowest kind of request outstanding allows
+        wait = max(request[4] for request in pending.values())
+        if not self.socket.poll(timeout=wait * 1000):
+          if self.health:
+            self.health.record_failure()
+          for index, trace, _, _, _ in sorted(pending.values(),
+                                              key=lambda r: r[0]):
+            error = TimeoutError('did not receive a response')
+            self._finish_trace(trace, 'wait', error)
+            yield index, error
+          pending.clear()
+          continue
+        frames = self.socket.recv_multipart()
+        request = pending.pop(frames[0], None)
+        if request is None:
+          continue
+        index, trace, sent_at, kind, _ = request
+        if self.health:
+          self.health.record_success(time.time() - sent_at, kind)
+        if trace:
+          trace.mark('wait')
+        if raw:
+          self._finish_trace(trace)
+          yield index, frames[-1]
+          continue
+        try:
+          result = Response(frames[-1], self.codec)
+        except OpenBTSError as e:
+          result = e
+        self._finish_trace(trace, 'parse',
+                           result if isinstance(result, Exception) else None)
+        yield index, result
+    finally:
+      # requests abandoned along with the generator never got their reply,
+      # which also frees a half-open circuit for its next probe
+      if pending and self.health:
+        self.health.record_failure()
+
+
+class BatchReport(object):
+  """Summarises the results of a batch of requests.
+
+  Only failures are kept, so the report stays small however many records the
+  batch streams through.
+
+  Attributes:
+    succeeded: number of requests that succeeded
+    failed: number of records that failed
+    errors: list of (record, exception) tuples for the failed records
+  """
+
+  def __init__(self):
+    self.succeeded = 0
+    self.failed = 0
+    self.errors = []
+
+  def __repr__(self):
+    return 'BatchReport(succeeded=%s, failed=%s)' % (self.succeeded,
+                                                     self.failed)
+
+  @property
+  def total(self):
+    """Number of records processed."""
+    return self.succeeded + self.failed
+
+  def add(self, record, result):
+    """Records the outcome of one record.
+
+    Args:
+      record: the input record
+      result: Response instance or the exception raised for the record
+    """
+    if isinstance(result, Exception):
+      self.failed += 1
+      self.errors.append((record, result))
     else:
-      raise TimeoutError('did not receive a response')
+      self.succeeded += 1
+
+
+class ConfigChangeReport(object):
+  """Describes the outcome of BaseComponent.apply_config.
+
+  Attributes:
+    original: dict of the config values from before the changes
+    responses: dict mapping each successfully updated key to its Response
+    rolled_back: list of keys that were set back to their original values
+    rollback_errors: dict mapping keys that could not be set back to the
+        exception raised while reverting them
+  """
+
+  def __init__(self):
+    self.original = {}
+    self.responses = {}
+    self.rolled_back = []
+    self.rollback_errors = {}
+
+  def __repr__(self):
+    return 'ConfigChangeReport of %s updates' % len(self.responses)
+
+  @property
+  def dirty(self):
+    """Sorted list of updated keys that need a restart to take effect."""
+    return sorted(key for key, response in self.responses.items()
+                  if response.dirty)
+
+
+# NodeManager sorts its keys, so 'code' normally leads the reply
+_leading_code = re.compile(br'\s*\{\s*"code"\s*:\s*(-?\d+)\s*[,}]')
+_leading_code_text = re.compile(r'\s*\{\s*"code"\s*:\s*(-?\d+)\s*[,}]')
 
 
 class Response(object):
@@ -148,8 +979,14 @@ class Response(object):
   action).  We are tightly controlling the specified action, so we do not
   expect to encounter this error.
 
+  The response is parsed lazily: when the reply starts with its code, as
+  NodeManager's replies do, only the code is read up front and the rest of
+  the reply is decoded the first time data or dirty is accessed.  Other
+  replies are decoded immediately.
+
   Args:
     raw_response_data: json-encoded text received by zmq
+    codec: codec used to decode the reply (defaults to the stdlib json codec)
 
   Attributes:
     code: the response code (matches HTTP response code spec)
@@ -158,33 +995,164 @@ class Response(object):
         only when the component is restarted
   """
 
+  __slots__ = ('code', '_raw', '_codec', '_decoded')
+
   success_codes = [200, 304, 204]
   error_codes = [404, 406, 409, 500]
 
-  def __init__(self, raw_response_data):
-    data = json.loads(raw_response_data)
-    if 'code' not in data.keys():
-      raise InvalidResponseError('key "code" not in raw response: "%s"' %
-                                 raw_response_data)
-    # if the request was successful, create a response object and exit
-    if data['code'] in self.success_codes:
-      self.code = data['code']
-      self.data = data.get('data', None)
-      self.dirty = data.get('dirty', None)
-      return
+  def __init__(self, raw_response_data, codec=None):
+    self._raw = raw_response_data
+    self._codec = codec or default_codec
+    self._decoded = None
+    pattern = (_leading_code if isinstance(raw_response_data, bytes)
+               else _leading_code_text)
+    match = pattern.match(raw_response_data)
+    if match:
+      code = int(match.group(1))
+    else:
+      decoded = self._decode()
+      if 'code' not in decoded.keys():
+        raise InvalidResponseError('key "code" not in raw response: "%s"' %
+                                   raw_response_data)
+      code = decoded['code']
+    # if the request failed for some reason, this raises an error
+    self.check_code(code)
+    self.code = code
+
+  @property
+  def data(self):
+    return self._decode().get('data', None)
+
+  @property
+  def dirty(self):
+    return self._decode().get('dirty', None)
+
+  def _decode(self):
+    """Decodes the raw reply, once."""
+    if self._decoded is None:
+      try:
+        decoded = self._codec.loads(self._raw)
+      except ValueError:
+        raise InvalidResponseError('could not decode raw response: "%s"' %
+                                   self._raw)
+      if not isinstance(decoded, dict):
+        raise InvalidResponseError('raw response is not an object: "%s"' %
+                                   self._raw)
+      self._decoded = decoded
+      self._raw = None
+    return self._decoded
+
+  @classmethod
+  def from_data(cls, code, data=None, dirty=None):
+    """Builds a Response from already-decoded values.
 
-    # if the request failed for some reason, raise an error
-    if data['code'] in self.error_codes:
-      if data['code'] == 404:
-        raise InvalidRequestError('unknown key')
-      elif data['code'] == 406:
-        raise InvalidRequestError('invalid value')
-      elif data['code'] == 409:
+    Args:
+      code: a successful response code
+      data: the response data
+      dirty: the response's dirty flag
+
+    Returns:
+      Response instance
+    """
+    response = cls.__new__(cls)
+    response.code = code
+    response._raw = response._codec = None
+    response._decoded = {'code': code, 'data': data, 'dirty': dirty}
+    return response
+
+  @classmethod
+  def check_code(cls, code):
+    """Raises the error that corresponds to an unsuccessful response code.
+
+    Args:
+      code: the response code
+
+    Raises:
+      InvalidRequestError if NodeManager rejected the request
+      InvalidResponseError if the code is not known
+    """
+    if code in cls.success_codes:
+      return
+    if code in cls.error_codes:
+      if code == 404:
+        raise InvalidRequestError('unknown key', code)
+      elif code == 406:
+        raise InvalidRequestError('invalid value', code)
+      elif code == 409:
         # TODO(matt): if creating config values isn't possible, will we ever
         #             see the 409 code?
-        raise InvalidRequestError('conflicting value')
-      elif data['code'] == 500:
-        raise InvalidRequestError('storing new value failed')
+        raise InvalidRequestError('conflicting value', code)
+      elif code == 500:
+        raise InvalidRequestError('storing new value failed', code)
     # handle unknown response codes
     else:
-      raise InvalidResponseError('code "%s" not known' % data['code'])
+      raise InvalidResponseError('code "%s" not known' % code)
+
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'[ \t\n\r]*')
+
+def iter_response_data(raw_response_data):
+  """Yields the items of a response's data list one at a time.
+
+  Rather than decoding the whole reply, this walks the top-level object and
+  decodes the items of the 'data' list one by one, so large replies (e.g. a
+  full subscriber table) never exist as one big list of dicts.  NodeManager
+  sorts its keys, so 'code' is seen and checked before any item is decoded;
+  replies in any other layout fall back to a full Response parse.
+
+  Args:
+    raw_response_data: json-encoded text received by zmq
+
+  Yields:
+    the decoded items of the reply's data list
+
+  Raises:
+    the same errors as instantiating a Response
+  """
+  text = raw_response_data
+  if isinstance(text, bytes):
+    text = text.decode('utf-8')
+  skip = lambda index: _whitespace.match(text, index).end()
+  try:
+    index = skip(0)
+    if text[index] != '{':
+      raise ValueError('reply is not an object')
+    index = skip(index + 1)
+    code = None
+    while text[index] != '}':
+      key, index = _decoder.raw_decode(text, index)
+      index = skip(index)
+      if text[index] != ':':
+        raise ValueError('expected ":" at %s' % index)
+      index = skip(index + 1)
+      if key == 'data' and text[index] == '[' and code is not None:
+        break
+      value, index = _decoder.raw_decode(text, index)
+      if key == 'code':
+        code = value
+      index = skip(index)
+      if text[index] == ',':
+        index = skip(index + 1)
+    else:
+      # no data list came after the code
+      raise ValueError('no data list')
+  except (ValueError, IndexError):
+    data = Response(raw_response_data).data
+    if data is not None and not isinstance(data, list):
+      raise InvalidResponseError('data is not a list: "%s"' % data)
+    for item in data or []:
+      yield item
+    return
+
+  Response.check_code(code)
+  index = skip(index + 1)
+  while text[index] != ']':
+    try:
+      item, index = _decoder.raw_decode(text, index)
+      index = skip(index)
+      if text[index] == ',':
+        index = skip(index + 1)
+    except (ValueError, IndexError):
+      raise InvalidResponseError('malformed data list at %s' % index)
+    yield item
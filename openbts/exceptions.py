@@ -7,8 +7,15 @@ class OpenBTSError(Exception):
   pass
 
 class InvalidRequestError(OpenBTSError):
-  """Raised upon invalid requests to Node Manager."""
-  pass
+  """Raised upon invalid requests to Node Manager.
+
+  Attributes:
+    code: the NodeManager response code, if the error came from a response
+  """
+
+  def __init__(self, message='', code=None):
+    super(InvalidRequestError, self).__init__(message)
+    self.code = code
 
 class InvalidResponseError(OpenBTSError):
   """Invalid zmq response."""
@@ -17,3 +24,18 @@ class InvalidResponseError(OpenBTSError):
 class TimeoutError(OpenBTSError):
   """Zmq socket timeout."""
   pass
+
+class ConfigTransactionError(InvalidRequestError):
+  """A batch of config updates failed and was rolled back.
+
+  Attributes:
+    key: the config key whose update failed first
+    cause: the exception raised for that update
+    report: the ConfigChangeReport, including what was rolled back
+  """
+
+  def __init__(self, message, key=None, cause=None, report=None):
+    super(ConfigTransactionError, self).__init__(message)
+    self.key = key
+    self.cause = cause
+    self.report = report
@@ -0,0 +1,170 @@
+"""openbts.experimental
+client calls for commands that NodeManager does not document
+
+Nothing here is known to be answered by a real NodeManager; the calls follow
+an assumed protocol that only openbts.simulator implements.  They may change
+or go away without notice.
+"""
+
+from openbts.components import SMQueue
+from openbts.core import iter_response_data
+
+
+class ExperimentalSMQueue(SMQueue):
+  """An SMQueue component with experimental short message calls.
+
+  Queued short messages are handled with a 'messages' command modelled on
+  SIPAuthServe's 'subscribers' command: 'create' submits a message, 'read'
+  lists queued messages and 'delete' purges them.  Messages have 'id',
+  'from', 'to' and 'body' fields, and can be matched on any of them.  This
+  protocol is assumed rather than documented by NodeManager.
+
+  Args:
+    address: tcp socket for the zmq connection
+
+  Kwargs:
+    passed through to BaseComponent, e.g. socket_timeout
+  """
+
+  def __repr__(self):
+    return 'experimental SMQueue component'
+
+  def submit_message(self, sender, recipient, body):
+    """Queue a short message for delivery.
+
+    Args:
+      sender: MSISDN or short code the message is from
+      recipient: MSISDN the message is to
+      body: text of the message
+
+    Returns:
+      Response instance, whose data holds the id of the queued message
+    """
+    message = self._submit_message_message(sender, recipient, body)
+    response = self._send_and_receive(message)
+    return response
+
+  def submit_messages(self, records, max_in_flight=64, callback=None):
+    """Queue many short messages, streaming them from an iterable.
+
+    Records may be (sender, recipient, body) tuples, e.g. rows from
+    csv.reader, or dicts with 'sender', 'recipient' and 'body' keys.  Use a
+    pipelined component to keep up to max_in_flight submissions outstanding.
+
+    Args:
+      records: iterable of message records
+      max_in_flight: max number of outstanding requests
+      callback: optional callable invoked as callback(record, result) for
+          every record, where result is a Response or an exception
+
+    Returns:
+      BatchReport instance
+    """
+    def build_message(record):
+      if isinstance(record, dict):
+        return self._submit_message_message(
+          record['sender'], record['recipient'], record['body'])
+      if len(record) != 3:
+        raise TypeError('expected 3 fields, got %s' % len(record))
+      return self._submit_message_message(*record)
+    return self._send_batch(records, build_message, max_in_flight, callback)
+
+  def get_messages(self, match=None):
+    """Gets the queued messages.
+
+    Args:
+      match: optional dict of message fields (e.g. {'to': '...'}) that
+          NodeManager should filter the messages by
+
+    Returns:
+      Response instance
+    """
+    message = self._messages_message('read', match)
+    response = self._send_and_receive(message)
+    return response
+
+  def iter_messages(self, match=None):
+    """Iterates over queued messages, decoding them one at a time.
+
+    Args:
+      match: optional dict of message fields to filter by
+
+    Yields:
+      message dicts
+
+    Raises:
+      the same errors as get_messages
+    """
+    message = self._messages_message('read', match)
+    raw_response_data = self._send_and_receive(message, raw=True)
+    for queued_message in iter_response_data(raw_response_data):
+      yield queued_message
+
+  def get_message(self, message_id):
+    """Inspect one queued message.
+
+    Args:
+      message_id: id of the message
+
+    Returns:
+      Response instance, whose data is a list of the matching message
+    """
+    return self.get_messages(match={'id': message_id})
+
+  def count_messages(self, match=None):
+    """Gets the depth of the queue without keeping the messages around.
+
+    Args:
+      match: optional dict of message fields to filter by
+
+    Returns:
+      the number of queued messages
+    """
+    return sum(1 for _ in self.iter_messages(match))
+
+  def purge_messages(self, match=None, purge_all=False):
+    """Delete queued messages.
+
+    Either a match or purge_all=True is required, so that a missing match
+    never wipes the whole queue by accident.
+
+    Args:
+      match: dict of message fields to filter by
+      purge_all: if True, purge the whole queue
+
+    Returns:
+      Response instance
+
+    Raises:
+      ValueError if neither or both of match and purge_all are given
+    """
+    if bool(match) == bool(purge_all):
+      raise ValueError('purge_messages needs either a match or '
+                       'purge_all=True')
+    message = self._messages_message('delete', match)
+    response = self._send_and_receive(message)
+    return response
+
+  def _submit_message_message(self, sender, recipient, body):
+    """Builds the message sent by submit_message."""
+    return {
+      'command': 'messages',
+      'action': 'create',
+      'fields': {
+        'from': str(sender),
+        'to': str(recipient),
+        'body': body
+      }
+    }
+
+  def _messages_message(self, action, match=None):
+    """Builds the messages read and delete messages."""
+    message = {
+      'command': 'messages',
+      'action': action,
+      'key': '',
+      'value': ''
+    }
+    if match:
+      message['match'] = dict((k, str(v)) for k, v in match.items())
+    return message
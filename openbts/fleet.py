@@ -0,0 +1,187 @@
+"""openbts.fleet
+fan-out operations across many nodes
+"""
+
+import collections
+import time
+
+import zmq
+
+from openbts.core import Response, _request_kind
+from openbts.exceptions import OpenBTSError, TimeoutError
+
+
+class Fleet(object):
+  """Manages one component per node and sends them requests concurrently.
+
+  Each fan-out operation sends the same request to every node and then waits
+  on all of their sockets at once with a zmq.Poller.  Results are yielded as
+  they arrive, so a slow or dead node never holds up the others.  A node that
+  does not answer within its timeout yields a TimeoutError and has its socket
+  reset.  Fan-outs go straight to the sockets, bypassing any config cache.
+  Components created with health=True skip nodes whose circuit is open and
+  wait on each node for its adaptive timeout (see health.EndpointHealth).
+
+    fleet = Fleet(OpenBTS, ['tcp://10.0.0.1:45060', 'tcp://10.0.0.2:45060'])
+    for address, result in fleet.get_version(timeout=2):
+      ...
+
+  Args:
+    component_class: component class to create for each node, e.g. OpenBTS
+    addresses: iterable of tcp sockets, one per node
+
+  Kwargs:
+    passed to each component, e.g. socket_timeout (the default per-node
+    timeout); pipelined components are not supported
+  """
+
+  def __init__(self, component_class, addresses, **kwargs):
+    if kwargs.get('pipelined'):
+      raise ValueError('fleets do not support pipelined components')
+    self.components = collections.OrderedDict(
+      (address, component_class(address=address, **kwargs))
+      for address in addresses)
+
+  def __repr__(self):
+    return 'Fleet of %s nodes' % len(self)
+
+  def __len__(self):
+    return len(self.components)
+
+  def __iter__(self):
+    return iter(self.components.values())
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def close(self):
+    """Closes every component."""
+    for component in self.components.values():
+      component.close()
+
+  def get_version(self, timeout=None):
+    """Queries the version of every node.
+
+    Args:
+      timeout: seconds to wait on each node (defaults to the components'
+          socket_timeout)
+
+    Returns:
+      generator of (address, result) tuples in the order replies arrive,
+      where result is a Response or the exception raised for that node
+    """
+    return self._fan_out(lambda component: component._version_message(),
+                         timeout)
+
+  def read_config(self, key, timeout=None):
+    """Reads a config value on every node.
+
+    Args:
+      key: the config parameter to inspect
+      timeout: seconds to wait on each node
+
+    Returns:
+      generator of (address, result) tuples, see get_version
+    """
+    return self._fan_out(
+      lambda component: component._read_config_message(key), timeout)
+
+  def update_config(self, key, value, timeout=None):
+    """Updates a config value on every node.
+
+    Args:
+      key: the config parameter to update
+      value: set the config parameter to this value
+      timeout: seconds to wait on each node
+
+    Returns:
+      generator of (address, result) tuples, see get_version
+    """
+    return self._fan_out(
+      lambda component: component._update_config_message(key, value),
+      timeout)
+
+  def monitor(self, timeout=None):
+    """Gets monitoring data from every node of a fleet of OpenBTS components.
+
+    Args:
+      timeout: seconds to wait on each node
+
+    Returns:
+      generator of (address, result) tuples, see get_version
+    """
+    return self._fan_out(lambda component: component._monitor_message(),
+                         timeout)
+
+  def _fan_out(self, build_message, timeout=None):
+    """Sends a request to every node and yields the results as they arrive.
+
+    If the generator is closed early, the sockets still waiting on a reply
+    are reset so the components stay usable, and their requests are
+    recorded as failures with any health tracker.
+
+    Args:
+      build_message: callable returning the message dict for a component
+      timeout: seconds to wait on each node
+
+    Yields:
+      (address, result) tuples
+    """
+    poller = zmq.Poller()
+    # maps each waiting socket to its (address, component, sent_at, deadline,
+    # kind of request)
+    pending = {}
+    skipped = []
+    try:
+      # sending inside the try, so that if one node's send fails the nodes
+      # already sent to are reset below
+      for address, component in self.components.items():
+        if component.health and not component.health.allow():
+          skipped.append(address)
+          continue
+        message = build_message(component)
+        component.socket.send(component.codec.dumps(message))
+        sent_at = time.time()
+        component._awaiting_reply = True
+        poller.register(component.socket, zmq.POLLIN)
+        wait = (component._request_timeout(message) if timeout is None
+                else timeout)
+        pending[component.socket] = (address, component, sent_at,
+                                     sent_at + wait, _request_kind(message))
+      for address in skipped:
+        yield address, TimeoutError('circuit open for %s' % address)
+      while pending:
+        wait = min(request[3] for request in pending.values())
+        wait = max(0, wait - time.time())
+        for socket, _ in poller.poll(wait * 1000):
+          address, component, sent_at, _, kind = pending.pop(socket)
+          poller.unregister(socket)
+          raw_response_data = socket.recv()
+          component._awaiting_reply = False
+          if component.health:
+            component.health.record_success(time.time() - sent_at, kind)
+          try:
+            result = Response(raw_response_data, component.codec)
+          except OpenBTSError as e:
+            result = e
+          yield address, result
+        now = time.time()
+        for socket, (address, component, _, deadline, _) in list(
+            pending.items()):
+          if deadline <= now:
+            del pending[socket]
+            poller.unregister(socket)
+            if component.health:
+              component.health.record_failure()
+            component._reset_socket()
+            yield address, TimeoutError('did not receive a response')
+    finally:
+      # requests abandoned without a reply count as failures, which also
+      # frees a half-open circuit for its next probe
+      for _, component, _, _, _ in pending.values():
+        if component.health:
+          component.health.record_failure()
+        component._reset_socket()
@@ -0,0 +1,171 @@
+"""openbts.health
+per-endpoint circuit breaking and adaptive timeouts
+"""
+
+import collections
+import os
+import threading
+import time
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class EndpointHealth(object):
+  """Tracks the latency and failures of one NodeManager address.
+
+  Components share an EndpointHealth per address (see get_endpoint_health)
+  and consult it around every request:
+
+  * Adaptive timeouts: once min_samples replies have been seen, requests wait
+    timeout_multiplier times the observed timeout_percentile latency instead
+    of the component's full socket_timeout, clamped to at least min_timeout.
+    Latencies are kept per kind of request (components use the command and
+    action), so slow requests never inherit the timeout of fast ones.
+  * Circuit breaking: after failure_threshold consecutive timeouts the
+    circuit opens and requests fail fast with a TimeoutError.  Once
+    recovery_timeout seconds have passed, a single probe request is let
+    through; a reply closes the circuit, another timeout re-opens it.  A
+    probe that is never reported on is given up after another
+    recovery_timeout, and the next request becomes the probe.  Probes wait
+    the full socket_timeout, since the latencies seen before the circuit
+    opened say little about a recovering node.
+
+  A reply carrying an error code still counts as a success, since the node
+  answered.
+
+  Args:
+    failure_threshold: consecutive timeouts that open the circuit
+    recovery_timeout: seconds an open circuit waits before probing
+    timeout_percentile: latency percentile the adaptive timeout is based on
+    timeout_multiplier: headroom multiplied onto that percentile
+    min_timeout: lower bound of the adaptive timeout in seconds
+    min_samples: replies needed before timeouts adapt
+    window: number of recent latencies kept per kind of request
+    clock: callable returning the current time in seconds
+
+  Attributes:
+    state: CLOSED, OPEN or HALF_OPEN
+    failures: number of consecutive timeouts
+  """
+
+  def __init__(self, failure_threshold=5, recovery_timeout=30,
+               timeout_percentile=99, timeout_multiplier=3, min_timeout=0.05,
+               min_samples=20, window=256, clock=time.time):
+    self.failure_threshold = failure_threshold
+    self.recovery_timeout = recovery_timeout
+    self.timeout_percentile = timeout_percentile
+    self.timeout_multiplier = timeout_multiplier
+    self.min_timeout = min_timeout
+    self.min_samples = min_samples
+    self.window = window
+    self.clock = clock
+    self.state = CLOSED
+    self.failures = 0
+    # kind of request -> its recent latencies
+    self._latencies = {}
+    self._opened_at = None
+    self._probing = False
+    self._probe_deadline = None
+    self._lock = threading.Lock()
+
+  def __repr__(self):
+    return 'EndpointHealth(state=%s, failures=%s)' % (self.state,
+                                                      self.failures)
+
+  def allow(self):
+    """Checks whether a request may be sent now.
+
+    While the circuit is half-open only one probe is allowed at a time, so a
+    True return in that state makes the caller the probe: it must report
+    back with record_success or record_failure.
+
+    Returns:
+      True if the request may be sent, False if it should fail fast
+    """
+    with self._lock:
+      if self.state == CLOSED:
+        return True
+      if self.state == OPEN:
+        if self.clock() < self._opened_at + self.recovery_timeout:
+          return False
+        self.state = HALF_OPEN
+      now = self.clock()
+      if self._probing and now < self._probe_deadline:
+        return False
+      self._probing = True
+      self._probe_deadline = now + self.recovery_timeout
+      return True
+
+  def record_success(self, latency, kind=None):
+    """Records a reply, closing the circuit.
+
+    Args:
+      latency: seconds between sending the request and the reply
+      kind: hashable kind of the request, e.g. a (command, action) tuple
+    """
+    with self._lock:
+      latencies = self._latencies.get(kind)
+      if latencies is None:
+        latencies = self._latencies[kind] = collections.deque(
+          maxlen=self.window)
+      latencies.append(latency)
+      self.failures = 0
+      self.state = CLOSED
+      self._probing = False
+
+  def record_failure(self):
+    """Records a timeout, opening the circuit if there were too many."""
+    with self._lock:
+      self.failures += 1
+      self._probing = False
+      if (self.state == HALF_OPEN or
+          self.failures >= self.failure_threshold):
+        self.state = OPEN
+        self._opened_at = self.clock()
+
+  def timeout(self, default, kind=None):
+    """Gets the number of seconds to wait on a reply.
+
+    Args:
+      default: the component's socket_timeout, also the upper bound
+      kind: kind of the request, as passed to record_success
+
+    Returns:
+      the adaptive timeout, or default if too few replies of that kind have
+      been seen or the circuit is not closed
+    """
+    with self._lock:
+      latencies = self._latencies.get(kind, ())
+      if self.state != CLOSED or len(latencies) < self.min_samples:
+        return default
+      latencies = sorted(latencies)
+    index = int((len(latencies) - 1) * self.timeout_percentile / 100.0)
+    adaptive = latencies[index] * self.timeout_multiplier
+    return min(default, max(self.min_timeout, adaptive))
+
+
+_endpoints = {}
+_endpoints_pid = None
+_endpoints_lock = threading.Lock()
+
+def get_endpoint_health(address):
+  """Gets the process-wide EndpointHealth of an address.
+
+  Args:
+    address: tcp socket of the node
+
+  Returns:
+    EndpointHealth instance, created with the defaults on first use
+  """
+  global _endpoints, _endpoints_pid
+  with _endpoints_lock:
+    # like the socket pool, a forked child starts from a clean slate
+    if _endpoints_pid != os.getpid():
+      _endpoints = {}
+      _endpoints_pid = os.getpid()
+    if address not in _endpoints:
+      _endpoints[address] = EndpointHealth()
+    return _endpoints[address]
@@ -0,0 +1,356 @@
+"""openbts.loadgen
+sustained load and soak testing against NodeManager
+
+Drives a weighted mix of config reads and updates, subscriber churn and
+monitor polling at a target request rate and reports throughput, error rate
+and latency percentiles every interval.  Run it against the local simulator:
+
+  $ python -m openbts.loadgen --simulate --rate 500 --duration 60
+
+or against a real node, stepping the rate up to find where it saturates:
+
+  $ python -m openbts.loadgen --host 10.0.0.5 --rate 100 --step 100
+"""
+
+import argparse
+import bisect
+import collections
+import random
+import sys
+import threading
+import time
+
+from openbts.components import OpenBTS, SIPAuthServe
+from openbts.core import SocketPool
+from openbts.exceptions import OpenBTSError
+from openbts.simulator import NodeManagerSimulator
+
+
+DEFAULT_MIX = 'read=50,update=10,churn=10,monitor=30'
+
+# latencies sampled for the whole-run summaries
+TOTALS_RESERVOIR = 10000
+
+
+def parse_mix(text):
+  """Parses a workload mix like 'read=50,monitor=30'.
+
+  Returns:
+    list of (operation name, weight) tuples
+
+  Raises:
+    ValueError if an operation is unknown or a weight is not a number
+  """
+  mix = []
+  for part in text.split(','):
+    name, _, weight = part.partition('=')
+    name = name.strip()
+    if name not in OPERATIONS:
+      raise ValueError('unknown operation "%s"' % name)
+    mix.append((name, float(weight)))
+  return mix
+
+
+class Workload(object):
+  """The operations a worker thread performs, on its own components.
+
+  Config updates write back the value read when the workload started, so a
+  soak test never changes a node's config.  Subscriber churn creates and
+  deletes throwaway subscribers whose IMSIs start with imsi_prefix.
+
+  Args:
+    openbts_address: address of the OpenBTS component
+    sipauthserve_address: address of the SIPAuthServe component
+    config_keys: OpenBTS config keys to read and rewrite
+    imsi_prefix: prefix of the churned subscribers' IMSIs
+    worker: number of this worker, to keep IMSIs unique across workers
+
+  Kwargs:
+    passed to the components, e.g. socket_pool or socket_timeout
+  """
+
+  def __init__(self, openbts_address, sipauthserve_address, config_keys,
+               imsi_prefix='00101999', worker=0, **kwargs):
+    self.openbts = OpenBTS(address=openbts_address, **kwargs)
+    self.sipauthserve = SIPAuthServe(address=sipauthserve_address, **kwargs)
+    self.config_keys = config_keys
+    self.original = {}
+    self.imsi_prefix = imsi_prefix
+    self.worker = worker
+    self.churned = 0
+
+  def read(self):
+    self.openbts.read_config(random.choice(self.config_keys))
+
+  def update(self):
+    key = random.choice(self.config_keys)
+    if key not in self.original:
+      self.original[key] = self.openbts.read_config(key).data['value']
+    self.openbts.update_config(key, self.original[key])
+
+  def churn(self):
+    self.churned += 1
+    imsi = '%s%02d%05d' % (self.imsi_prefix, self.worker % 100,
+                           self.churned % 100000)
+    self.sipauthserve.create_subscriber('loadgen', imsi, imsi)
+    self.sipauthserve.delete_subscriber(imsi)
+
+  def monitor(self):
+    self.openbts.monitor()
+
+  def close(self):
+    self.openbts.close()
+    self.sipauthserve.close()
+
+
+OPERATIONS = ('read', 'update', 'churn', 'monitor')
+
+
+class LatencyStats(object):
+  """Latencies and errors of one operation.
+
+  Latencies are appended as they arrive and only sorted when summarised.
+  With a reservoir size, at most that many latencies are kept, a uniform
+  random sample of all of them, so stats over a long run take bounded
+  memory; the percentiles are then estimates, while the count and error rate
+  stay exact.
+
+  Args:
+    reservoir: max number of latencies kept, or None to keep them all
+  """
+
+  __slots__ = ('latencies', 'errors', 'count', 'reservoir', '_random')
+
+  def __init__(self, reservoir=None):
+    self.latencies = []
+    self.errors = 0
+    self.count = 0
+    self.reservoir = reservoir
+    self._random = random.Random(0) if reservoir else None
+
+  def add(self, seconds, error):
+    self.count += 1
+    if self.reservoir is None or len(self.latencies) < self.reservoir:
+      self.latencies.append(seconds)
+    else:
+      slot = self._random.randrange(self.count)
+      if slot < self.reservoir:
+        self.latencies[slot] = seconds
+    if error:
+      self.errors += 1
+
+  def summary(self, elapsed):
+    """Gets the throughput, error rate and percentiles of the stats."""
+    count = self.count
+    latencies = sorted(self.latencies)
+    summary = {
+      'count': count,
+      'rate': count / elapsed if elapsed else 0,
+      'error_rate': self.errors / float(count) if count else 0,
+    }
+    for percent in (50, 95, 99):
+      summary['p%s_ms' % percent] = (
+        latencies[int((len(latencies) - 1) * percent / 100.0)] * 1000
+        if latencies else 0)
+    return summary
+
+
+class LoadGenerator(object):
+  """Runs a workload mix at a target rate across worker threads.
+
+  Requests are scheduled open-loop: each worker issues its share of the
+  target rate on a fixed timetable, and latency is measured from when a
+  request was due rather than when it was sent.  Once the node saturates,
+  queueing then shows up in the latencies instead of silently lowering the
+  request rate.
+
+  Args:
+    workloads: one Workload per worker thread
+    mix: list of (operation name, weight) tuples
+    rate: target requests per second across all workers
+    step: requests per second added to the target rate every interval
+    interval: seconds between reports
+    report: callable invoked with (elapsed seconds, target rate, dict of
+        per-operation summaries plus a 'total' entry) after every interval
+  """
+
+  def __init__(self, workloads, mix, rate, step=0, interval=5, report=None):
+    self.workloads = workloads
+    self.names = [name for name, _ in mix]
+    total = float(sum(weight for _, weight in mix))
+    self.thresholds = []
+    cumulative = 0
+    for _, weight in mix:
+      cumulative += weight / total
+      self.thresholds.append(cumulative)
+    self.rate = rate
+    self.step = step
+    self.interval = interval
+    self.report = report
+    self.totals = collections.defaultdict(
+      lambda: LatencyStats(TOTALS_RESERVOIR))
+    self._run_total = LatencyStats(TOTALS_RESERVOIR)
+    self._interval_stats = collections.defaultdict(LatencyStats)
+    self._lock = threading.Lock()
+    self._stop = threading.Event()
+
+  def run(self, duration):
+    """Runs the load for duration seconds, reporting every interval.
+
+    Returns:
+      dict of per-operation summaries over the whole run
+    """
+    self._stop.clear()
+    self._start = time.time()
+    threads = [threading.Thread(target=self._work, args=(index, workload))
+               for index, workload in enumerate(self.workloads)]
+    for thread in threads:
+      thread.daemon = True
+      thread.start()
+    deadline = self._start + duration
+    next_report = self._start + self.interval
+    while time.time() < deadline:
+      self._stop.wait(max(0, min(next_report, deadline) - time.time()))
+      if time.time() >= next_report:
+        self._flush(next_report - self.interval, next_report)
+        next_report += self.interval
+        self.rate += self.step
+    self._stop.set()
+    for thread in threads:
+      thread.join()
+    # report a trailing partial interval only if it is long enough to mean
+    # something, otherwise fold it into the totals silently
+    if time.time() - (next_report - self.interval) > self.interval / 2.0:
+      self._flush(next_report - self.interval, time.time())
+    with self._lock:
+      return self._summarise(self.totals, time.time() - self._start,
+                             self._run_total)
+
+  def _work(self, index, workload):
+    """Issues this worker's share of the requests until stopped."""
+    chooser = random.Random(index)
+    due = self._start
+    while not self._stop.is_set():
+      due += len(self.workloads) / float(self.rate)
+      wait = due - time.time()
+      if wait > 0 and self._stop.wait(wait):
+        return
+      name = self.names[bisect.bisect_left(self.thresholds, chooser.random())]
+      error = None
+      try:
+        getattr(workload, name)()
+      except OpenBTSError as e:
+        error = e
+      latency = time.time() - due
+      with self._lock:
+        self._interval_stats[name].add(latency, error)
+        self.totals[name].add(latency, error)
+        self._run_total.add(latency, error)
+
+  def _flush(self, start, end):
+    """Reports on the interval that just ended and starts a new one."""
+    with self._lock:
+      stats, self._interval_stats = (self._interval_stats,
+                                     collections.defaultdict(LatencyStats))
+    if self.report:
+      self.report(end - self._start, self.rate,
+                  self._summarise(stats, end - start))
+
+  def _summarise(self, stats, elapsed, total=None):
+    """Summarises per-operation stats, adding a 'total' entry.
+
+    Without a total, it is merged from the per-operation stats, which must
+    then hold every latency.
+    """
+    if total is None:
+      total = LatencyStats()
+      for name_stats in stats.values():
+        total.latencies.extend(name_stats.latencies)
+        total.errors += name_stats.errors
+        total.count += name_stats.count
+    summaries = dict((name, name_stats.summary(elapsed))
+                     for name, name_stats in stats.items())
+    summaries['total'] = total.summary(elapsed)
+    return summaries
+
+
+def print_report(elapsed, rate, summaries):
+  """Prints one line per interval."""
+  total = summaries['total']
+  print('t=%6.1fs target=%7.1f/s achieved=%7.1f/s errors=%5.1f%% '
+        'p50=%8.2fms p95=%8.2fms p99=%8.2fms' % (
+          elapsed, rate, total['rate'], total['error_rate'] * 100,
+          total['p50_ms'], total['p95_ms'], total['p99_ms']))
+  sys.stdout.flush()
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(
+    description='Drive sustained load against NodeManager.')
+  parser.add_argument('--host', default='127.0.0.1',
+                      help='NodeManager host (ignored with --simulate)')
+  parser.add_argument('--simulate', action='store_true',
+                      help='run against a local NodeManager simulator')
+  parser.add_argument('--simulated-latency', type=float, default=0.001)
+  parser.add_argument('--rate', type=float, default=100,
+                      help='target requests per second')
+  parser.add_argument('--step', type=float, default=0,
+                      help='requests per second added every interval')
+  parser.add_argument('--duration', type=float, default=60,
+                      help='seconds to run for')
+  parser.add_argument('--interval', type=float, default=5,
+                      help='seconds between reports')
+  parser.add_argument('--workers', type=int, default=4)
+  parser.add_argument('--mix', default=DEFAULT_MIX,
+                      help='weighted operations, default %s' % DEFAULT_MIX)
+  parser.add_argument('--config-keys', default='GSM.Radio.C0,Log.Alarms.Max',
+                      help='comma-separated OpenBTS keys to read and rewrite')
+  parser.add_argument('--imsi-prefix', default='00101999',
+                      help='IMSI prefix of the churned test subscribers')
+  parser.add_argument('--socket-timeout', type=float, default=2)
+  args = parser.parse_args(argv)
+
+  try:
+    mix = parse_mix(args.mix)
+  except ValueError as e:
+    parser.error(str(e))
+  simulator = None
+  if args.simulate:
+    address = 'tcp://127.0.0.1:7991'
+    simulator = NodeManagerSimulator(address, latency=args.simulated_latency)
+    simulator.start()
+    openbts_address = sipauthserve_address = address
+  else:
+    openbts_address = 'tcp://%s:45060' % args.host
+    sipauthserve_address = 'tcp://%s:45064' % args.host
+
+  pool = SocketPool()
+  workloads = [
+    Workload(openbts_address, sipauthserve_address,
+             args.config_keys.split(','), args.imsi_prefix, worker,
+             socket_pool=pool, socket_timeout=args.socket_timeout,
+             codec='auto')
+    for worker in range(args.workers)]
+  generator = LoadGenerator(workloads, mix, args.rate, args.step,
+                            args.interval, print_report)
+  try:
+    summaries = generator.run(args.duration)
+  finally:
+    for workload in workloads:
+      workload.close()
+    pool.clear()
+    if simulator:
+      simulator.stop()
+
+  print('\n%-10s %9s %9s %8s %10s %10s %10s' % (
+    'operation', 'requests', 'rate/s', 'errors', 'p50 ms', 'p95 ms',
+    'p99 ms'))
+  for name in sorted(summaries):
+    summary = summaries[name]
+    print('%-10s %9d %9.1f %7.1f%% %10.2f %10.2f %10.2f' % (
+      name, summary['count'], summary['rate'], summary['error_rate'] * 100,
+      summary['p50_ms'], summary['p95_ms'], summary['p99_ms']))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,203 @@
+"""openbts.metrics
+client statistics and an OpenMetrics exporter
+"""
+
+import bisect
+import collections
+import re
+import threading
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from openbts.exceptions import InvalidRequestError, TimeoutError
+
+
+# upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10)
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+class ClientStats(object):
+  """Counts requests made by components and their latencies.
+
+  Pass an instance to components with the stats kwarg (or as one of their
+  hooks); one instance can be shared by many components and threads.
+
+  Args:
+    buckets: upper bounds in seconds of the latency histogram buckets
+  """
+
+  def __init__(self, buckets=LATENCY_BUCKETS):
+    self.buckets = tuple(buckets)
+    self._lock = threading.Lock()
+    # (command, action, outcome) -> count
+    self.requests = collections.defaultdict(int)
+    # command -> per-bucket counts, with a final +Inf bucket
+    self.latency_buckets = collections.defaultdict(
+      lambda: [0] * (len(self.buckets) + 1))
+    self.latency_sums = collections.defaultdict(float)
+    self.timeouts = collections.defaultdict(int)
+    # NodeManager response code -> count
+    self.invalid_requests = collections.defaultdict(int)
+
+  def __call__(self, trace):
+    """Records a tracing.RequestTrace, so the stats can be used as a hook."""
+    self.record(trace.message, trace.duration, trace.error)
+
+  def record(self, message, seconds, error=None):
+    """Records one finished request.
+
+    Args:
+      message: the message dict that was sent
+      seconds: time from sending the request to handling its reply
+      error: the exception raised for the request, if any
+    """
+    command = message.get('command', '')
+    action = message.get('action', '')
+    if error is None:
+      outcome = 'ok'
+    elif isinstance(error, TimeoutError):
+      outcome = 'timeout'
+    else:
+      outcome = 'error'
+    with self._lock:
+      self.requests[(command, action, outcome)] += 1
+      self.latency_buckets[command][
+        bisect.bisect_left(self.buckets, seconds)] += 1
+      self.latency_sums[command] += seconds
+      if outcome == 'timeout':
+        self.timeouts[command] += 1
+      elif isinstance(error, InvalidRequestError):
+        self.invalid_requests[error.code] += 1
+
+  def render(self):
+    """Renders the statistics as OpenMetrics lines.
+
+    Returns:
+      list of lines, without the final '# EOF'
+    """
+    with self._lock:
+      lines = ['# TYPE openbts_client_requests counter']
+      for (command, action, outcome), count in sorted(self.requests.items()):
+        lines.append('openbts_client_requests_total%s %s' % (_labels(
+          command=command, action=action, outcome=outcome), count))
+      lines.append('# TYPE openbts_client_request_duration_seconds histogram')
+      lines.append('# UNIT openbts_client_request_duration_seconds seconds')
+      for command, counts in sorted(self.latency_buckets.items()):
+        total = 0
+        bounds = [repr(float(b)) for b in self.buckets] + ['+Inf']
+        for bound, count in zip(bounds, counts):
+          total += count
+          lines.append('openbts_client_request_duration_seconds_bucket%s %s'
+                       % (_labels(command=command, le=bound), total))
+        lines.append('openbts_client_request_duration_seconds_count%s %s'
+                     % (_labels(command=command), total))
+        lines.append('openbts_client_request_duration_seconds_sum%s %r'
+                     % (_labels(command=command), self.latency_sums[command]))
+      lines.append('# TYPE openbts_client_timeouts counter')
+      for command, count in sorted(self.timeouts.items()):
+        lines.append('openbts_client_timeouts_total%s %s'
+                     % (_labels(command=command), count))
+      lines.append('# TYPE openbts_client_invalid_requests counter')
+      for code, count in sorted(self.invalid_requests.items(),
+                                key=lambda item: str(item[0])):
+        lines.append('openbts_client_invalid_requests_total%s %s'
+                     % (_labels(code=code), count))
+    return lines
+
+
+def _labels(**labels):
+  """Formats a label set, escaping the values."""
+  pairs = []
+  for name, value in sorted(labels.items()):
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    pairs.append('%s="%s"' % (name, value.replace('\n', '\\n')))
+  return '{%s}' % ','.join(pairs)
+
+
+def _metric_name(field):
+  """Turns a monitor field name into a valid metric name suffix."""
+  return re.sub(r'[^a-zA-Z0-9_]', '_', field)
+
+
+class MetricsExporter(object):
+  """Serves monitor values and client statistics as OpenMetrics text.
+
+  Everything is rendered from state that is already in memory -- the latest
+  samples of MonitorPollers and the counters of a ClientStats -- so a scrape
+  never makes a NodeManager request.
+
+    exporter = MetricsExporter(stats, {'bts1': poller})
+    exporter.serve(9100)
+
+  Args:
+    stats: optional ClientStats instance
+    pollers: optional dict mapping node names to MonitorPollers
+  """
+
+  def __init__(self, stats=None, pollers=None):
+    self.stats = stats
+    self.pollers = dict(pollers or {})
+    self._server = None
+    self._thread = None
+
+  def render(self):
+    """Renders the current metrics.
+
+    Returns:
+      OpenMetrics text, ending with '# EOF'
+    """
+    lines = []
+    gauges = collections.defaultdict(list)
+    for node, poller in sorted(self.pollers.items()):
+      for field, value in poller.latest().items():
+        gauges[_metric_name(field)].append((node, value))
+    for name, samples in sorted(gauges.items()):
+      lines.append('# TYPE openbts_monitor_%s gauge' % name)
+      for node, value in samples:
+        lines.append('openbts_monitor_%s%s %r' % (name, _labels(node=node),
+                                                  value))
+    if self.stats is not None:
+      lines.extend(self.stats.render())
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+  def wsgi_app(self, environ, start_response):
+    """A WSGI app answering every request with the rendered metrics."""
+    body = self.render().encode('utf-8')
+    start_response('200 OK', [('Content-Type', CONTENT_TYPE),
+                              ('Content-Length', str(len(body)))])
+    return [body]
+
+  def serve(self, port, host=''):
+    """Serves the metrics over http from a daemon thread.
+
+    Args:
+      port: the port to listen on, 0 picks a free one
+      host: the interface to listen on, all by default
+
+    Returns:
+      the port the server is listening on
+    """
+    self._server = make_server(host, port, self.wsgi_app,
+                               handler_class=_QuietHandler)
+    self._thread = threading.Thread(target=self._server.serve_forever)
+    self._thread.daemon = True
+    self._thread.start()
+    return self._server.server_port
+
+  def shutdown(self):
+    """Stops the http server."""
+    if self._server is not None:
+      self._server.shutdown()
+      self._server.server_close()
+      self._thread.join()
+      self._server = self._thread = None
+
+
+class _QuietHandler(WSGIRequestHandler):
+  """Request handler that does not log every scrape to stderr."""
+
+  def log_message(self, *args):
+    pass
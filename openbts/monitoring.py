@@ -0,0 +1,273 @@
+"""openbts.monitoring
+continuous polling of OpenBTS monitoring data
+"""
+
+import array
+import numbers
+import threading
+import time
+
+from openbts.exceptions import InvalidResponseError, OpenBTSError
+
+
+class RingBuffer(object):
+  """A fixed-size buffer of numbers that overwrites its oldest entries.
+
+  Samples are stored in a preallocated array.array, so memory use is fixed
+  at capacity numbers however long the buffer is fed.
+
+  Args:
+    capacity: max number of samples kept
+    typecode: array typecode of the samples, 'd' (double) by default
+  """
+
+  def __init__(self, capacity, typecode='d'):
+    self.capacity = capacity
+    self._samples = array.array(typecode, [0]) * capacity
+    self._next = 0
+    self._count = 0
+
+  def __len__(self):
+    return self._count
+
+  def append(self, value):
+    """Adds a sample, overwriting the oldest one if the buffer is full."""
+    self._samples[self._next] = value
+    self._next = (self._next + 1) % self.capacity
+    self._count = min(self._count + 1, self.capacity)
+
+  def values(self):
+    """Gets the samples as a list, oldest first."""
+    if self._count < self.capacity:
+      return self._samples[:self._count].tolist()
+    return (self._samples[self._next:] + self._samples[:self._next]).tolist()
+
+  def last(self):
+    """Gets the newest sample, or None if the buffer is empty."""
+    if not self._count:
+      return None
+    return self._samples[self._next - 1]
+
+  def aggregate(self, percentiles=(50, 95, 99)):
+    """Summarises the samples.
+
+    Args:
+      percentiles: the percentiles to compute
+
+    Returns:
+      dict with 'count', 'min', 'max', 'mean' and one 'pN' key per
+      percentile, or None if the buffer is empty
+    """
+    samples = sorted(self.values())
+    if not samples:
+      return None
+    summary = {
+      'count': len(samples),
+      'min': samples[0],
+      'max': samples[-1],
+      'mean': sum(samples) / float(len(samples)),
+    }
+    for percentile in percentiles:
+      summary['p%s' % percentile] = _percentile(samples, percentile)
+    return summary
+
+
+def _percentile(samples, percentile):
+  """Gets a percentile of sorted samples by linear interpolation."""
+  position = (len(samples) - 1) * percentile / 100.0
+  lower = int(position)
+  upper = min(lower + 1, len(samples) - 1)
+  return samples[lower] + (samples[upper] - samples[lower]) * (position - lower)
+
+
+def flatten_sample(data, prefix=''):
+  """Pulls the numeric fields out of monitor data.
+
+  Nested dicts are flattened into dotted names, e.g. {'tch': {'active': 3}}
+  becomes {'tch.active': 3}.  Non-numeric fields are dropped.
+
+  Args:
+    data: the data of a monitor Response
+    prefix: prefix for the field names
+
+  Returns:
+    dict mapping field names to numbers
+  """
+  fields = {}
+  for key, value in data.items():
+    name = prefix + key
+    if isinstance(value, dict):
+      fields.update(flatten_sample(value, name + '.'))
+    elif isinstance(value, numbers.Number) and not isinstance(value, bool):
+      fields[name] = value
+  return fields
+
+
+class MonitorPoller(object):
+  """Polls OpenBTS.monitor in a background thread and keeps a time series.
+
+  Polls are scheduled on a fixed grid (start + n * interval), so slow polls
+  do not make the series drift; ticks that are missed entirely are skipped.
+  Each numeric field of the monitor data gets its own RingBuffer, as do the
+  poll timestamps, so memory stays constant over any uptime.  Failed polls,
+  unexpected monitor data and listeners that raise are counted in errors
+  rather than stopping the thread.
+
+    poller = MonitorPoller(OpenBTS(), interval=1, capacity=3600)
+    poller.start()
+    poller.aggregate('noiseRSSI')
+
+  Args:
+    openbts: OpenBTS component to poll
+    interval: seconds between polls
+    capacity: number of samples kept per field
+
+  Attributes:
+    errors: number of polls and listener calls that failed
+    last_error: the exception raised by the most recent failure
+  """
+
+  def __init__(self, openbts, interval=1.0, capacity=3600):
+    self.openbts = openbts
+    self.interval = interval
+    self.capacity = capacity
+    self.timestamps = RingBuffer(capacity)
+    self.errors = 0
+    self.last_error = None
+    self._series = {}
+    self._listeners = []
+    self._lock = threading.Lock()
+    self._stop = threading.Event()
+    self._thread = None
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.stop()
+
+  @property
+  def fields(self):
+    """Sorted list of the field names seen so far."""
+    with self._lock:
+      return sorted(self._series)
+
+  def start(self):
+    """Starts polling in a daemon thread."""
+    if self._thread is not None:
+      return
+    self._stop.clear()
+    self._thread = threading.Thread(target=self._run)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def stop(self):
+    """Stops polling and waits for the thread to finish."""
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def add_listener(self, listener):
+    """Registers a callable invoked as listener(sample, timestamp) after
+    every recorded sample, e.g. AlertEngine rules.
+    """
+    self._listeners.append(listener)
+
+  def poll_once(self):
+    """Polls the component once and records the sample.
+
+    Returns:
+      the flattened sample, or None if the poll failed
+    """
+    try:
+      response = self.openbts.monitor()
+      sample = flatten_sample(response.data or {})
+    except OpenBTSError as e:
+      self.errors += 1
+      self.last_error = e
+      return None
+    except (AttributeError, TypeError) as e:
+      # the data was not the dict of fields a monitor reply should hold
+      self.errors += 1
+      self.last_error = InvalidResponseError('unexpected monitor data: %s' %
+                                             e)
+      return None
+    self.record(sample)
+    return sample
+
+  def record(self, sample, timestamp=None):
+    """Adds a sample to the time series.
+
+    Fields missing from the sample are left untouched, so each field's series
+    only holds values that were actually reported.
+
+    Args:
+      sample: dict mapping field names to numbers
+      timestamp: unix time of the sample (defaults to now)
+    """
+    if timestamp is None:
+      timestamp = time.time()
+    with self._lock:
+      self.timestamps.append(timestamp)
+      for name, value in sample.items():
+        series = self._series.get(name)
+        if series is None:
+          series = self._series[name] = RingBuffer(self.capacity)
+        series.append(value)
+    for listener in self._listeners:
+      try:
+        listener(sample, timestamp)
+      except Exception as e:
+        self.errors += 1
+        self.last_error = e
+
+  def latest(self):
+    """Gets the newest value of every field.
+
+    Returns:
+      dict mapping field names to numbers
+    """
+    with self._lock:
+      return dict((name, series.last())
+                  for name, series in self._series.items())
+
+  def values(self, field):
+    """Gets the recorded values of a field, oldest first."""
+    with self._lock:
+      series = self._series.get(field)
+      return series.values() if series else []
+
+  def aggregate(self, field, percentiles=(50, 95, 99)):
+    """Summarises the recorded values of a field.
+
+    Args:
+      field: the field name, e.g. 'noiseRSSI'
+      percentiles: the percentiles to compute
+
+    Returns:
+      dict of aggregates (see RingBuffer.aggregate), or None if the field
+      has no values
+    """
+    with self._lock:
+      series = self._series.get(field)
+      return series.aggregate(percentiles) if series else None
+
+  def _run(self):
+    """Polls on a fixed schedule until stopped."""
+    next_tick = time.time()
+    while not self._stop.is_set():
+      try:
+        self.poll_once()
+      except Exception as e:
+        # keep polling whatever went wrong, the poller is meant to run for
+        # as long as the process does
+        self.errors += 1
+        self.last_error = e
+      next_tick += self.interval
+      now = time.time()
+      if next_tick < now:
+        # skip the ticks we missed rather than polling in a burst
+        next_tick += self.interval * int((now - next_tick) / self.interval + 1)
+      self._stop.wait(next_tick - now)
@@ -0,0 +1,242 @@
+"""openbts.provisioning
+multi-process bulk subscriber provisioning
+"""
+
+import itertools
+import json
+import multiprocessing
+import os
+
+import zmq
+
+from openbts import exceptions
+from openbts.components import SIPAuthServe
+from openbts.core import BatchReport, SocketPool
+from openbts.exceptions import OpenBTSError
+from openbts.subscriber_files import SubscriberFile
+
+try:
+  import queue
+except ImportError:
+  import Queue as queue
+
+
+class Provisioner(object):
+  """Creates or deletes subscribers from a csv file using several processes.
+
+  The file is split into one byte range per process, at line boundaries.
+  Each process parses its own range and streams it through a pipelined
+  SIPAuthServe component on its own zmq context, with at most max_in_flight
+  requests outstanding.  So both the json work and the network waits are
+  spread across CPUs.
+
+  The file is read through a subscriber_files.SubscriberFile, so it may be a
+  csv file, with or without a header, or a fixed-width file.  Delete jobs
+  only need the imsi column.
+
+  Progress is reported to the parent process every checkpoint_every records
+  per process.  With a checkpoint path, the parent also saves that progress,
+  and a later run over the same file resumes where the last one stopped.
+  Records in flight when a run died are sent again, so a resumed create job
+  may report a few of them as already existing.  The checkpoint keeps the
+  success and failure counts but only the first checkpoint_errors failures,
+  so it stays small however many records fail; a resumed job's report only
+  lists those failures from earlier runs.
+
+    provisioner = Provisioner('tcp://10.0.0.5:45064', processes=8,
+                              checkpoint='import.checkpoint')
+    report = provisioner.create_subscribers('subscribers.csv')
+
+  Args:
+    address: tcp socket of the SIPAuthServe component
+    processes: number of worker processes
+    max_in_flight: max outstanding requests per process
+    checkpoint_every: records per process between progress reports
+    checkpoint: optional path of the json checkpoint file
+    checkpoint_errors: max number of failures kept in the checkpoint
+    fixed_width: True if the files use the fixed-width layout
+
+  Kwargs:
+    passed to each process's SIPAuthServe component, e.g. socket_timeout or
+    codec; they must be picklable
+  """
+
+  def __init__(self, address, processes=4, max_in_flight=64,
+               checkpoint_every=1000, checkpoint=None, checkpoint_errors=100,
+               fixed_width=False, **kwargs):
+    self.address = address
+    self.processes = processes
+    self.max_in_flight = max_in_flight
+    self.checkpoint_every = checkpoint_every
+    self.checkpoint = checkpoint
+    self.checkpoint_errors = checkpoint_errors
+    self.fixed_width = fixed_width
+    self.component_kwargs = kwargs
+
+  def create_subscribers(self, path, progress=None):
+    """Creates the subscribers listed in a csv file.
+
+    Args:
+      path: the csv file
+      progress: optional callable invoked with the merged BatchReport every
+          time a process reports progress
+
+    Returns:
+      BatchReport of the whole job, including any resumed runs
+
+    Raises:
+      OpenBTSError if a worker process dies
+    """
+    return self._run('create', path, progress)
+
+  def delete_subscribers(self, path, progress=None):
+    """Deletes the subscribers listed in a csv file, see create_subscribers.
+    """
+    return self._run('delete', path, progress)
+
+  def _run(self, action, path, progress):
+    """Runs a job across the worker processes, resuming if possible."""
+    with SubscriberFile(path, self.fixed_width) as subscriber_file:
+      body_start = subscriber_file.body_start
+      size = subscriber_file.size
+    state = self._load_checkpoint(action, path, size)
+    if state is None:
+      state = {
+        'action': action,
+        'path': os.path.abspath(path),
+        'size': size,
+        'shards': [{'start': start, 'end': end, 'offset': start}
+                   for start, end in _split(path, body_start, size,
+                                            self.processes)],
+        'succeeded': 0,
+        'failed': 0,
+        'errors': [],
+      }
+    report = BatchReport()
+    report.succeeded = state['succeeded']
+    report.failed = state['failed']
+    report.errors = [(record, _rebuild_error(name, message, code))
+                     for record, name, message, code in state['errors']]
+
+    results = multiprocessing.Queue()
+    workers = {}
+    for index, shard in enumerate(state['shards']):
+      if shard['offset'] >= shard['end']:
+        continue
+      worker = multiprocessing.Process(
+        target=_provision_shard,
+        args=(self.address, action, path, self.fixed_width, index,
+              shard['offset'], shard['end'], self.max_in_flight,
+              self.checkpoint_every, self.component_kwargs, results))
+      worker.daemon = True
+      worker.start()
+      workers[index] = worker
+    try:
+      while workers:
+        try:
+          index, offset, shard_report = results.get(timeout=1)
+        except queue.Empty:
+          for index, worker in list(workers.items()):
+            if not worker.is_alive() and results.empty():
+              raise OpenBTSError('provisioning process for bytes %s-%s '
+                                 'exited with code %s' % (
+                                   state['shards'][index]['offset'],
+                                   state['shards'][index]['end'],
+                                   worker.exitcode))
+          continue
+        if offset is None:
+          workers.pop(index).join()
+          state['shards'][index]['offset'] = state['shards'][index]['end']
+          self._save_checkpoint(state)
+          continue
+        state['shards'][index]['offset'] = offset
+        report.succeeded += shard_report.succeeded
+        report.failed += shard_report.failed
+        report.errors.extend(shard_report.errors)
+        state['succeeded'] = report.succeeded
+        state['failed'] = report.failed
+        room = max(0, self.checkpoint_errors - len(state['errors']))
+        state['errors'].extend(
+          [record, type(error).__name__, str(error),
+           getattr(error, 'code', None)]
+          for record, error in shard_report.errors[:room])
+        self._save_checkpoint(state)
+        if progress:
+          progress(report)
+    finally:
+      for worker in workers.values():
+        worker.terminate()
+        worker.join()
+    return report
+
+  def _load_checkpoint(self, action, path, size):
+    """Loads the checkpoint if it belongs to this job."""
+    if not self.checkpoint or not os.path.exists(self.checkpoint):
+      return None
+    with open(self.checkpoint) as f:
+      state = json.load(f)
+    if (state.get('action'), state.get('path'), state.get('size')) != (
+        action, os.path.abspath(path), size):
+      return None
+    return state
+
+  def _save_checkpoint(self, state):
+    """Atomically replaces the checkpoint file."""
+    if not self.checkpoint:
+      return
+    temporary = self.checkpoint + '.tmp'
+    with open(temporary, 'w') as f:
+      json.dump(state, f)
+    os.rename(temporary, self.checkpoint)
+
+
+def _split(path, start, size, count):
+  """Splits a file into about count byte ranges ending at line boundaries.
+
+  Returns:
+    list of (start, end) byte offsets
+  """
+  boundaries = [start]
+  with open(path, 'rb') as f:
+    for i in range(1, count):
+      f.seek(max(start + (size - start) * i // count, boundaries[-1]))
+      # finish the line the guess landed in
+      f.readline()
+      boundaries.append(min(f.tell(), size))
+  boundaries.append(size)
+  return [(begin, end) for begin, end in zip(boundaries, boundaries[1:])
+          if begin < end]
+
+
+def _provision_shard(address, action, path, fixed_width, index, start, end,
+                     max_in_flight, checkpoint_every, kwargs, results):
+  """Worker process: provisions one byte range and reports progress.
+
+  Puts (shard index, offset, BatchReport) on the results queue after every
+  chunk of records, and (shard index, None, None) when done.
+  """
+  pool = SocketPool(context=zmq.Context())
+  connection = SIPAuthServe(address=address, socket_pool=pool,
+                            pipelined=True, **kwargs)
+  send = (connection.create_subscribers if action == 'create'
+          else connection.delete_subscribers)
+  with SubscriberFile(path, fixed_width) as subscriber_file:
+    records = subscriber_file.records(start, end)
+    while True:
+      chunk = []
+      for record, offset in itertools.islice(records, checkpoint_every):
+        chunk.append(record)
+      if not chunk:
+        break
+      results.put((index, offset, send(chunk, max_in_flight)))
+  connection.close()
+  pool.clear()
+  results.put((index, None, None))
+
+
+def _rebuild_error(name, message, code):
+  """Recreates an error saved in a checkpoint."""
+  error = getattr(exceptions, name, OpenBTSError)(message)
+  if code is not None:
+    error.code = code
+  return error
@@ -0,0 +1,153 @@
+"""openbts.results
+compact, typed result objects
+"""
+
+import time
+
+
+class Subscriber(object):
+  """A SIPAuthServe subscriber.
+
+  Uses __slots__, so a subscriber takes a fraction of the memory of the dict
+  it is built from and its fields are plain attribute lookups.
+
+  Attributes:
+    name: name of the subscriber
+    imsi: IMSI of the subscriber
+    msisdn: MSISDN of the subscriber
+    ki: authentication key of the subscriber, '' for cache auth
+  """
+
+  __slots__ = ('name', 'imsi', 'msisdn', 'ki')
+
+  def __init__(self, name, imsi, msisdn, ki=''):
+    self.name = name
+    self.imsi = imsi
+    self.msisdn = msisdn
+    self.ki = ki
+
+  def __repr__(self):
+    return 'Subscriber(%r, %r, %r)' % (self.name, self.imsi, self.msisdn)
+
+  def __eq__(self, other):
+    return (isinstance(other, Subscriber) and
+            self.to_tuple() == other.to_tuple())
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash(self.to_tuple())
+
+  @classmethod
+  def from_dict(cls, data):
+    """Builds a subscriber from a record of a subscriber read."""
+    return cls(data.get('name', ''), data.get('imsi', ''),
+               data.get('msisdn', ''), data.get('ki') or '')
+
+  def to_tuple(self):
+    """Gets the (name, imsi, msisdn, ki) tuple, as create_subscriber takes."""
+    return (self.name, self.imsi, self.msisdn, self.ki)
+
+  def to_dict(self):
+    return {'name': self.name, 'imsi': self.imsi, 'msisdn': self.msisdn,
+            'ki': self.ki}
+
+
+class ConfigValue(object):
+  """A config value read from a component.
+
+  Attributes:
+    key: the config parameter
+    value: its value
+    dirty: whether a pending change only takes effect on restart
+  """
+
+  __slots__ = ('key', 'value', 'dirty')
+
+  def __init__(self, key, value, dirty=None):
+    self.key = key
+    self.value = value
+    self.dirty = dirty
+
+  def __repr__(self):
+    return 'ConfigValue(%r, %r)' % (self.key, self.value)
+
+  def __eq__(self, other):
+    return (isinstance(other, ConfigValue) and
+            (self.key, self.value, self.dirty) ==
+            (other.key, other.value, other.dirty))
+
+  def __ne__(self, other):
+    return not self == other
+
+  @classmethod
+  def from_response(cls, key, response):
+    """Builds a config value from a read_config Response."""
+    data = response.data
+    if isinstance(data, dict):
+      return cls(data.get('key', key), data.get('value'), response.dirty)
+    return cls(key, data, response.dirty)
+
+
+# field name tuples -> shared {name: index} dicts, so samples with the same
+# fields share one index instead of each carrying its own keys
+_field_indexes = {}
+
+
+class MonitorSample(object):
+  """One sample of OpenBTS monitoring data.
+
+  The values are kept in a tuple, and the mapping from field name to
+  position is shared by every sample with the same fields, so a sample costs
+  about as much as a tuple of its values.  Fields are read as attributes or
+  items, e.g. sample.noiseRSSI or sample['tch.active'].
+
+  Args:
+    fields: dict mapping (flattened) field names to values
+    timestamp: unix time of the sample (defaults to now)
+
+  Attributes:
+    timestamp: unix time of the sample
+  """
+
+  __slots__ = ('timestamp', '_index', '_values')
+
+  def __init__(self, fields, timestamp=None):
+    names = tuple(sorted(fields))
+    index = _field_indexes.get(names)
+    if index is None:
+      index = _field_indexes.setdefault(
+        names, dict((name, i) for i, name in enumerate(names)))
+    self.timestamp = time.time() if timestamp is None else timestamp
+    self._index = index
+    self._values = tuple(fields[name] for name in names)
+
+  def __repr__(self):
+    return 'MonitorSample(%r)' % self.to_dict()
+
+  def __getitem__(self, name):
+    return self._values[self._index[name]]
+
+  def __getattr__(self, name):
+    # private names are slots; reading one that is not set yet (e.g. while
+    # unpickling) must not recurse back in here
+    if name.startswith('_'):
+      raise AttributeError(name)
+    try:
+      return self._values[self._index[name]]
+    except KeyError:
+      raise AttributeError(name)
+
+  def __reduce__(self):
+    # rebuilt through __init__ so copies share the field index again
+    return (MonitorSample, (self.to_dict(), self.timestamp))
+
+  def __contains__(self, name):
+    return name in self._index
+
+  def __iter__(self):
+    return iter(sorted(self._index, key=self._index.get))
+
+  def to_dict(self):
+    return dict((name, self._values[i]) for name, i in self._index.items())
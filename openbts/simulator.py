@@ -0,0 +1,273 @@
+"""openbts.simulator
+a local stand-in for NodeManager, for tests and benchmarks
+
+Run one from the command line with:
+
+  $ python -m openbts.simulator --address tcp://127.0.0.1:45060
+"""
+
+import argparse
+import heapq
+import json
+import random
+import threading
+import time
+
+import zmq
+
+
+class NodeManagerSimulator(object):
+  """Answers NodeManager requests from an in-memory model of a component.
+
+  Implements the 'config', 'version', 'monitor' and 'subscribers' commands,
+  and SMQueue's 'messages' command.
+  Requests are handled by a ROUTER socket in a background thread, so REQ and
+  pipelined (DEALER) clients are both served, and replies are scheduled after
+  a simulated latency without holding up other requests.  Replies have their
+  keys sorted, as NodeManager's do.
+
+    with NodeManagerSimulator('tcp://127.0.0.1:7900', latency=0.005) as sim:
+      OpenBTS(address=sim.address).monitor()
+
+  Args:
+    address: tcp socket to bind to
+
+  Kwargs:
+    latency: seconds to wait before each reply
+    latency_jitter: up to this many extra seconds are added at random
+    error_rate: fraction of requests answered with code 500
+    config_size: number of synthetic config keys (on top of a few real ones)
+    subscriber_count: number of synthetic subscribers to start with
+    monitor_fields: number of extra numeric monitor fields, to grow the
+        monitor payload
+    seed: seed for the random number generator
+  """
+
+  def __init__(self, address='tcp://127.0.0.1:45060', latency=0,
+               latency_jitter=0, error_rate=0, config_size=0,
+               subscriber_count=0, monitor_fields=0, seed=None):
+    self.address = address
+    self.latency = latency
+    self.latency_jitter = latency_jitter
+    self.error_rate = error_rate
+    self.monitor_fields = monitor_fields
+    self.random = random.Random(seed)
+    self.requests = 0
+    self.config = {
+      'Bounce.Code': '101',
+      'Control.NumSQLTries': '3',
+      'GSM.Radio.C0': '51',
+      'Log.Alarms.Max': '20',
+    }
+    for i in range(config_size):
+      self.config['Sim.Key%s' % i] = str(i)
+    self.subscribers = {}
+    for i in range(subscriber_count):
+      imsi = '0010100%08d' % i
+      self.subscribers[imsi] = {'name': 'sub%s' % i, 'imsi': 'IMSI' + imsi,
+                                'msisdn': '555%07d' % i, 'ki': ''}
+    # queued short messages by id
+    self.messages = {}
+    self._message_ids = 0
+    self._stop = threading.Event()
+    self._ready = threading.Event()
+    self._thread = None
+
+  def __repr__(self):
+    return 'NodeManagerSimulator at %s' % self.address
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.stop()
+
+  def start(self):
+    """Starts serving in a daemon thread, returning once bound."""
+    self._stop.clear()
+    self._ready.clear()
+    self._thread = threading.Thread(target=self.serve_forever)
+    self._thread.daemon = True
+    self._thread.start()
+    self._ready.wait()
+
+  def stop(self):
+    """Stops serving and waits for the thread to finish."""
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def serve_forever(self):
+    """Serves requests until stop is called."""
+    context = zmq.Context()
+    socket = context.socket(zmq.ROUTER)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.bind(self.address)
+    self._ready.set()
+    # heap of (due time, sequence number, frames) replies
+    scheduled = []
+    sequence = 0
+    try:
+      while not self._stop.is_set():
+        now = time.time()
+        while scheduled and scheduled[0][0] <= now:
+          socket.send_multipart(heapq.heappop(scheduled)[2])
+        wait = 50
+        if scheduled:
+          wait = min(wait, max(0, (scheduled[0][0] - now) * 1000))
+        if not socket.poll(timeout=wait):
+          continue
+        frames = socket.recv_multipart()
+        # everything up to the empty delimiter is the envelope
+        delimiter = frames.index(b'')
+        reply = self.handle(frames[-1])
+        frames = frames[:delimiter + 1] + [reply]
+        delay = self.latency + self.random.random() * self.latency_jitter
+        if delay:
+          sequence += 1
+          heapq.heappush(scheduled, (time.time() + delay, sequence, frames))
+        else:
+          socket.send_multipart(frames)
+    finally:
+      socket.close()
+      context.term()
+
+  def handle(self, raw_message):
+    """Answers one request.
+
+    Args:
+      raw_message: the json-encoded request
+
+    Returns:
+      the json-encoded reply, as bytes
+    """
+    self.requests += 1
+    try:
+      message = json.loads(raw_message)
+      if self.error_rate and self.random.random() < self.error_rate:
+        reply = {'code': 500}
+      else:
+        handler = getattr(self, '_handle_%s' % message.get('command'), None)
+        if handler is None:
+          reply = {'code': 501}
+        else:
+          reply = handler(message)
+    except ValueError:
+      reply = {'code': 400}
+    return json.dumps(reply, sort_keys=True).encode('utf-8')
+
+  def _handle_version(self, message):
+    return {'code': 200, 'data': 'release simulator'}
+
+  def _handle_config(self, message):
+    key = message.get('key', '')
+    action = message.get('action')
+    if action == 'read':
+      if key == '':
+        data = [{'key': k, 'value': v} for k, v in sorted(self.config.items())]
+        return {'code': 200, 'data': data}
+      if key not in self.config:
+        return {'code': 404}
+      return {'code': 200, 'data': {'key': key, 'value': self.config[key]},
+              'dirty': 0}
+    if action == 'update':
+      if key not in self.config:
+        return {'code': 404}
+      changed = self.config[key] != message.get('value')
+      self.config[key] = message.get('value')
+      return {'code': 204 if changed else 304, 'dirty': 0}
+    return {'code': 501}
+
+  def _handle_monitor(self, message):
+    data = {
+      'noiseRSSI': self.random.randint(-90, -60),
+      'msTargetRSSI': -50,
+      'tchActive': self.random.randint(0, 14),
+      'tchTotal': 14,
+      'sdcchActive': self.random.randint(0, 8),
+      'sdcchTotal': 8,
+      'pagingQueueSize': self.random.randint(0, 10),
+    }
+    for i in range(self.monitor_fields):
+      data['sim%s' % i] = self.random.random()
+    return {'code': 200, 'data': data}
+
+  def _handle_subscribers(self, message):
+    action = message.get('action')
+    if action == 'read':
+      match = message.get('match') or {}
+      data = [subscriber
+              for imsi, subscriber in sorted(self.subscribers.items())
+              if self._matches(imsi, subscriber, match)]
+      return {'code': 200, 'data': data}
+    if action == 'create':
+      fields = message.get('fields', {})
+      imsi = fields.get('imsi', '')
+      if imsi in self.subscribers:
+        return {'code': 409}
+      self.subscribers[imsi] = dict(fields, imsi='IMSI' + imsi)
+      return {'code': 200}
+    if action == 'delete':
+      imsi = message.get('match', {}).get('imsi', '')
+      if self.subscribers.pop(imsi, None) is None:
+        return {'code': 404}
+      return {'code': 200}
+    return {'code': 501}
+
+  def _handle_messages(self, message):
+    action = message.get('action')
+    match = message.get('match') or {}
+    matching = [queued for _, queued in sorted(self.messages.items())
+                if all(queued.get(field) == value
+                       for field, value in match.items())]
+    if action == 'read':
+      return {'code': 200, 'data': matching}
+    if action == 'create':
+      self._message_ids += 1
+      message_id = str(self._message_ids)
+      self.messages[self._message_ids] = dict(message.get('fields', {}),
+                                              id=message_id)
+      return {'code': 200, 'data': {'id': message_id}}
+    if action == 'delete':
+      for queued in matching:
+        del self.messages[int(queued['id'])]
+      return {'code': 404 if match and not matching else 200}
+    return {'code': 501}
+
+  def _matches(self, imsi, subscriber, match):
+    """Checks a subscriber against a match dict."""
+    for field, value in match.items():
+      if field == 'imsi':
+        if value not in (imsi, 'IMSI' + imsi):
+          return False
+      elif subscriber.get(field) != value:
+        return False
+    return True
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Run a NodeManager simulator.')
+  parser.add_argument('--address', default='tcp://127.0.0.1:45060')
+  parser.add_argument('--latency', type=float, default=0)
+  parser.add_argument('--latency-jitter', type=float, default=0)
+  parser.add_argument('--error-rate', type=float, default=0)
+  parser.add_argument('--config-size', type=int, default=0)
+  parser.add_argument('--subscriber-count', type=int, default=0)
+  parser.add_argument('--monitor-fields', type=int, default=0)
+  args = parser.parse_args()
+  simulator = NodeManagerSimulator(
+    args.address, latency=args.latency, latency_jitter=args.latency_jitter,
+    error_rate=args.error_rate, config_size=args.config_size,
+    subscriber_count=args.subscriber_count,
+    monitor_fields=args.monitor_fields)
+  print('serving on %s' % args.address)
+  try:
+    simulator.serve_forever()
+  except KeyboardInterrupt:
+    pass
+
+
+if __name__ == '__main__':
+  main()
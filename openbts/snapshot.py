@@ -0,0 +1,122 @@
+"""openbts.snapshot
+point-in-time copies of component config
+"""
+
+import json
+import time
+
+
+class ConfigSnapshot(object):
+  """A point-in-time copy of a component's config values.
+
+  Behaves like a read-only dict of config key to value.  Snapshots can be
+  written to and read back from json, so a fleet-wide audit can be rerun
+  against saved snapshots without contacting any node.
+
+  Args:
+    values: dict mapping config keys to their values
+    source: description of where the snapshot came from, e.g. an address
+    taken_at: unix time of the snapshot (defaults to now)
+  """
+
+  def __init__(self, values, source='', taken_at=None):
+    self.values = dict(values)
+    self.source = source
+    self.taken_at = time.time() if taken_at is None else taken_at
+
+  def __repr__(self):
+    return 'ConfigSnapshot of %s keys from %s' % (len(self), self.source)
+
+  def __len__(self):
+    return len(self.values)
+
+  def __contains__(self, key):
+    return key in self.values
+
+  def __iter__(self):
+    return iter(self.values)
+
+  def __getitem__(self, key):
+    return self.values[key]
+
+  def __eq__(self, other):
+    return (isinstance(other, ConfigSnapshot) and
+            self.values == other.values)
+
+  def __ne__(self, other):
+    return not self == other
+
+  def get(self, key, default=None):
+    """Gets a config value, or default if the key is not in the snapshot."""
+    return self.values.get(key, default)
+
+  def diff(self, other):
+    """Compares this snapshot with another one.
+
+    Args:
+      other: ConfigSnapshot (or dict of values) to compare against
+
+    Returns:
+      dict mapping each key whose value differs to a (this value, other
+      value) tuple, where a missing key has the value None
+    """
+    if isinstance(other, ConfigSnapshot):
+      other_values = other.values
+    else:
+      other_values = other
+    changes = {}
+    for key in set(self.values) | set(other_values):
+      ours, theirs = self.values.get(key), other_values.get(key)
+      if ours != theirs:
+        changes[key] = (ours, theirs)
+    return changes
+
+  def to_json(self):
+    """Serialises the snapshot to a json string."""
+    return json.dumps({
+      'source': self.source,
+      'taken_at': self.taken_at,
+      'values': self.values
+    }, sort_keys=True)
+
+  @classmethod
+  def from_json(cls, text):
+    """Loads a snapshot serialised with to_json.
+
+    Args:
+      text: json string
+
+    Returns:
+      ConfigSnapshot instance
+    """
+    data = json.loads(text)
+    return cls(data['values'], data.get('source', ''), data.get('taken_at'))
+
+  @classmethod
+  def from_response_data(cls, data, source=''):
+    """Builds a snapshot from the data of a full config read.
+
+    NodeManager may return the config either as a list of entries that each
+    have a 'key', or as a dict keyed by config key.  Entries may be plain
+    values or dicts holding a 'value'.
+
+    Args:
+      data: the data of a Response to an empty-key config read
+      source: description of where the snapshot came from
+
+    Returns:
+      ConfigSnapshot instance
+
+    Raises:
+      ValueError if the data is not a recognised config dump
+    """
+    if isinstance(data, list):
+      items = ((entry['key'], entry) for entry in data)
+    elif isinstance(data, dict):
+      items = data.items()
+    else:
+      raise ValueError('not a config dump: "%s"' % data)
+    values = {}
+    for key, entry in items:
+      values[key] = entry.get('value') if isinstance(entry, dict) else entry
+    return cls(values, source)
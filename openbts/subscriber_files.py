@@ -0,0 +1,299 @@
+"""openbts.subscriber_files
+streaming subscriber import and export files
+"""
+
+import collections
+import csv
+import io
+import mmap
+import os
+
+from openbts.results import Subscriber
+from openbts.subscribers import _normalize_imsi
+
+
+FIELDS = ('name', 'imsi', 'msisdn', 'ki')
+
+# byte widths of the fields of a fixed-width record, which ends with a newline
+FIXED_WIDTHS = (64, 20, 20, 32)
+RECORD_SIZE = sum(FIXED_WIDTHS) + 1
+
+
+class SubscriberFile(object):
+  """A memory-mapped file of subscribers, read one record at a time.
+
+  Two layouts are supported, both with one subscriber per line:
+
+  * csv: name,imsi,msisdn,ki rows, optionally below a header naming the
+    columns (e.g. name,imsi,msisdn or imsi alone for a delete list).
+  * fixed-width: records of exactly RECORD_SIZE bytes, the FIELDS padded with
+    spaces to FIXED_WIDTHS.  Record n starts at byte n * RECORD_SIZE, so any
+    record can be reached without scanning the file.
+
+  Records are sliced straight out of the mapping, so reading a file of any
+  size takes a constant amount of memory, and reading can start at any byte
+  offset a previous read reported.
+
+    with SubscriberFile('subscribers.csv') as subscriber_file:
+      for record, offset in subscriber_file.records():
+        ...
+
+  Args:
+    path: the file
+    fixed_width: True for the fixed-width layout, False for csv
+
+  Attributes:
+    size: size of the file in bytes
+    body_start: offset of the first record, after any csv header
+    columns: for csv files with a header, the column of each of FIELDS (or
+        None if it is missing)
+  """
+
+  def __init__(self, path, fixed_width=False):
+    self.path = path
+    self.fixed_width = fixed_width
+    self._file = io.open(path, 'rb')
+    self.size = os.fstat(self._file.fileno()).st_size
+    # empty files cannot be mapped
+    self._map = None
+    if self.size:
+      self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+    # without a csv header, rows are read in FIELDS order
+    self.columns = None
+    self.body_start = 0
+    if not fixed_width and self._map is not None:
+      self._read_header()
+
+  def __repr__(self):
+    return 'SubscriberFile(%r)' % self.path
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def __len__(self):
+    if not self.fixed_width:
+      raise TypeError('only fixed-width files know their length')
+    return self.size // RECORD_SIZE
+
+  def close(self):
+    """Unmaps and closes the file."""
+    if self._map is not None:
+      self._map.close()
+      self._map = None
+    self._file.close()
+
+  def offset(self, index):
+    """Gets the byte offset of a record of a fixed-width file.
+
+    Args:
+      index: the record number, from 0
+
+    Returns:
+      the offset, to pass to records
+    """
+    if not self.fixed_width:
+      raise TypeError('only fixed-width files can be indexed')
+    return index * RECORD_SIZE
+
+  def records(self, start=None, end=None):
+    """Reads records from a range of the file.
+
+    Args:
+      start: byte offset to start at, which must be the start of a line
+          (defaults to the first record)
+      end: byte offset to stop at (defaults to the end of the file)
+
+    Yields:
+      (record, offset) tuples, where record is a (name, imsi, msisdn[, ki])
+      tuple and offset is the byte offset just past it, i.e. where to resume
+      after it; csv rows with too few columns are yielded as they are
+
+    Raises:
+      ValueError if start is not the start of a fixed-width record, or if a
+      fixed-width record is truncated
+    """
+    start = self.body_start if start is None else max(start, self.body_start)
+    end = self.size if end is None else min(end, self.size)
+    if self.fixed_width and start % RECORD_SIZE:
+      raise ValueError('offset %s is not the start of a record' % start)
+    mapping = self._map
+    while start < end:
+      stop = mapping.find(b'\n', start, end)
+      stop = end if stop < 0 else stop + 1
+      line = mapping[start:stop]
+      if line.strip():
+        yield self._parse(line, start), stop
+      start = stop
+
+  def _read_header(self):
+    """Maps the columns of a csv header to FIELDS, if there is a header."""
+    stop = self._map.find(b'\n')
+    first_line = self._map[:stop + 1 if stop >= 0 else self.size]
+    if b'imsi' not in first_line.lower():
+      return
+    names = [name.strip().lower()
+             for name in next(csv.reader([first_line.decode('utf-8')]))]
+    # a subscriber merely named e.g. "Kimsi" does not make a header
+    if 'imsi' not in names:
+      return
+    self.columns = tuple(names.index(field) if field in names else None
+                         for field in FIELDS)
+    self._row_length = max([column for column in self.columns
+                            if column is not None] or [-1]) + 1
+    self.body_start = len(first_line)
+
+  def _parse(self, line, offset):
+    """Turns one line into a record tuple."""
+    if self.fixed_width:
+      if len(line) != RECORD_SIZE:
+        raise ValueError('truncated record at offset %s' % offset)
+      fields = []
+      position = 0
+      for width in FIXED_WIDTHS:
+        field = line[position:position + width]
+        fields.append(field.decode('utf-8').rstrip())
+        position += width
+      return tuple(fields)
+    row = tuple(next(csv.reader([line.decode('utf-8')])))
+    if self.columns is None or len(row) < self._row_length:
+      # rows that are too short are left for create_subscribers to reject
+      return row
+    return tuple(row[column] if column is not None else ''
+                 for column in self.columns)
+
+
+def write_subscribers(path, subscribers, fixed_width=False, append=False):
+  """Writes subscribers to a file one at a time.
+
+  Args:
+    path: the file to write
+    subscribers: iterable of subscriber dicts, results.Subscribers or
+        (name, imsi, msisdn[, ki]) tuples
+    fixed_width: True for the fixed-width layout, False for csv
+    append: if True, add to the end of the file instead of replacing it
+
+  Returns:
+    the number of subscribers written
+
+  Raises:
+    ValueError if a field does not fit its fixed width or contains a newline
+  """
+  count = 0
+  mode = 'ab' if append else 'wb'
+  with io.open(path, mode) as f:
+    if fixed_width:
+      for subscriber in subscribers:
+        f.write(_fixed_width_record(_fields(subscriber)))
+        count += 1
+      return count
+    text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+    writer = csv.writer(text, lineterminator='\n')
+    for subscriber in subscribers:
+      fields = _fields(subscriber)
+      if any('\n' in field for field in fields):
+        raise ValueError('newline in subscriber %s' % fields[1])
+      writer.writerow(fields)
+      count += 1
+    text.flush()
+    text.detach()
+  return count
+
+
+def export_subscribers(sipauthserve, path, match=None, fixed_width=False):
+  """Streams a SIPAuthServe subscriber table into a file.
+
+  The reply is decoded one subscriber at a time (see iter_subscribers) and
+  IMSIs are written without the 'IMSI' prefix, so the file can be imported
+  into another node as is.
+
+  Args:
+    sipauthserve: SIPAuthServe component to read from
+    path: the file to write
+    match: optional dict of subscriber fields to filter by
+    fixed_width: True for the fixed-width layout, False for csv
+
+  Returns:
+    the number of subscribers exported
+  """
+  return write_subscribers(
+    path, sipauthserve.iter_subscribers(match=match, typed=True),
+    fixed_width=fixed_width)
+
+
+def import_subscribers(sipauthserve, path, fixed_width=False, start=None,
+                       max_in_flight=64, callback=None, progress=None):
+  """Creates the subscribers of a file, resumably.
+
+  Records go straight from the mapped file to create_subscribers.  As
+  replies come in, progress is called with the offset up to which every
+  record has been answered.  If the import is interrupted, pass the last
+  offset seen as start to carry on from there.
+
+  Args:
+    sipauthserve: SIPAuthServe component to create the subscribers on; use a
+        pipelined component to keep max_in_flight requests outstanding
+    path: the file to read
+    fixed_width: True for the fixed-width layout, False for csv
+    start: byte offset to resume from
+    max_in_flight: max number of outstanding requests
+    callback: optional callable invoked as callback(record, result) for
+        every record, where result is a Response or an exception
+    progress: optional callable invoked with the resume offset
+
+  Returns:
+    BatchReport instance
+  """
+  # maps each record sent to [offset past it, answered, record], in file
+  # order; holding the record keeps its id from being reused
+  pending = collections.OrderedDict()
+
+  def records(subscriber_file):
+    for record, offset in subscriber_file.records(start):
+      pending[id(record)] = [offset, False, record]
+      yield record
+
+  def record_result(record, result):
+    pending[id(record)][1] = True
+    resume = None
+    while pending:
+      offset, answered, _ = next(iter(pending.values()))
+      if not answered:
+        break
+      pending.popitem(last=False)
+      resume = offset
+    if callback:
+      callback(record, result)
+    if progress and resume is not None:
+      progress(resume)
+
+  with SubscriberFile(path, fixed_width) as subscriber_file:
+    return sipauthserve.create_subscribers(records(subscriber_file),
+                                           max_in_flight, record_result)
+
+
+def _fields(subscriber):
+  """Gets the (name, imsi, msisdn, ki) strings of a subscriber."""
+  if isinstance(subscriber, Subscriber):
+    fields = subscriber.to_tuple()
+  elif isinstance(subscriber, dict):
+    fields = tuple(subscriber.get(field) or '' for field in FIELDS)
+  else:
+    fields = tuple(subscriber) + ('',) * (4 - len(subscriber))
+  fields = tuple(str(field) for field in fields)
+  return (fields[0], _normalize_imsi(fields[1])) + fields[2:]
+
+
+def _fixed_width_record(fields):
+  """Packs subscriber fields into one fixed-width record."""
+  record = []
+  for field, width in zip(fields, FIXED_WIDTHS):
+    encoded = field.encode('utf-8')
+    if len(encoded) > width or b'\n' in encoded:
+      raise ValueError('field "%s" does not fit a %s byte column' % (field,
+                                                                     width))
+    record.append(encoded.ljust(width))
+  record.append(b'\n')
+  return b''.join(record)
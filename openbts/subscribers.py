@@ -0,0 +1,136 @@
+"""openbts.subscribers
+client-side index of SIPAuthServe subscribers
+"""
+
+
+def _normalize_imsi(imsi):
+  """Strips the 'IMSI' prefix SIPAuthServe may put on stored IMSIs."""
+  imsi = str(imsi)
+  if imsi.startswith('IMSI'):
+    return imsi[4:]
+  return imsi
+
+
+class SubscriberIndex(object):
+  """An in-memory index of the subscribers known to a SIPAuthServe.
+
+  Lookups by IMSI or MSISDN are dict lookups, so checking whether a
+  subscriber exists no longer costs a full subscriber dump.  Each subscriber
+  is stored as a (name, msisdn, ki) tuple keyed by IMSI, with a second dict
+  mapping MSISDNs back to IMSIs.  IMSIs are stored without the 'IMSI'
+  prefix, matching what create_subscriber expects.
+
+  Args:
+    sipauthserve: SIPAuthServe component to load and sync subscribers with
+  """
+
+  def __init__(self, sipauthserve):
+    self.sipauthserve = sipauthserve
+    self._by_imsi = {}
+    self._by_msisdn = {}
+
+  def __repr__(self):
+    return 'SubscriberIndex of %s subscribers' % len(self)
+
+  def __len__(self):
+    return len(self._by_imsi)
+
+  def __contains__(self, imsi):
+    return _normalize_imsi(imsi) in self._by_imsi
+
+  def __iter__(self):
+    return iter(self._by_imsi)
+
+  def refresh(self):
+    """Reloads the index from the component's subscriber table.
+
+    Returns:
+      the number of subscribers loaded
+    """
+    self._by_imsi = {}
+    self._by_msisdn = {}
+    for subscriber in self.sipauthserve.iter_subscribers():
+      self._add(subscriber.get('name', ''), subscriber['imsi'],
+                subscriber.get('msisdn', ''), subscriber.get('ki') or '')
+    return len(self)
+
+  def get(self, imsi):
+    """Gets a subscriber by IMSI.
+
+    Args:
+      imsi: IMSI of the subscriber, with or without the 'IMSI' prefix
+
+    Returns:
+      dict with 'name', 'imsi', 'msisdn' and 'ki' keys, or None
+    """
+    imsi = _normalize_imsi(imsi)
+    entry = self._by_imsi.get(imsi)
+    if entry is None:
+      return None
+    name, msisdn, ki = entry
+    return {'name': name, 'imsi': imsi, 'msisdn': msisdn, 'ki': ki}
+
+  def msisdn_for_imsi(self, imsi):
+    """Gets the MSISDN of a subscriber, or None if the IMSI is unknown."""
+    entry = self._by_imsi.get(_normalize_imsi(imsi))
+    return entry[1] if entry else None
+
+  def imsi_for_msisdn(self, msisdn):
+    """Gets the IMSI of a subscriber, or None if the MSISDN is unknown."""
+    return self._by_msisdn.get(str(msisdn))
+
+  def sync(self, desired, delete_extra=True, max_in_flight=64):
+    """Makes the component's subscribers match a desired state.
+
+    Only the differences are sent: subscribers missing from the index are
+    created, subscribers whose name, MSISDN or ki changed are deleted and
+    recreated, and (if delete_extra) indexed subscribers absent from the
+    desired state are deleted.  Call refresh first if the index may be
+    stale.  The index is updated with every change that succeeded.
+
+    Args:
+      desired: iterable of subscriber records, in any format accepted by
+          SIPAuthServe.create_subscribers
+      delete_extra: whether to delete subscribers not in the desired state
+      max_in_flight: max number of outstanding requests
+
+    Returns:
+      (delete_report, create_report) tuple of BatchReports
+    """
+    wanted = {}
+    for record in desired:
+      name, imsi, msisdn, ki = self.sipauthserve._subscriber_fields(record)
+      wanted[_normalize_imsi(imsi)] = (name, msisdn, ki)
+    to_create = [imsi for imsi, entry in wanted.items()
+                 if self._by_imsi.get(imsi) != entry]
+    to_delete = [imsi for imsi in to_create if imsi in self._by_imsi]
+    if delete_extra:
+      to_delete.extend(imsi for imsi in self._by_imsi if imsi not in wanted)
+
+    def deleted(imsi, result):
+      if not isinstance(result, Exception):
+        self._remove(imsi)
+    delete_report = self.sipauthserve.delete_subscribers(
+        to_delete, max_in_flight=max_in_flight, callback=deleted)
+
+    def created(record, result):
+      if not isinstance(result, Exception):
+        self._add(*record)
+    records = ((wanted[imsi][0], imsi) + wanted[imsi][1:]
+               for imsi in to_create if imsi not in self._by_imsi)
+    create_report = self.sipauthserve.create_subscribers(
+        records, max_in_flight=max_in_flight, callback=created)
+    return delete_report, create_report
+
+  def _add(self, name, imsi, msisdn, ki):
+    """Adds a subscriber to the index."""
+    imsi = _normalize_imsi(imsi)
+    self._remove(imsi)
+    self._by_imsi[imsi] = (name, str(msisdn), ki)
+    self._by_msisdn[str(msisdn)] = imsi
+
+  def _remove(self, imsi):
+    """Removes a subscriber from the index, if present."""
+    entry = self._by_imsi.pop(imsi, None)
+    if entry is not None and self._by_msisdn.get(entry[1]) == imsi:
+      del self._by_msisdn[entry[1]]
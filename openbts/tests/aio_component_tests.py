@@ -0,0 +1,174 @@
+"""openbts.tests.aio_component_tests
+tests for the asyncio components
+"""
+
+import asyncio
+import json
+import unittest
+
+import mock
+
+from openbts.aio import (AsyncExperimentalSMQueue, AsyncOpenBTS,
+                         AsyncSIPAuthServe)
+from openbts.exceptions import InvalidRequestError, TimeoutError
+
+
+def mock_async_socket(reply=None, poll=1):
+  """Make a mock zmq.asyncio socket that answers every request with reply."""
+  socket = mock.Mock()
+  socket.send = mock.AsyncMock()
+  socket.poll = mock.AsyncMock(return_value=poll)
+  socket.recv = mock.AsyncMock(return_value=json.dumps(reply).encode('utf-8'))
+  return socket
+
+
+class AsyncOpenBTSTestCase(unittest.TestCase):
+  """Testing the aio.AsyncOpenBTS class."""
+
+  def setUp(self):
+    self.openbts_connection = AsyncOpenBTS()
+    self.openbts_connection.socket = mock_async_socket({
+      'code': 200,
+      'data': {'noiseRSSI': -67}
+    })
+
+  def test_monitor(self):
+    """Awaiting 'monitor' should send a message and return a Response."""
+    response = asyncio.run(self.openbts_connection.monitor())
+    expected_message = json.dumps({
+      'command': 'monitor',
+      'action': '',
+      'key': '',
+      'value': ''
+    }).encode('utf-8')
+    self.assertEqual(self.openbts_connection.socket.send.call_args[0],
+                     (expected_message,))
+    self.assertEqual(response.data['noiseRSSI'], -67)
+
+  def test_read_config_unknown_key(self):
+    """Error codes should raise the same exceptions as the sync client."""
+    self.openbts_connection.socket = mock_async_socket({'code': 404})
+    with self.assertRaises(InvalidRequestError):
+      asyncio.run(self.openbts_connection.read_config('nonexistent-key'))
+
+  def test_monitor_sample(self):
+    sample = asyncio.run(self.openbts_connection.monitor_sample())
+    self.assertEqual(sample.noiseRSSI, -67)
+
+  def test_read_config_value(self):
+    self.openbts_connection.socket = mock_async_socket({
+      'code': 200,
+      'data': {'value': '51'}
+    })
+    value = asyncio.run(self.openbts_connection.read_config_value('GSM.C0'))
+    self.assertEqual(value.value, '51')
+
+  def test_read_configs(self):
+    """Reads should be awaited one by one, each key once."""
+    self.openbts_connection.socket = mock_async_socket({
+      'code': 200,
+      'data': {'value': '51'}
+    })
+    results = asyncio.run(self.openbts_connection.read_configs(
+      ['GSM.C0', 'GSM.MCC', 'GSM.C0']))
+    self.assertEqual(sorted(results), ['GSM.C0', 'GSM.MCC'])
+    self.assertEqual(results['GSM.MCC'].data['value'], '51')
+    self.assertEqual(self.openbts_connection.socket.send.call_count, 2)
+
+  def test_snapshot(self):
+    self.openbts_connection.socket = mock_async_socket({
+      'code': 200,
+      'data': {'GSM.C0': {'value': '51'}}
+    })
+    snapshot = asyncio.run(self.openbts_connection.snapshot())
+    self.assertEqual(snapshot.get('GSM.C0'), '51')
+
+  def test_apply_config_not_available(self):
+    with self.assertRaises(NotImplementedError):
+      self.openbts_connection.apply_config([('GSM.C0', '51')])
+    self.assertFalse(self.openbts_connection.socket.send.called)
+
+  def test_watch_not_available(self):
+    with self.assertRaises(NotImplementedError):
+      self.openbts_connection.watch(['GSM.C0'], lambda changes: None)
+
+
+class AsyncSIPAuthServeTestCase(unittest.TestCase):
+  """Testing the aio.AsyncSIPAuthServe class."""
+
+  def test_concurrent_requests(self):
+    """Requests gathered on one component should each get a response."""
+    connection = AsyncSIPAuthServe()
+    connection.socket = mock_async_socket({'code': 200, 'data': []})
+    async def gather():
+      return await asyncio.gather(connection.get_subscribers(),
+                                  connection.get_version())
+    responses = asyncio.run(gather())
+    self.assertEqual([r.code for r in responses], [200, 200])
+    self.assertEqual(connection.socket.send.call_count, 2)
+
+  def test_timeout(self):
+    """No reply within socket_timeout should raise a TimeoutError."""
+    connection = AsyncSIPAuthServe(socket_timeout=0.01)
+    connection.socket = mock_async_socket(poll=0)
+    with self.assertRaises(TimeoutError):
+      asyncio.run(connection.get_version())
+
+  def test_batches(self):
+    """Batched calls should await every request and count the results."""
+    connection = AsyncSIPAuthServe()
+    connection.socket = mock_async_socket({'code': 200})
+    records = [('sample', '000000000000001', '5551234'), ('broken',)]
+    report = asyncio.run(connection.create_subscribers(records))
+    self.assertEqual((report.succeeded, report.failed), (1, 1))
+    report = asyncio.run(connection.delete_subscribers(
+      ['000000000000001', '000000000000002']))
+    self.assertEqual((report.succeeded, report.failed), (2, 0))
+    self.assertEqual(connection.socket.send.call_count, 3)
+
+  def test_batch_errors_are_reported(self):
+    connection = AsyncSIPAuthServe()
+    connection.socket = mock_async_socket({'code': 409})
+    results = []
+    report = asyncio.run(connection.create_subscribers(
+      [('sample', '000000000000001', '5551234')],
+      callback=lambda record, result: results.append(result)))
+    self.assertEqual(report.failed, 1)
+    self.assertIsInstance(results[0], InvalidRequestError)
+
+  def test_iter_subscribers(self):
+    connection = AsyncSIPAuthServe()
+    connection.socket = mock_async_socket({
+      'code': 200,
+      'data': [{'name': 'ada', 'imsi': 'IMSI000000000000001',
+                'msisdn': '5551234', 'ki': ''}]
+    })
+    async def collect():
+      return [s async for s in connection.iter_subscribers(typed=True)]
+    subscribers = asyncio.run(collect())
+    self.assertEqual([s.name for s in subscribers], ['ada'])
+
+
+class AsyncExperimentalSMQueueTestCase(unittest.TestCase):
+  """Testing the aio.AsyncExperimentalSMQueue class."""
+
+  def setUp(self):
+    self.connection = AsyncExperimentalSMQueue()
+    self.connection.socket = mock_async_socket({
+      'code': 200,
+      'data': [{'id': 1}, {'id': 2}]
+    })
+
+  def test_count_messages(self):
+    self.assertEqual(asyncio.run(self.connection.count_messages()), 2)
+
+  def test_submit_messages(self):
+    report = asyncio.run(self.connection.submit_messages(
+      [('5551234', '5555678', 'hi')] * 2))
+    self.assertEqual(report.succeeded, 2)
+    self.assertEqual(self.connection.socket.send.call_count, 2)
+
+  def test_iter_messages(self):
+    async def collect():
+      return [m['id'] async for m in self.connection.iter_messages()]
+    self.assertEqual(asyncio.run(collect()), [1, 2])
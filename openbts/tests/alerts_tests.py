@@ -0,0 +1,76 @@
+"""openbts.tests.alerts_tests
+tests for alerting on monitor data
+"""
+
+import threading
+import unittest
+
+import mock
+
+from openbts.alerts import AlertEngine, Rule
+from openbts.core import Response
+from openbts.exceptions import TimeoutError
+from openbts.monitoring import MonitorPoller
+
+
+class AlertEngineTestCase(unittest.TestCase):
+  """Testing the alerts.AlertEngine class."""
+
+  def setUp(self):
+    self.alerts = []
+    self.engine = AlertEngine([
+      Rule('noisy', 'noiseRSSI', above=-60, for_ticks=2),
+      Rule('load-spike', 'tch.active', rate_above=5),
+    ], self.alerts.append)
+
+  def test_threshold_is_debounced(self):
+    """A threshold rule should fire once after for_ticks breaches."""
+    for timestamp, value in enumerate([-70, -55, -70, -55, -50, -52]):
+      self.engine.evaluate('bts1', {'noiseRSSI': value}, timestamp)
+    self.assertEqual(len(self.alerts), 1)
+    self.assertEqual(self.alerts[0].value, -50)
+    self.assertEqual(self.engine.firing(), set([('bts1', 'noisy')]))
+
+  def test_concurrent_evaluation_fires_once(self):
+    """Samples evaluated from many threads should fire a single alert."""
+    def evaluate():
+      for timestamp in range(200):
+        self.engine.evaluate('bts1', {'noiseRSSI': -50}, timestamp)
+    threads = [threading.Thread(target=evaluate) for _ in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(len(self.alerts), 1)
+
+  def test_resolves(self):
+    """A firing rule should send a resolved alert once it recovers."""
+    for timestamp, value in enumerate([-55, -55, -70, -70]):
+      self.engine.evaluate('bts1', {'noiseRSSI': value}, timestamp)
+    self.assertEqual([a.resolved for a in self.alerts], [False, True])
+
+  def test_rate_of_change_per_node(self):
+    """Rates should be computed per node from consecutive samples."""
+    self.engine.evaluate('bts1', {'tch.active': 0}, 0)
+    self.engine.evaluate('bts2', {'tch.active': 20}, 0)
+    self.engine.evaluate('bts1', {'tch.active': 2}, 1)
+    self.engine.evaluate('bts2', {'tch.active': 30}, 1)
+    self.assertEqual([a.node for a in self.alerts], ['bts2'])
+
+  def test_evaluate_responses(self):
+    """Monitor results from a fleet should be evaluated, errors skipped."""
+    results = [
+      ('bts1', Response.from_data(200, {'noiseRSSI': -50})),
+      ('bts2', TimeoutError('did not receive a response')),
+    ]
+    self.engine.evaluate_responses(results, 0)
+    self.engine.evaluate_responses(results, 1)
+    self.assertEqual([a.node for a in self.alerts], ['bts1'])
+
+  def test_attach_to_poller(self):
+    """Samples recorded by an attached poller should be evaluated."""
+    poller = MonitorPoller(mock.Mock())
+    self.engine.attach(poller, 'bts1')
+    poller.record({'noiseRSSI': -50}, 0)
+    poller.record({'noiseRSSI': -50}, 1)
+    self.assertEqual(len(self.alerts), 1)
@@ -0,0 +1,84 @@
+"""openbts.tests.apply_config_tests
+tests for transactional config updates
+"""
+
+import json
+import unittest
+
+import mock
+
+from openbts.components import OpenBTS
+from openbts.exceptions import ConfigTransactionError, InvalidRequestError
+
+
+class OpenBTSApplyConfigTestCase(unittest.TestCase):
+  """Testing apply_config on the components.OpenBTS class."""
+
+  def setUp(self):
+    self.openbts_connection = OpenBTS()
+    self.openbts_connection.socket = mock.Mock()
+    self.config = {'GSM.Radio.C0': '51', 'Control.NumSQLTries': '3',
+                   'GSM.Identity.MCC': '001'}
+    self.updates = []
+    def recv():
+      message = json.loads(self.openbts_connection.socket.send.call_args[0][0])
+      key, value = message['key'], message['value']
+      if key not in self.config:
+        return json.dumps({'code': 404})
+      if message['action'] == 'read':
+        return json.dumps({'code': 200,
+                           'data': {'key': key, 'value': self.config[key]}})
+      if value == 'bogus':
+        return json.dumps({'code': 406})
+      self.updates.append((key, value))
+      self.config[key] = value
+      return json.dumps({'code': 204, 'dirty': key == 'GSM.Radio.C0'})
+    self.openbts_connection.socket.recv.side_effect = recv
+
+  def test_apply_config(self):
+    """All changes should be applied and dirty keys reported."""
+    report = self.openbts_connection.apply_config(
+        [('GSM.Radio.C0', 60), ('Control.NumSQLTries', 6)])
+    self.assertEqual(self.config['GSM.Radio.C0'], '60')
+    self.assertEqual(self.config['Control.NumSQLTries'], '6')
+    self.assertEqual(report.original,
+                     {'GSM.Radio.C0': '51', 'Control.NumSQLTries': '3'})
+    self.assertEqual(report.dirty, ['GSM.Radio.C0'])
+
+  def test_failed_update_rolls_back(self):
+    """A rejected update should stop the batch and revert earlier changes."""
+    with self.assertRaises(ConfigTransactionError) as context:
+      self.openbts_connection.apply_config([
+        ('GSM.Radio.C0', 60),
+        ('Control.NumSQLTries', 'bogus'),
+        ('GSM.Identity.MCC', '310'),
+      ])
+    self.assertEqual(context.exception.key, 'Control.NumSQLTries')
+    self.assertEqual(self.config['GSM.Radio.C0'], '51')
+    self.assertEqual(self.config['GSM.Identity.MCC'], '001')
+    self.assertEqual(self.updates, [('GSM.Radio.C0', '60'),
+                                    ('GSM.Radio.C0', '51')])
+    self.assertEqual(context.exception.report.rolled_back, ['GSM.Radio.C0'])
+
+  def test_unknown_key_changes_nothing(self):
+    """If an original value cannot be read, nothing should be updated."""
+    with self.assertRaises(InvalidRequestError):
+      self.openbts_connection.apply_config({'GSM.Radio.C0': 60,
+                                            'nonexistent-key': 1})
+    self.assertEqual(self.updates, [])
+
+  def test_rollback_ignores_config_cache(self):
+    """Originals should be read live, not from a stale cache entry."""
+    recv = self.openbts_connection.socket.recv.side_effect
+    self.openbts_connection = OpenBTS(config_cache_ttl=60)
+    self.openbts_connection.socket = mock.Mock()
+    self.openbts_connection.socket.recv.side_effect = recv
+    self.openbts_connection.read_config('GSM.Radio.C0')
+    # the value changes behind the cache's back
+    self.config['GSM.Radio.C0'] = '60'
+    with self.assertRaises(ConfigTransactionError):
+      self.openbts_connection.apply_config([
+        ('GSM.Radio.C0', '70'),
+        ('Control.NumSQLTries', 'bogus'),
+      ])
+    self.assertEqual(self.config['GSM.Radio.C0'], '60')
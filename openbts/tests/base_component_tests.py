@@ -4,13 +4,17 @@ tests for the base component class
 
 import json
 from multiprocessing import Process
+import threading
 import time
 import unittest
 
+import mock
 import zmq
 
-from openbts.core import BaseComponent
-from openbts.exceptions import TimeoutError
+from openbts.components import SIPAuthServe
+from openbts.core import BaseComponent, SocketPool
+from openbts.exceptions import InvalidRequestError, TimeoutError
+from openbts.simulator import NodeManagerSimulator
 
 
 class BaseComponentTestCase(unittest.TestCase):
@@ -54,3 +58,185 @@ class BaseComponentTestCase(unittest.TestCase):
     component.socket.connect(self.DEMO_ADDRESS)
     with self.assertRaises(TimeoutError):
       component.read_config('sample-key')
+
+
+class SocketPoolTestCase(unittest.TestCase):
+  """Testing the core.SocketPool class and how components use it."""
+
+  ADDRESS = 'tcp://127.0.0.1:7891'
+
+  def setUp(self):
+    self.pool = SocketPool(max_idle=1)
+
+  def tearDown(self):
+    self.pool.clear()
+
+  def test_checkin_then_checkout_reuses_socket(self):
+    """A checked-in socket should be handed out again for the same address."""
+    socket = self.pool.checkout(self.ADDRESS)
+    self.pool.checkin(self.ADDRESS, socket)
+    self.assertIs(self.pool.checkout(self.ADDRESS), socket)
+
+  def test_checkin_beyond_max_idle_closes_socket(self):
+    """Sockets beyond max_idle should be closed rather than kept."""
+    socket_a = self.pool.checkout(self.ADDRESS)
+    socket_b = self.pool.checkout(self.ADDRESS)
+    self.pool.checkin(self.ADDRESS, socket_a)
+    self.pool.checkin(self.ADDRESS, socket_b)
+    self.assertFalse(socket_a.closed)
+    self.assertTrue(socket_b.closed)
+
+  def test_components_share_pooled_socket(self):
+    """Closing a component should let the next one reuse its socket."""
+    component = SIPAuthServe(address=self.ADDRESS, socket_pool=self.pool)
+    socket = component.socket
+    component.close()
+    with SIPAuthServe(address=self.ADDRESS, socket_pool=self.pool) as other:
+      self.assertIs(other.socket, socket)
+    self.assertIs(self.pool.checkout(self.ADDRESS), socket)
+
+  def test_socket_awaiting_reply_is_not_pooled(self):
+    """A socket still waiting on a reply should be closed, not checked in."""
+    component = SIPAuthServe(address=self.ADDRESS, socket_pool=self.pool)
+    socket = component.socket
+    component._awaiting_reply = True
+    component.close()
+    self.assertTrue(socket.closed)
+    self.assertIsNot(self.pool.checkout(self.ADDRESS), socket)
+
+
+class BaseComponentReconnectTestCase(unittest.TestCase):
+  """Testing how core.BaseComponent recovers from timeouts."""
+
+  ADDRESS = 'tcp://127.0.0.1:7892'
+
+  def setUp(self):
+    self.pool = mock.Mock()
+    self.stale_socket = mock.Mock()
+    self.stale_socket.poll.return_value = 0
+    self.fresh_socket = mock.Mock()
+    self.fresh_socket.poll.return_value = 1
+    self.fresh_socket.recv.return_value = json.dumps({'code': 200})
+    self.pool.checkout.side_effect = [self.stale_socket, self.fresh_socket]
+
+  def test_timeout_replaces_socket(self):
+    """After a timeout the stale socket is closed and a fresh one is used."""
+    component = BaseComponent(address=self.ADDRESS, socket_pool=self.pool)
+    with self.assertRaises(TimeoutError):
+      component.read_config('sample-key')
+    self.assertTrue(self.stale_socket.close.called)
+    self.assertIs(component.socket, self.fresh_socket)
+    self.assertEqual(component.read_config('sample-key').code, 200)
+
+  def test_timeout_with_retries(self):
+    """A timed out request is resent on the fresh socket when retrying."""
+    component = BaseComponent(address=self.ADDRESS, socket_pool=self.pool,
+                              retries=1, retry_backoff=0)
+    response = component.read_config('sample-key')
+    self.assertEqual(response.code, 200)
+    self.assertTrue(self.stale_socket.send.called)
+    self.assertTrue(self.fresh_socket.send.called)
+
+
+class BaseComponentPipelineTestCase(unittest.TestCase):
+  """Testing pipelined requests over a DEALER socket."""
+
+  ADDRESS = 'tcp://127.0.0.1:7893'
+
+  def setUp(self):
+    self.socket = mock.Mock()
+    self.socket.poll.return_value = 1
+    self.pool = mock.Mock()
+    self.pool.checkout.return_value = self.socket
+    self.component = BaseComponent(address=self.ADDRESS, socket_pool=self.pool,
+                                   pipelined=True)
+
+  def reply_in_reverse(self, codes):
+    """Have the mock socket answer the sent requests in reverse order."""
+    def recv_multipart():
+      sent = [c[0][0][0] for c in self.socket.send_multipart.call_args_list]
+      request_id = sent[-1 - self.socket.recv_multipart.call_count + 1]
+      code = codes[sent.index(request_id)]
+      return [request_id, b'', json.dumps({'code': code, 'data': code})]
+    self.socket.recv_multipart.side_effect = recv_multipart
+
+  def test_replies_matched_to_requests(self):
+    """Out-of-order replies should be matched to their requests by id."""
+    self.reply_in_reverse([200, 204, 304])
+    messages = [{'command': 'version'}] * 3
+    results = dict(self.component._pipeline(messages))
+    self.assertEqual(self.socket.send_multipart.call_count, 3)
+    self.assertEqual([results[i].data for i in range(3)], [200, 204, 304])
+
+  def test_errors_do_not_stop_the_batch(self):
+    """A failed request should be yielded as an exception instance."""
+    self.reply_in_reverse([404, 200])
+    results = dict(self.component._pipeline([{}, {}]))
+    self.assertIsInstance(results[0], InvalidRequestError)
+    self.assertEqual(results[1].code, 200)
+
+  def test_send_and_receive_raises_errors(self):
+    """Single requests on a pipelined component still raise errors."""
+    self.reply_in_reverse([404])
+    with self.assertRaises(InvalidRequestError):
+      self.component.read_config('sample-key')
+
+  def test_timeout_yields_errors_for_pending_requests(self):
+    """Requests outstanding when the socket times out yield TimeoutErrors."""
+    self.socket.poll.return_value = 0
+    results = list(self.component._pipeline([{}, {}]))
+    self.assertEqual([index for index, _ in results], [0, 1])
+    for _, result in results:
+      self.assertIsInstance(result, TimeoutError)
+
+
+class BaseComponentThreadSafeTestCase(unittest.TestCase):
+  """Testing components shared between threads."""
+
+  ADDRESS = 'tcp://127.0.0.1:7898'
+
+  def setUp(self):
+    self.simulator = NodeManagerSimulator(self.ADDRESS, latency=0.001)
+    self.simulator.start()
+    self.pool = SocketPool()
+    self.component = BaseComponent(address=self.ADDRESS, socket_pool=self.pool,
+                                   codec='json-utf8', socket_timeout=2,
+                                   thread_safe=True)
+
+  def tearDown(self):
+    self.component.close()
+    self.pool.clear()
+    self.simulator.stop()
+
+  def run_threads(self, count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+  def test_concurrent_requests(self):
+    """Threads sharing a component should each get their own socket."""
+    errors = []
+    sockets = set()
+    def work():
+      sockets.add(self.component.socket)
+      for _ in range(20):
+        try:
+          self.component.get_version()
+        except Exception as e:
+          errors.append(e)
+    self.run_threads(4, work)
+    self.assertEqual(errors, [])
+    self.assertEqual(len(sockets), 4)
+
+  def test_sockets_of_exited_threads_are_released(self):
+    """A new thread should return the sockets of exited threads."""
+    self.run_threads(3, self.component.get_version)
+    self.component.get_version()
+    self.assertEqual(len(self.component._thread_states), 1)
+    self.assertEqual(len(self.pool._idle[(self.ADDRESS, zmq.REQ)]), 3)
+
+  def test_requires_address(self):
+    with self.assertRaises(ValueError):
+      BaseComponent(thread_safe=True)
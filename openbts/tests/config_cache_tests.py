@@ -0,0 +1,102 @@
+"""openbts.tests.config_cache_tests
+tests for caching config reads
+"""
+
+import json
+import unittest
+
+import mock
+
+from openbts.cache import ConfigCache
+from openbts.components import SMQueue
+from openbts.exceptions import InvalidRequestError
+
+
+class FakeClock(object):
+  """A clock that only moves when told to."""
+
+  def __init__(self):
+    self.now = 0
+
+  def __call__(self):
+    return self.now
+
+
+class ConfigCacheTestCase(unittest.TestCase):
+  """Testing the cache.ConfigCache class."""
+
+  def setUp(self):
+    self.clock = FakeClock()
+    self.cache = ConfigCache(ttl=10, max_size=2, clock=self.clock)
+
+  def test_entries_expire(self):
+    """Entries older than the ttl should be misses."""
+    self.cache.put('a', 'response-a')
+    self.assertEqual(self.cache.get('a'), 'response-a')
+    self.clock.now = 10
+    self.assertIsNone(self.cache.get('a'))
+    self.assertEqual(self.cache.stats(),
+                     {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 0})
+
+  def test_least_recently_used_entry_is_evicted(self):
+    """A full cache should evict its least recently used entry."""
+    self.cache.put('a', 'response-a')
+    self.cache.put('b', 'response-b')
+    self.cache.get('a')
+    self.cache.put('c', 'response-c')
+    self.assertIn('a', self.cache)
+    self.assertNotIn('b', self.cache)
+    self.assertEqual(self.cache.evictions, 1)
+
+
+class ComponentConfigCacheTestCase(unittest.TestCase):
+  """Testing read_config and update_config on a component with a cache."""
+
+  def setUp(self):
+    self.smqueue_connection = SMQueue(config_cache_ttl=60)
+    self.smqueue_connection.socket = mock.Mock()
+    self.smqueue_connection.socket.recv.return_value = json.dumps({
+      'code': 200,
+      'data': {'key': 'Bounce.Code', 'value': '101'}
+    })
+
+  def test_repeated_reads_are_cached(self):
+    """Reading the same key twice should only send one request."""
+    self.smqueue_connection.read_config('Bounce.Code')
+    response = self.smqueue_connection.read_config('Bounce.Code')
+    self.assertEqual(self.smqueue_connection.socket.send.call_count, 1)
+    self.assertEqual(response.data['value'], '101')
+    self.assertEqual(self.smqueue_connection.config_cache.hits, 1)
+
+  def test_update_writes_through(self):
+    """A clean update should change the cached value."""
+    self.smqueue_connection.read_config('Bounce.Code')
+    self.smqueue_connection.socket.recv.return_value = json.dumps({
+      'code': 204,
+      'dirty': 0
+    })
+    self.smqueue_connection.update_config('Bounce.Code', 555)
+    response = self.smqueue_connection.read_config('Bounce.Code')
+    self.assertEqual(self.smqueue_connection.socket.send.call_count, 2)
+    self.assertEqual(response.data['value'], '555')
+
+  def test_dirty_update_invalidates(self):
+    """A dirty update should drop the key so the next read goes to NM."""
+    self.smqueue_connection.read_config('Bounce.Code')
+    self.smqueue_connection.socket.recv.return_value = json.dumps({
+      'code': 204,
+      'dirty': 1
+    })
+    self.smqueue_connection.update_config('Bounce.Code', 555)
+    self.assertNotIn('Bounce.Code', self.smqueue_connection.config_cache)
+
+  def test_failed_update_keeps_cache(self):
+    """A rejected update should leave the cached value alone."""
+    self.smqueue_connection.read_config('Bounce.Code')
+    self.smqueue_connection.socket.recv.return_value = json.dumps({
+      'code': 406
+    })
+    with self.assertRaises(InvalidRequestError):
+      self.smqueue_connection.update_config('Bounce.Code', 'bogus')
+    response = self.smqueue_connection.read_config('Bounce.Code')
+    self.assertEqual(response.data['value'], '101')
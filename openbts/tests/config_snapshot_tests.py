@@ -0,0 +1,87 @@
+"""openbts.tests.config_snapshot_tests
+tests for bulk config reads and config snapshots
+"""
+
+import json
+import unittest
+
+import mock
+
+from openbts.components import OpenBTS
+from openbts.exceptions import InvalidRequestError
+from openbts.snapshot import ConfigSnapshot
+
+
+class OpenBTSReadConfigsTestCase(unittest.TestCase):
+  """Testing read_configs and snapshot on the components.OpenBTS class."""
+
+  def setUp(self):
+    self.openbts_connection = OpenBTS()
+    self.openbts_connection.socket = mock.Mock()
+    self.config = {'GSM.Radio.C0': '51', 'Control.NumSQLTries': '3'}
+    def recv():
+      message = json.loads(self.openbts_connection.socket.send.call_args[0][0])
+      key = message['key']
+      if key == '':
+        data = [{'key': k, 'value': v} for k, v in self.config.items()]
+        return json.dumps({'code': 200, 'data': data})
+      if key in self.config:
+        return json.dumps({'code': 200,
+                           'data': {'key': key, 'value': self.config[key]}})
+      return json.dumps({'code': 404})
+    self.openbts_connection.socket.recv.side_effect = recv
+
+  def test_read_configs(self):
+    """Each key should map to its response, or to the error it raised."""
+    results = self.openbts_connection.read_configs(
+        ['GSM.Radio.C0', 'nonexistent-key'])
+    self.assertEqual(results['GSM.Radio.C0'].data['value'], '51')
+    self.assertIsInstance(results['nonexistent-key'], InvalidRequestError)
+
+  def test_read_configs_dedupes_keys(self):
+    """Keys given more than once should only be read once."""
+    results = self.openbts_connection.read_configs(
+        ['GSM.Radio.C0', 'Control.NumSQLTries', 'GSM.Radio.C0'])
+    self.assertEqual(self.openbts_connection.socket.send.call_count, 2)
+    self.assertEqual(len(results), 2)
+
+  def test_snapshot(self):
+    """A snapshot should hold every config value from one request."""
+    snapshot = self.openbts_connection.snapshot()
+    self.assertEqual(self.openbts_connection.socket.send.call_count, 1)
+    self.assertEqual(snapshot['GSM.Radio.C0'], '51')
+    self.assertEqual(len(snapshot), 2)
+
+  def test_snapshot_falls_back_to_keys(self):
+    """If the full read is rejected, the given keys should be read."""
+    self.openbts_connection.socket.recv.side_effect = [
+      json.dumps({'code': 404}),
+      json.dumps({'code': 200, 'data': {'value': '51'}}),
+    ]
+    snapshot = self.openbts_connection.snapshot(keys=['GSM.Radio.C0'])
+    self.assertEqual(snapshot.values, {'GSM.Radio.C0': '51'})
+
+
+class ConfigSnapshotTestCase(unittest.TestCase):
+  """Testing the snapshot.ConfigSnapshot class."""
+
+  def test_json_round_trip(self):
+    """A snapshot should survive serialisation to json and back."""
+    snapshot = ConfigSnapshot({'GSM.Radio.C0': '51'}, 'tcp://10.0.0.1:45060')
+    loaded = ConfigSnapshot.from_json(snapshot.to_json())
+    self.assertEqual(loaded, snapshot)
+    self.assertEqual(loaded.source, snapshot.source)
+    self.assertEqual(loaded.taken_at, snapshot.taken_at)
+
+  def test_diff(self):
+    """Diffing snapshots should report changed, added and removed keys."""
+    old = ConfigSnapshot({'a': '1', 'b': '2'})
+    new = ConfigSnapshot({'a': '1', 'b': '3', 'c': '4'})
+    self.assertEqual(old.diff(new), {'b': ('2', '3'), 'c': (None, '4')})
+    self.assertEqual(old.diff({'a': '1', 'b': '3'}), {'b': ('2', '3')})
+
+  def test_from_dict_data(self):
+    """Config dumps keyed by config key should also be accepted."""
+    snapshot = ConfigSnapshot.from_response_data(
+        {'a': {'value': '1'}, 'b': '2'})
+    self.assertEqual(snapshot.values, {'a': '1', 'b': '2'})
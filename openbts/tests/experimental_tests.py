@@ -0,0 +1,83 @@
+"""openbts.tests.experimental_tests
+tests for the experimental client calls
+"""
+
+import json
+import unittest
+
+import mock
+
+from openbts.experimental import ExperimentalSMQueue
+
+
+class ExperimentalSMQueueTestCase(unittest.TestCase):
+  """Testing the 'messages' command on experimental.ExperimentalSMQueue."""
+
+  def setUp(self):
+    self.connection = ExperimentalSMQueue()
+    self.connection.socket = mock.Mock()
+    self.connection.socket.recv.return_value = json.dumps({
+      'code': 200,
+      'data': [{'id': '1', 'from': '101', 'to': '5550001', 'body': 'hi'},
+               {'id': '2', 'from': '101', 'to': '5550002', 'body': 'yo'}]
+    })
+
+  def test_submit_message(self):
+    """Submitting a message should send a 'messages' create command."""
+    self.connection.submit_message(101, 5550001, 'hi')
+    expected_message = json.dumps({
+      'command': 'messages',
+      'action': 'create',
+      'fields': {
+        'from': '101',
+        'to': '5550001',
+        'body': 'hi'
+      }
+    })
+    self.assertEqual(self.connection.socket.send.call_args[0],
+                     (expected_message,))
+
+  def test_submit_messages(self):
+    """Malformed records are reported without stopping the batch."""
+    report = self.connection.submit_messages([
+      ('101', '5550001', 'hi'),
+      {'sender': '101', 'recipient': '5550002', 'body': 'yo'},
+      ('101', '5550003')])
+    self.assertEqual((report.succeeded, report.failed), (2, 1))
+    self.assertEqual(self.connection.socket.send.call_count, 2)
+
+  def test_get_message(self):
+    """Inspecting a message should match on its id."""
+    self.connection.get_message(2)
+    expected_message = json.dumps({
+      'command': 'messages',
+      'action': 'read',
+      'key': '',
+      'value': '',
+      'match': {'id': '2'}
+    })
+    self.assertEqual(self.connection.socket.send.call_args[0],
+                     (expected_message,))
+
+  def test_iter_and_count_messages(self):
+    messages = list(self.connection.iter_messages())
+    self.assertEqual([m['id'] for m in messages], ['1', '2'])
+    self.assertEqual(self.connection.count_messages(), 2)
+
+  def test_purge_messages(self):
+    self.connection.purge_messages(match={'to': 5550001})
+    sent = json.loads(self.connection.socket.send.call_args[0][0])
+    self.assertEqual(sent['action'], 'delete')
+    self.assertEqual(sent['match'], {'to': '5550001'})
+
+  def test_purge_messages_needs_match_or_purge_all(self):
+    """Purging without a match should only be done on purpose."""
+    with self.assertRaises(ValueError):
+      self.connection.purge_messages()
+    with self.assertRaises(ValueError):
+      self.connection.purge_messages(match={'to': 5550001}, purge_all=True)
+    self.assertFalse(self.connection.socket.send.called)
+    self.connection.purge_messages(purge_all=True)
+    sent = json.loads(self.connection.socket.send.call_args[0][0])
+    self.assertEqual(sent['action'], 'delete')
+    self.assertNotIn('match', sent)
@@ -0,0 +1,106 @@
+"""openbts.tests.fleet_tests
+tests for fanning out requests across many nodes
+"""
+
+import json
+import unittest
+
+import mock
+
+from openbts.components import OpenBTS
+from openbts.exceptions import InvalidRequestError, TimeoutError
+from openbts.fleet import Fleet
+from openbts.health import EndpointHealth
+
+
+class FakePoller(object):
+  """Stands in for zmq.Poller, reporting mock sockets marked as ready."""
+
+  def __init__(self):
+    self.sockets = []
+
+  def register(self, socket, flags):
+    self.sockets.append(socket)
+
+  def unregister(self, socket):
+    self.sockets.remove(socket)
+
+  def poll(self, timeout):
+    return [(socket, 1) for socket in self.sockets if socket.ready]
+
+
+class FleetTestCase(unittest.TestCase):
+  """Testing the fleet.Fleet class."""
+
+  ADDRESSES = ['tcp://10.0.0.%s:45060' % i for i in range(1, 4)]
+
+  def setUp(self):
+    poller_patch = mock.patch('openbts.fleet.zmq.Poller', FakePoller)
+    poller_patch.start()
+    self.addCleanup(poller_patch.stop)
+    self.fleet = Fleet(OpenBTS, self.ADDRESSES, socket_timeout=0.01)
+    replies = [{'code': 200, 'data': 'release 7'}, {'code': 404}, None]
+    for component, reply in zip(self.fleet, replies):
+      component.socket = mock.Mock()
+      component.socket.ready = reply is not None
+      component.socket.recv.return_value = json.dumps(reply)
+
+  def tearDown(self):
+    self.fleet.close()
+
+  def test_results_per_node(self):
+    """Each node should yield its response, error or timeout."""
+    sockets = [component.socket for component in self.fleet]
+    results = dict(self.fleet.read_config('GSM.Radio.C0'))
+    self.assertEqual(results[self.ADDRESSES[0]].data, 'release 7')
+    self.assertIsInstance(results[self.ADDRESSES[1]], InvalidRequestError)
+    self.assertIsInstance(results[self.ADDRESSES[2]], TimeoutError)
+    expected_message = json.dumps({
+      'command': 'config',
+      'action': 'read',
+      'key': 'GSM.Radio.C0',
+      'value': ''
+    })
+    for socket in sockets:
+      self.assertEqual(socket.send.call_args[0], (expected_message,))
+
+  def test_replies_stream_before_timeouts(self):
+    """Answering nodes should be yielded before the slow node times out."""
+    results = self.fleet.get_version()
+    first, second, third = [address for address, _ in results]
+    self.assertEqual(third, self.ADDRESSES[2])
+
+  def test_timed_out_socket_is_reset(self):
+    """A node that timed out should get a fresh socket."""
+    slow_socket = list(self.fleet)[2].socket
+    list(self.fleet.monitor())
+    self.assertTrue(slow_socket.close.called)
+    self.assertIsNot(list(self.fleet)[2].socket, slow_socket)
+
+  def test_closing_early_resets_waiting_sockets(self):
+    """Abandoning a fan-out should reset the sockets still waiting."""
+    results = self.fleet.get_version()
+    next(results)
+    slow_socket = list(self.fleet)[2].socket
+    results.close()
+    self.assertTrue(slow_socket.close.called)
+
+  def test_closing_early_records_failures(self):
+    """Abandoned requests should count against the nodes' health."""
+    for component in self.fleet:
+      component.health = EndpointHealth()
+    results = self.fleet.get_version()
+    next(results)
+    results.close()
+    failures = [component.health.failures for component in self.fleet]
+    self.assertEqual(failures, [0, 1, 1])
+
+  def test_failed_send_resets_sent_sockets(self):
+    """If one node cannot be sent to, the others should not be left waiting.
+    """
+    sockets = [component.socket for component in self.fleet]
+    sockets[2].send.side_effect = RuntimeError('send failed')
+    with self.assertRaises(RuntimeError):
+      list(self.fleet.get_version())
+    self.assertTrue(sockets[0].close.called)
+    self.assertTrue(sockets[1].close.called)
@@ -0,0 +1,194 @@
+"""openbts.tests.health_tests
+tests for circuit breaking and adaptive timeouts
+"""
+
+import json
+import unittest
+
+import mock
+
+from openbts.core import BaseComponent
+from openbts.exceptions import TimeoutError
+from openbts.health import (CLOSED, HALF_OPEN, OPEN, EndpointHealth,
+                            get_endpoint_health)
+
+
+class FakeClock(object):
+  """A clock that only moves when told to."""
+
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+
+class EndpointHealthTest(unittest.TestCase):
+  """Testing the health.EndpointHealth state machine."""
+
+  def setUp(self):
+    self.clock = FakeClock()
+    self.health = EndpointHealth(failure_threshold=3, recovery_timeout=10,
+                                 min_samples=5, clock=self.clock)
+
+  def test_opens_after_consecutive_failures(self):
+    for _ in range(2):
+      self.health.record_failure()
+    self.assertTrue(self.health.allow())
+    self.health.record_failure()
+    self.assertEqual(self.health.state, OPEN)
+    self.assertFalse(self.health.allow())
+
+  def test_success_resets_failures(self):
+    for _ in range(2):
+      self.health.record_failure()
+    self.health.record_success(0.01)
+    self.health.record_failure()
+    self.assertEqual(self.health.state, CLOSED)
+
+  def test_half_open_allows_one_probe(self):
+    for _ in range(3):
+      self.health.record_failure()
+    self.clock.now += 10
+    self.assertTrue(self.health.allow())
+    self.assertEqual(self.health.state, HALF_OPEN)
+    self.assertFalse(self.health.allow())
+    self.health.record_success(0.01)
+    self.assertEqual(self.health.state, CLOSED)
+    self.assertTrue(self.health.allow())
+
+  def test_failed_probe_reopens(self):
+    for _ in range(3):
+      self.health.record_failure()
+    self.clock.now += 10
+    self.health.allow()
+    self.health.record_failure()
+    self.assertEqual(self.health.state, OPEN)
+    self.clock.now += 5
+    self.assertFalse(self.health.allow())
+
+  def test_unreported_probe_expires(self):
+    """A lost probe should not keep the circuit half-open forever."""
+    for _ in range(3):
+      self.health.record_failure()
+    self.clock.now += 10
+    self.assertTrue(self.health.allow())
+    self.clock.now += 5
+    self.assertFalse(self.health.allow())
+    self.clock.now += 5
+    self.assertTrue(self.health.allow())
+    self.assertFalse(self.health.allow())
+
+  def test_probe_uses_full_timeout(self):
+    for _ in range(5):
+      self.health.record_success(0.2)
+    for _ in range(3):
+      self.health.record_failure()
+    self.assertEqual(self.health.timeout(10), 10)
+    self.clock.now += 10
+    self.health.allow()
+    self.assertEqual(self.health.timeout(10), 10)
+    self.health.record_success(0.2)
+    self.assertAlmostEqual(self.health.timeout(10), 0.6)
+
+  def test_adaptive_timeout(self):
+    """The timeout should follow observed latency within its bounds."""
+    self.assertEqual(self.health.timeout(10), 10)
+    for _ in range(5):
+      self.health.record_success(0.2)
+    self.assertAlmostEqual(self.health.timeout(10), 0.6)
+    self.assertEqual(self.health.timeout(0.5), 0.5)
+    self.assertEqual(self.health.timeout(10, 'other'), 10)
+    for _ in range(300):
+      self.health.record_success(0.001)
+    self.assertEqual(self.health.timeout(10), self.health.min_timeout)
+
+  def test_shared_per_address(self):
+    self.assertIs(get_endpoint_health('tcp://10.0.0.1:45060'),
+                  get_endpoint_health('tcp://10.0.0.1:45060'))
+    self.assertIsNot(get_endpoint_health('tcp://10.0.0.1:45060'),
+                     get_endpoint_health('tcp://10.0.0.2:45060'))
+
+
+class BaseComponentHealthTest(unittest.TestCase):
+  """Testing components with circuit breaking enabled."""
+
+  ADDRESS = 'tcp://127.0.0.1:7897'
+
+  def setUp(self):
+    self.socket = mock.Mock()
+    self.socket.poll.return_value = 0
+    self.socket.recv.return_value = json.dumps({'code': 200})
+    self.pool = mock.Mock()
+    self.pool.checkout.return_value = self.socket
+    self.health = EndpointHealth(failure_threshold=2, recovery_timeout=60)
+
+  def test_fails_fast_when_open(self):
+    """Once the circuit opens, requests are not sent at all."""
+    component = BaseComponent(address=self.ADDRESS, socket_pool=self.pool,
+                              health=self.health)
+    for _ in range(2):
+      with self.assertRaises(TimeoutError):
+        component.get_version()
+    sent = self.socket.send.call_count
+    with self.assertRaises(TimeoutError):
+      component.get_version()
+    self.assertEqual(self.socket.send.call_count, sent)
+
+  def test_retries_stop_when_open(self):
+    component = BaseComponent(address=self.ADDRESS, socket_pool=self.pool,
+                              health=self.health, retries=5, retry_backoff=0)
+    with self.assertRaises(TimeoutError):
+      component.get_version()
+    self.assertEqual(self.socket.send.call_count, 2)
+
+  def test_adaptive_timeout_used(self):
+    self.socket.poll.return_value = 1
+    self.health.min_samples = 1
+    self.health.record_success(0.1, ('version', ''))
+    component = BaseComponent(address=self.ADDRESS, socket_pool=self.pool,
+                              health=self.health)
+    component.get_version()
+    self.assertAlmostEqual(self.socket.poll.call_args[1]['timeout'], 300)
+
+  def test_timeouts_kept_per_kind_of_request(self):
+    """Fast config reads should not shorten the timeout of other requests."""
+    self.socket.poll.return_value = 1
+    self.socket.recv.return_value = json.dumps({'code': 200, 'data': []})
+    self.health.min_samples = 1
+    component = BaseComponent(address=self.ADDRESS, socket_pool=self.pool,
+                              health=self.health, socket_timeout=10)
+    for _ in range(3):
+      component.read_config('GSM.Radio.C0')
+    self.assertLess(self.socket.poll.call_args[1]['timeout'], 10000)
+    component.get_version()
+    self.assertEqual(self.socket.poll.call_args[1]['timeout'], 10000)
+    # listings always wait the full timeout, however fast they have been
+    for _ in range(3):
+      component.snapshot()
+    self.assertEqual(self.socket.poll.call_args[1]['timeout'], 10000)
+
+  def test_pipeline_fails_fast_when_open(self):
+    self.socket.poll.return_value = 0
+    component = BaseComponent(address=self.ADDRESS, socket_pool=self.pool,
+                              health=self.health, pipelined=True)
+    results = list(component._pipeline([{}] * 4, max_in_flight=1))
+    self.assertEqual([index for index, _ in results], [0, 1, 2, 3])
+    for _, result in results:
+      self.assertIsInstance(result, TimeoutError)
+    self.assertEqual(self.socket.send_multipart.call_count, 2)
+
+  def test_abandoned_pipeline_records_failure(self):
+    """Closing a pipeline with requests outstanding should free a probe."""
+    sent = []
+    self.socket.send_multipart.side_effect = sent.append
+    self.socket.poll.return_value = 1
+    self.socket.recv_multipart.side_effect = lambda: [sent[0][0], b'',
+                                                      b'{"code": 200}']
+    component = BaseComponent(address=self.ADDRESS, socket_pool=self.pool,
+                              health=self.health, pipelined=True)
+    results = component._pipeline([{}] * 2, max_in_flight=2)
+    next(results)
+    self.assertEqual(self.health.failures, 0)
+    results.close()
+    self.assertEqual(self.health.failures, 1)
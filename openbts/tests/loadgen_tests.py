@@ -0,0 +1,87 @@
+"""openbts.tests.loadgen_tests
+tests for the load generator
+"""
+
+import unittest
+
+from openbts.core import SocketPool
+from openbts.loadgen import LatencyStats, LoadGenerator, Workload, parse_mix
+from openbts.simulator import NodeManagerSimulator
+
+
+class ParseMixTest(unittest.TestCase):
+  """Testing workload mix parsing."""
+
+  def test_parse(self):
+    self.assertEqual(parse_mix('read=3, monitor=1'),
+                     [('read', 3.0), ('monitor', 1.0)])
+
+  def test_unknown_operation(self):
+    with self.assertRaises(ValueError):
+      parse_mix('read=1,explode=2')
+
+
+class LatencyStatsTest(unittest.TestCase):
+  """Testing interval summaries."""
+
+  def test_summary(self):
+    stats = LatencyStats()
+    for latency in range(100, 0, -1):
+      stats.add(latency / 1000.0, latency > 90)
+    summary = stats.summary(2)
+    self.assertEqual(summary['count'], 100)
+    self.assertEqual(summary['rate'], 50)
+    self.assertAlmostEqual(summary['error_rate'], 0.1)
+    self.assertAlmostEqual(summary['p50_ms'], 50)
+    self.assertAlmostEqual(summary['p99_ms'], 99)
+
+  def test_empty(self):
+    self.assertEqual(LatencyStats().summary(1)['p95_ms'], 0)
+
+  def test_reservoir_is_bounded(self):
+    """Totals should keep a bounded sample but exact counts."""
+    stats = LatencyStats(reservoir=1000)
+    for latency in range(100000):
+      stats.add(latency / 100000.0, latency % 10 == 0)
+    self.assertEqual(len(stats.latencies), 1000)
+    summary = stats.summary(1)
+    self.assertEqual(summary['count'], 100000)
+    self.assertAlmostEqual(summary['error_rate'], 0.1)
+    self.assertAlmostEqual(summary['p50_ms'], 500, delta=50)
+
+
+class LoadGeneratorTest(unittest.TestCase):
+  """Testing a short run against the simulator."""
+
+  ADDRESS = 'tcp://127.0.0.1:7896'
+
+  def setUp(self):
+    self.simulator = NodeManagerSimulator(self.ADDRESS, latency=0, seed=0)
+    self.simulator.start()
+    self.pool = SocketPool()
+
+  def tearDown(self):
+    self.pool.clear()
+    self.simulator.stop()
+
+  def test_run(self):
+    """Every operation should run and the config should be left alone."""
+    workloads = [Workload(self.ADDRESS, self.ADDRESS, ['GSM.Radio.C0'],
+                          worker=worker, socket_pool=self.pool,
+                          codec='json-utf8', socket_timeout=2)
+                 for worker in range(2)]
+    original = workloads[0].openbts.read_config('GSM.Radio.C0').data['value']
+    reports = []
+    mix = parse_mix('read=1,update=1,churn=1,monitor=1')
+    generator = LoadGenerator(workloads, mix, rate=200, interval=0.2,
+                              report=lambda *args: reports.append(args))
+    summaries = generator.run(0.6)
+    self.assertEqual(len(reports), 3)
+    self.assertEqual(set(summaries),
+                     set(['read', 'update', 'churn', 'monitor', 'total']))
+    self.assertEqual(summaries['total']['error_rate'], 0)
+    self.assertGreater(summaries['total']['count'], 60)
+    self.assertEqual(
+        workloads[0].openbts.read_config('GSM.Radio.C0').data['value'],
+        original)
+    self.assertEqual(list(workloads[0].sipauthserve.iter_subscribers()), [])
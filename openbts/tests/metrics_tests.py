@@ -0,0 +1,90 @@
+"""openbts.tests.metrics_tests
+tests for client statistics and the OpenMetrics exporter
+"""
+
+import json
+import unittest
+try:
+  from urllib.request import urlopen
+except ImportError:
+  from urllib2 import urlopen
+
+import mock
+
+from openbts.components import SMQueue
+from openbts.exceptions import InvalidRequestError, TimeoutError
+from openbts.metrics import CONTENT_TYPE, ClientStats, MetricsExporter
+from openbts.monitoring import MonitorPoller
+
+
+class ClientStatsTestCase(unittest.TestCase):
+  """Testing the metrics.ClientStats class."""
+
+  def setUp(self):
+    self.stats = ClientStats(buckets=(0.1, 1))
+    self.smqueue_connection = SMQueue(stats=self.stats)
+    self.smqueue_connection.socket = mock.Mock()
+
+  def test_requests_are_recorded(self):
+    """Successes and failures should be counted by command and code."""
+    self.smqueue_connection.socket.recv.return_value = json.dumps({
+      'code': 200
+    })
+    self.smqueue_connection.read_config('Bounce.Code')
+    self.smqueue_connection.socket.recv.return_value = json.dumps({
+      'code': 404
+    })
+    with self.assertRaises(InvalidRequestError):
+      self.smqueue_connection.read_config('nonexistent-key')
+    self.assertEqual(self.stats.requests[('config', 'read', 'ok')], 1)
+    self.assertEqual(self.stats.requests[('config', 'read', 'error')], 1)
+    self.assertEqual(self.stats.invalid_requests, {404: 1})
+    self.assertEqual(sum(self.stats.latency_buckets['config']), 2)
+
+  def test_timeouts_are_recorded(self):
+    """Timeouts should be counted per command."""
+    self.smqueue_connection.socket.poll.return_value = 0
+    self.smqueue_connection.socket_timeout = 0
+    with self.assertRaises(TimeoutError):
+      self.smqueue_connection.get_version()
+    self.assertEqual(self.stats.timeouts, {'version': 1})
+
+
+class MetricsExporterTestCase(unittest.TestCase):
+  """Testing the metrics.MetricsExporter class."""
+
+  def setUp(self):
+    self.stats = ClientStats(buckets=(0.1, 1))
+    self.stats.record({'command': 'monitor', 'action': ''}, 0.05)
+    self.stats.record({'command': 'config', 'action': 'update'}, 0.5,
+                      InvalidRequestError('invalid value', 406))
+    self.poller = MonitorPoller(mock.Mock())
+    self.poller.record({'noiseRSSI': -67, 'tch.active': 3})
+    self.exporter = MetricsExporter(self.stats, {'bts1': self.poller})
+
+  def test_render(self):
+    """Monitor gauges and client stats should be rendered."""
+    lines = self.exporter.render().splitlines()
+    self.assertIn('openbts_monitor_noiseRSSI{node="bts1"} -67.0', lines)
+    self.assertIn('openbts_monitor_tch_active{node="bts1"} 3.0', lines)
+    self.assertIn('openbts_client_requests_total'
+                  '{action="",command="monitor",outcome="ok"} 1', lines)
+    self.assertIn('openbts_client_request_duration_seconds_bucket'
+                  '{command="config",le="0.1"} 0', lines)
+    self.assertIn('openbts_client_request_duration_seconds_bucket'
+                  '{command="config",le="1.0"} 1', lines)
+    self.assertIn('openbts_client_invalid_requests_total{code="406"} 1',
+                  lines)
+    self.assertEqual(lines[-1], '# EOF')
+
+  def test_scrape_does_not_poll(self):
+    """Serving a scrape should not touch the monitored component."""
+    port = self.exporter.serve(0, host='127.0.0.1')
+    try:
+      reply = urlopen('http://127.0.0.1:%s/metrics' % port)
+      body = reply.read().decode('utf-8')
+    finally:
+      self.exporter.shutdown()
+    self.assertEqual(reply.headers['Content-Type'], CONTENT_TYPE)
+    self.assertEqual(body, self.exporter.render())
+    self.assertFalse(self.poller.openbts.monitor.called)
@@ -0,0 +1,102 @@
+"""openbts.tests.monitoring_tests
+tests for continuous monitor polling
+"""
+
+import json
+import time
+import unittest
+
+import mock
+
+from openbts.components import OpenBTS
+from openbts.exceptions import InvalidResponseError
+from openbts.monitoring import MonitorPoller, RingBuffer, flatten_sample
+
+
+class RingBufferTestCase(unittest.TestCase):
+  """Testing the monitoring.RingBuffer class."""
+
+  def test_overwrites_oldest(self):
+    """A full buffer should drop its oldest samples."""
+    buffer = RingBuffer(3)
+    for value in range(5):
+      buffer.append(value)
+    self.assertEqual(buffer.values(), [2, 3, 4])
+    self.assertEqual(len(buffer), 3)
+    self.assertEqual(buffer.last(), 4)
+
+  def test_aggregate(self):
+    """Aggregates should cover min, max, mean and percentiles."""
+    buffer = RingBuffer(10)
+    for value in [4, 1, 3, 2, 5]:
+      buffer.append(value)
+    self.assertEqual(buffer.aggregate(percentiles=(50, 100)), {
+      'count': 5, 'min': 1, 'max': 5, 'mean': 3, 'p50': 3, 'p100': 5
+    })
+    self.assertIsNone(RingBuffer(3).aggregate())
+
+
+class MonitorPollerTestCase(unittest.TestCase):
+  """Testing the monitoring.MonitorPoller class."""
+
+  def setUp(self):
+    self.openbts_connection = OpenBTS()
+    self.openbts_connection.socket = mock.Mock()
+    self.openbts_connection.socket.recv.return_value = json.dumps({
+      'code': 200,
+      'data': {'noiseRSSI': -67, 'tch': {'active': 3}, 'name': 'bts1'}
+    })
+    self.poller = MonitorPoller(self.openbts_connection, capacity=4)
+
+  def test_flatten_sample(self):
+    """Nested numeric fields should be flattened, others dropped."""
+    self.assertEqual(flatten_sample({'a': 1, 'b': {'c': 2.5}, 'd': 'x'}),
+                     {'a': 1, 'b.c': 2.5})
+
+  def test_poll_once(self):
+    """Each poll should add a sample to every numeric field."""
+    self.poller.poll_once()
+    self.poller.poll_once()
+    self.assertEqual(self.poller.fields, ['noiseRSSI', 'tch.active'])
+    self.assertEqual(self.poller.values('noiseRSSI'), [-67, -67])
+    self.assertEqual(self.poller.latest(), {'noiseRSSI': -67,
+                                            'tch.active': 3})
+    self.assertEqual(self.poller.aggregate('tch.active')['mean'], 3)
+
+  def test_failed_poll_is_counted(self):
+    """A failed poll should be counted rather than stop the poller."""
+    self.openbts_connection.socket.recv.return_value = json.dumps({
+      'code': 500
+    })
+    self.assertIsNone(self.poller.poll_once())
+    self.assertEqual(self.poller.errors, 1)
+    self.assertEqual(len(self.poller.timestamps), 0)
+
+  def test_unexpected_data_is_counted(self):
+    self.openbts_connection.socket.recv.return_value = json.dumps({
+      'code': 200,
+      'data': ['not', 'a', 'dict']
+    })
+    self.assertIsNone(self.poller.poll_once())
+    self.assertEqual(self.poller.errors, 1)
+    self.assertIsInstance(self.poller.last_error, InvalidResponseError)
+
+  def test_failing_listener_does_not_stop_polling(self):
+    """A listener that raises should be counted, not end the thread."""
+    def listener(sample, timestamp):
+      raise RuntimeError('listener failed')
+    self.poller.add_listener(listener)
+    self.poller.interval = 0.001
+    with self.poller:
+      while len(self.poller.timestamps) < 3:
+        time.sleep(0.001)
+    self.assertGreaterEqual(self.poller.errors, 3)
+    self.assertIsInstance(self.poller.last_error, RuntimeError)
+
+  def test_background_polling(self):
+    """A started poller should poll until stopped."""
+    self.poller.interval = 0.001
+    with self.poller:
+      while len(self.poller.timestamps) < 2:
+        time.sleep(0.001)
+    self.assertGreaterEqual(len(self.poller.values('noiseRSSI')), 2)
@@ -0,0 +1,108 @@
+"""openbts.tests.provisioning_tests
+tests for multi-process provisioning
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from openbts.components import SIPAuthServe
+from openbts.core import SocketPool
+from openbts.exceptions import InvalidRequestError
+from openbts.provisioning import Provisioner, _split
+from openbts.simulator import NodeManagerSimulator
+
+
+class ProvisionerTest(unittest.TestCase):
+  """Testing provisioning processes against the simulator."""
+
+  ADDRESS = 'tcp://127.0.0.1:7899'
+
+  def setUp(self):
+    self.simulator = NodeManagerSimulator(self.ADDRESS, subscriber_count=1)
+    self.simulator.start()
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'subscribers.csv')
+    self.checkpoint = os.path.join(self.directory, 'checkpoint.json')
+    lines = ['name,imsi,msisdn']
+    lines += ['sub%s,0010120%08d,555%07d' % (i, i, i) for i in range(40)]
+    # a malformed row and an IMSI the simulator already has
+    lines += ['broken', 'sub0,001010000000000,5550000000', '']
+    with open(self.path, 'w') as f:
+      f.write('\n'.join(lines))
+
+  def tearDown(self):
+    self.simulator.stop()
+    shutil.rmtree(self.directory)
+
+  def provisioner(self, **kwargs):
+    return Provisioner(self.ADDRESS, codec='json-utf8', socket_timeout=2,
+                       checkpoint=self.checkpoint, **kwargs)
+
+  def test_split_at_line_boundaries(self):
+    with open(self.path, 'rb') as f:
+      data = f.read()
+    shards = _split(self.path, 17, len(data), 3)
+    self.assertEqual(len(shards), 3)
+    self.assertEqual(shards[0][0], 17)
+    self.assertEqual(shards[-1][1], len(data))
+    for start, _ in shards[1:]:
+      self.assertEqual(data[start - 1:start], b'\n')
+
+  def test_create_subscribers(self):
+    """Processes should merge their results into one report."""
+    progress = []
+    report = self.provisioner(processes=3, checkpoint_every=5) \
+        .create_subscribers(self.path, progress.append)
+    self.assertEqual((report.succeeded, report.failed), (40, 2))
+    self.assertEqual(len(self.simulator.subscribers), 41)
+    self.assertGreater(len(progress), 3)
+    codes = set(getattr(error, 'code', None) for _, error in report.errors)
+    self.assertEqual(codes, set([None, 409]))
+
+  def test_checkpoint_errors_are_capped(self):
+    """The checkpoint should keep the counts but only a sample of errors."""
+    report = self.provisioner(checkpoint_errors=1).create_subscribers(
+      self.path)
+    self.assertEqual(len(report.errors), 2)
+    with open(self.checkpoint) as f:
+      state = json.load(f)
+    self.assertEqual((state['succeeded'], state['failed']), (40, 2))
+    self.assertEqual(len(state['errors']), 1)
+
+  def test_resume(self):
+    """A resumed job should skip what the checkpoint says is done."""
+    with open(self.path, 'rb') as f:
+      lines = f.readlines()
+    done = sum(len(line) for line in lines[:11])
+    with open(self.checkpoint, 'w') as f:
+      json.dump({
+        'action': 'create',
+        'path': os.path.abspath(self.path),
+        'size': os.path.getsize(self.path),
+        'shards': [{'start': len(lines[0]), 'end': done, 'offset': done},
+                   {'start': done, 'end': os.path.getsize(self.path),
+                    'offset': done}],
+        'succeeded': 10,
+        'failed': 1,
+        'errors': [[['x'], 'InvalidRequestError', 'earlier failure', 409]],
+      }, f)
+    report = self.provisioner().create_subscribers(self.path)
+    self.assertEqual((report.succeeded, report.failed), (40, 3))
+    self.assertEqual(len(self.simulator.subscribers), 31)
+    self.assertIsInstance(report.errors[0][1], InvalidRequestError)
+    self.assertEqual(report.errors[0][1].code, 409)
+    # the finished job is not run again
+    self.simulator.subscribers.clear()
+    report = self.provisioner().create_subscribers(self.path)
+    self.assertEqual(report.succeeded, 40)
+    self.assertEqual(self.simulator.subscribers, {})
+
+  def test_delete_subscribers(self):
+    self.provisioner(processes=2).create_subscribers(self.path)
+    os.remove(self.checkpoint)
+    report = self.provisioner(processes=2).delete_subscribers(self.path)
+    self.assertEqual((report.succeeded, report.failed), (41, 1))
+    self.assertEqual(self.simulator.subscribers, {})
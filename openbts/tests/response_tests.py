@@ -0,0 +1,84 @@
+"""openbts.tests.response_tests
+tests for lazy response parsing and the json codecs
+"""
+
+import json
+import unittest
+
+import mock
+
+from openbts.codecs import JSONCodec, get_codec
+from openbts.components import SMQueue
+from openbts.core import Response
+from openbts.exceptions import InvalidRequestError, InvalidResponseError
+
+
+class LazyResponseTestCase(unittest.TestCase):
+  """Testing lazy parsing in the core.Response class."""
+
+  def setUp(self):
+    self.codec = mock.Mock(wraps=JSONCodec())
+
+  def test_data_decoded_on_first_access(self):
+    """A reply leading with its code should only be decoded when needed."""
+    response = Response(b'{"code": 200, "data": {"value": "101"}}', self.codec)
+    self.assertEqual(response.code, 200)
+    self.assertFalse(self.codec.loads.called)
+    self.assertEqual(response.data['value'], '101')
+    self.assertIsNone(response.dirty)
+    self.assertEqual(self.codec.loads.call_count, 1)
+
+  def test_error_codes_raise_without_decoding(self):
+    """Error codes should raise at construction, as before."""
+    with self.assertRaises(InvalidRequestError):
+      Response('{"code": 404, "data": []}', self.codec)
+    self.assertFalse(self.codec.loads.called)
+
+  def test_other_layouts_are_decoded_up_front(self):
+    """Replies not leading with their code should be fully decoded."""
+    response = Response('{"data": "testing", "code": 204}', self.codec)
+    self.assertEqual(response.code, 204)
+    self.assertTrue(self.codec.loads.called)
+    with self.assertRaises(InvalidResponseError):
+      Response('{"data": "testing"}')
+    with self.assertRaises(InvalidResponseError):
+      Response('{"code": 999}')
+
+  def test_malformed_reply_raises_invalid_response(self):
+    """Replies that fail to decode should raise InvalidResponseError."""
+    response = Response('{"code": 200, "data": {"value": ', self.codec)
+    with self.assertRaises(InvalidResponseError):
+      response.data
+    with self.assertRaises(InvalidResponseError):
+      Response('{"data": "testing", "code": 2')
+    with self.assertRaises(InvalidResponseError):
+      Response('["code", 200]')
+
+
+class CodecTestCase(unittest.TestCase):
+  """Testing codec selection."""
+
+  def test_get_codec(self):
+    """Codecs should be found by name, object or 'auto'."""
+    self.assertEqual(get_codec().name, 'json')
+    self.assertEqual(get_codec('json').name, 'json')
+    self.assertIn(get_codec('auto').name, ('orjson', 'ujson', 'json-utf8'))
+    self.assertIsInstance(get_codec('auto').dumps({'code': 200}), bytes)
+    codec = JSONCodec()
+    self.assertIs(get_codec(codec), codec)
+    with self.assertRaises(ValueError):
+      get_codec('yaml')
+
+  def test_component_uses_codec(self):
+    """A component should encode messages with its codec."""
+    codec = mock.Mock(wraps=JSONCodec())
+    smqueue_connection = SMQueue(codec=codec)
+    smqueue_connection.socket = mock.Mock()
+    smqueue_connection.socket.recv.return_value = json.dumps({
+      'code': 200,
+      'data': 'release 7'
+    })
+    response = smqueue_connection.get_version()
+    self.assertEqual(codec.dumps.call_count, 1)
+    self.assertEqual(response.data, 'release 7')
+    self.assertEqual(codec.loads.call_count, 1)
@@ -0,0 +1,98 @@
+"""openbts.tests.results_tests
+tests for the typed result objects
+"""
+
+import copy
+import json
+import pickle
+import sys
+import unittest
+
+import mock
+
+from openbts.components import OpenBTS, SIPAuthServe
+from openbts.core import Response
+from openbts.results import ConfigValue, MonitorSample, Subscriber
+
+
+class ResultsTestCase(unittest.TestCase):
+  """Testing the classes in openbts.results."""
+
+  def test_no_instance_dicts(self):
+    """Results and responses should not carry a __dict__."""
+    objects = [
+      Subscriber('ada', '310150000000001', '4567'),
+      ConfigValue('Bounce.Code', '101'),
+      MonitorSample({'noiseRSSI': -67}),
+      Response('{"code": 200}'),
+    ]
+    for obj in objects:
+      self.assertFalse(hasattr(obj, '__dict__'))
+
+  def test_subscriber_smaller_than_dict(self):
+    """A Subscriber should take less memory than the equivalent dict."""
+    record = {'name': 'ada', 'imsi': '310150000000001', 'msisdn': '4567',
+              'ki': ''}
+    self.assertLess(sys.getsizeof(Subscriber.from_dict(record)),
+                    sys.getsizeof(record))
+
+  def test_monitor_samples_share_field_index(self):
+    """Samples with the same fields should share one name index."""
+    sample_a = MonitorSample({'noiseRSSI': -67, 'tch.active': 3}, 0)
+    sample_b = MonitorSample({'tch.active': 4, 'noiseRSSI': -60}, 1)
+    self.assertIs(sample_a._index, sample_b._index)
+    self.assertEqual(sample_b.noiseRSSI, -60)
+    self.assertEqual(sample_b['tch.active'], 4)
+    self.assertEqual(list(sample_a), ['noiseRSSI', 'tch.active'])
+    with self.assertRaises(AttributeError):
+      sample_a.missing
+
+  def test_copy_and_pickle(self):
+    """Results should survive copying and pickling, e.g. across processes."""
+    sample = MonitorSample({'noiseRSSI': -67, 'tch.active': 3}, 5)
+    for copied in (copy.copy(sample),
+                   pickle.loads(pickle.dumps(sample, pickle.HIGHEST_PROTOCOL))):
+      self.assertEqual(copied.to_dict(), sample.to_dict())
+      self.assertEqual(copied.timestamp, 5)
+      self.assertIs(copied._index, sample._index)
+    subscriber = Subscriber('ada', '310150000000001', '4567')
+    self.assertEqual(pickle.loads(pickle.dumps(subscriber)).imsi,
+                     subscriber.imsi)
+
+
+class TypedComponentResultsTestCase(unittest.TestCase):
+  """Testing the component methods returning typed results."""
+
+  def test_iter_subscribers_typed(self):
+    """Typed iteration should yield Subscriber objects."""
+    connection = SIPAuthServe()
+    connection.socket = mock.Mock()
+    connection.socket.recv.return_value = json.dumps({'code': 200, 'data': [
+      {'name': 'ada', 'imsi': '310150000000001', 'msisdn': '4567'},
+    ]})
+    subscribers = list(connection.iter_subscribers(typed=True))
+    self.assertEqual(subscribers,
+                     [Subscriber('ada', '310150000000001', '4567')])
+
+  def test_read_config_value(self):
+    """read_config_value should return a ConfigValue."""
+    connection = OpenBTS()
+    connection.socket = mock.Mock()
+    connection.socket.recv.return_value = json.dumps({
+      'code': 200,
+      'data': {'key': 'GSM.Radio.C0', 'value': '51'},
+      'dirty': 0
+    })
+    self.assertEqual(connection.read_config_value('GSM.Radio.C0'),
+                     ConfigValue('GSM.Radio.C0', '51', 0))
+
+  def test_monitor_sample(self):
+    """monitor_sample should return a flattened MonitorSample."""
+    connection = OpenBTS()
+    connection.socket = mock.Mock()
+    connection.socket.recv.return_value = json.dumps({
+      'code': 200,
+      'data': {'noiseRSSI': -67, 'tch': {'active': 3}}
+    })
+    sample = connection.monitor_sample()
+    self.assertEqual(sample.to_dict(), {'noiseRSSI': -67, 'tch.active': 3})
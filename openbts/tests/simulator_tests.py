@@ -0,0 +1,89 @@
+"""openbts.tests.simulator_tests
+tests running the components against the NodeManager simulator
+"""
+
+import time
+import unittest
+
+from openbts.components import OpenBTS, SIPAuthServe
+from openbts.core import SocketPool
+from openbts.exceptions import InvalidRequestError
+from openbts.experimental import ExperimentalSMQueue
+from openbts.simulator import NodeManagerSimulator
+
+
+class SimulatorTestCase(unittest.TestCase):
+  """Testing components over real sockets against the simulator."""
+
+  ADDRESS = 'tcp://127.0.0.1:7895'
+
+  def setUp(self):
+    self.simulator = NodeManagerSimulator(self.ADDRESS, subscriber_count=3,
+                                          seed=0)
+    self.simulator.start()
+    self.pool = SocketPool()
+
+  def tearDown(self):
+    self.pool.clear()
+    self.simulator.stop()
+
+  def component(self, component_class, **kwargs):
+    """Make a component connected to the simulator."""
+    return component_class(address=self.ADDRESS, socket_pool=self.pool,
+                           codec='json-utf8', socket_timeout=2, **kwargs)
+
+  def test_config(self):
+    """Config reads, updates and snapshots should round-trip."""
+    openbts_connection = self.component(OpenBTS)
+    openbts_connection.update_config('GSM.Radio.C0', 60)
+    self.assertEqual(openbts_connection.read_config('GSM.Radio.C0').data,
+                     {'key': 'GSM.Radio.C0', 'value': '60'})
+    self.assertEqual(openbts_connection.snapshot()['GSM.Radio.C0'], '60')
+    with self.assertRaises(InvalidRequestError):
+      openbts_connection.read_config('nonexistent-key')
+
+  def test_monitor(self):
+    """Monitor data should be returned."""
+    response = self.component(OpenBTS).monitor()
+    self.assertIn('noiseRSSI', response.data)
+
+  def test_subscribers(self):
+    """Subscribers should be listed, created and deleted."""
+    connection = self.component(SIPAuthServe, pipelined=True)
+    report = connection.create_subscribers(
+        [('ada', '001010000000100', '4567'), ('sub0', '001010000000000', '1')])
+    self.assertEqual((report.succeeded, report.failed), (1, 1))
+    self.assertEqual(len(list(connection.iter_subscribers())), 4)
+    connection.delete_subscriber('001010000000100')
+    match = {'imsi': '001010000000001'}
+    self.assertEqual(len(connection.get_subscribers(match=match).data), 1)
+
+  def test_messages(self):
+    """Messages should be submitted in bulk, listed and purged."""
+    connection = self.component(ExperimentalSMQueue, pipelined=True)
+    report = connection.submit_messages(
+        ('101', '555%07d' % i, 'hello') for i in range(10))
+    self.assertEqual(report.succeeded, 10)
+    self.assertEqual(connection.count_messages(), 10)
+    self.assertEqual(connection.get_message(3).data[0]['to'], '5550000002')
+    connection.purge_messages(match={'to': '5550000002'})
+    self.assertEqual(connection.count_messages(), 9)
+    connection.purge_messages(purge_all=True)
+    self.assertEqual(connection.count_messages(), 0)
+
+  def test_pipelining_overlaps_latency(self):
+    """Pipelined requests should wait on the latency concurrently."""
+    self.simulator.latency = 0.05
+    connection = self.component(OpenBTS, pipelined=True)
+    start = time.time()
+    results = connection.read_configs(['GSM.Radio.C0', 'Bounce.Code',
+                                       'Log.Alarms.Max', 'Control.NumSQLTries'])
+    elapsed = time.time() - start
+    self.assertEqual(len(results), 4)
+    self.assertLess(elapsed, 0.05 * 3)
+
+  def test_error_rate(self):
+    """With an error rate of 1, every request should fail."""
+    self.simulator.error_rate = 1
+    with self.assertRaises(InvalidRequestError):
+      self.component(OpenBTS).get_version()
@@ -2,6 +2,7 @@
 tests for the SIPAuthServe component
 """
 
+import csv
 import json
 import unittest
 
@@ -236,3 +237,129 @@ class SIPAuthServeNominalSubscriberTestCase(unittest.TestCase):
                      (expected_message,))
     self.assertTrue(self.sipauthserve_connection.socket.recv.called)
     self.assertEqual(response.code, 204)
+
+
+class SIPAuthServeBulkSubscriberTestCase(unittest.TestCase):
+  """Testing the bulk subscriber operations of components.SIPAuthServe."""
+
+  def setUp(self):
+    self.sipauthserve_connection = SIPAuthServe()
+    # mock a zmq socket that rejects requests for one particular IMSI
+    self.sipauthserve_connection.socket = mock.Mock()
+    def recv():
+      message = json.loads(
+          self.sipauthserve_connection.socket.send.call_args[0][0])
+      fields = message.get('fields') or message.get('match')
+      code = 409 if fields['imsi'] == '310150000000002' else 200
+      return json.dumps({'code': code})
+    self.sipauthserve_connection.socket.recv.side_effect = recv
+
+  def test_create_subscribers_from_mixed_records(self):
+    """Tuples, csv rows and dicts should all be accepted as records."""
+    records = [
+      ('ada', 310150000000001, 4567),
+      ['jon', '310150000000002', '8901', 'abc'],
+      {'name': 'bo', 'imsi': '310150000000003', 'msisdn': '2345', 'ki': ''},
+    ]
+    results = []
+    report = self.sipauthserve_connection.create_subscribers(
+        iter(records), callback=lambda record, result: results.append(record))
+    self.assertEqual(self.sipauthserve_connection.socket.send.call_count, 3)
+    self.assertEqual((report.succeeded, report.failed), (2, 1))
+    self.assertEqual(report.errors[0][0], records[1])
+    self.assertIsInstance(report.errors[0][1], InvalidRequestError)
+    self.assertEqual(results, records)
+
+  def test_create_subscribers_malformed_record(self):
+    """A record missing fields should fail without being sent."""
+    report = self.sipauthserve_connection.create_subscribers([('ada',)])
+    self.assertFalse(self.sipauthserve_connection.socket.send.called)
+    self.assertEqual(report.failed, 1)
+
+  def test_delete_subscribers(self):
+    """Bare IMSIs and subscriber records should both be deleted by IMSI."""
+    report = self.sipauthserve_connection.delete_subscribers(
+        [310150000000001, ('jon', '310150000000002', '8901')])
+    expected_message = json.dumps({
+      'command': 'subscribers',
+      'action': 'delete',
+      'match': {
+        'imsi': '310150000000002'
+      }
+    })
+    self.assertEqual(self.sipauthserve_connection.socket.send.call_args[0],
+                     (expected_message,))
+    self.assertEqual((report.succeeded, report.failed), (1, 1))
+
+  def test_delete_subscribers_single_column_rows(self):
+    """One-column csv rows should be read as bare IMSIs."""
+    rows = csv.reader(['310150000000001', '310150000000002'])
+    self.sipauthserve_connection.delete_subscribers(rows)
+    sent = [json.loads(call[0][0])['match']['imsi'] for call in
+            self.sipauthserve_connection.socket.send.call_args_list]
+    self.assertEqual(sent, ['310150000000001', '310150000000002'])
+
+  def test_delete_subscribers_malformed_row(self):
+    report = self.sipauthserve_connection.delete_subscribers([('ada', 'x')])
+    self.assertFalse(self.sipauthserve_connection.socket.send.called)
+    self.assertEqual(report.failed, 1)
+
+
+class SIPAuthServeIterSubscribersTestCase(unittest.TestCase):
+  """Testing incremental subscriber listing on components.SIPAuthServe."""
+
+  def setUp(self):
+    self.sipauthserve_connection = SIPAuthServe()
+    self.sipauthserve_connection.socket = mock.Mock()
+
+  def test_iter_subscribers(self):
+    """Subscribers should be yielded one at a time, in order."""
+    subscribers = [
+      {'name': 'ada', 'imsi': 'IMSI310150000000001', 'msisdn': '4567'},
+      {'name': 'jon', 'imsi': 'IMSI310150000000002', 'msisdn': '8901'},
+    ]
+    self.sipauthserve_connection.socket.recv.return_value = json.dumps({
+      'code': 200,
+      'data': subscribers,
+      'dirty': 0
+    }, sort_keys=True, indent=2)
+    iterator = self.sipauthserve_connection.iter_subscribers()
+    self.assertEqual(next(iterator), subscribers[0])
+    self.assertEqual(list(iterator), subscribers[1:])
+
+  def test_iter_subscribers_with_match(self):
+    """A match dict should be sent along with the read request."""
+    self.sipauthserve_connection.socket.recv.return_value = json.dumps({
+      'code': 200,
+      'data': []
+    })
+    result = list(self.sipauthserve_connection.iter_subscribers(
+        match={'imsi': 310150000000001}))
+    self.assertEqual(result, [])
+    expected_message = json.dumps({
+      'command': 'subscribers',
+      'action': 'read',
+      'key': '',
+      'value': '',
+      'match': {
+        'imsi': '310150000000001'
+      }
+    })
+    self.assertEqual(self.sipauthserve_connection.socket.send.call_args[0],
+                     (expected_message,))
+
+  def test_iter_subscribers_data_before_code(self):
+    """Replies with 'data' ahead of 'code' should still be handled."""
+    self.sipauthserve_connection.socket.recv.return_value = (
+        '{"data": [{"name": "ada"}], "code": 200}')
+    result = list(self.sipauthserve_connection.iter_subscribers())
+    self.assertEqual(result, [{'name': 'ada'}])
+
+  def test_iter_subscribers_error_code(self):
+    """Error codes should raise the same errors as get_subscribers."""
+    self.sipauthserve_connection.socket.recv.return_value = json.dumps({
+      'code': 404,
+      'data': []
+    })
+    with self.assertRaises(InvalidRequestError):
+      list(self.sipauthserve_connection.iter_subscribers())
@@ -0,0 +1,133 @@
+"""openbts.tests.subscriber_files_tests
+tests for subscriber import and export files
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from openbts.components import SIPAuthServe
+from openbts.core import SocketPool
+from openbts.simulator import NodeManagerSimulator
+from openbts.subscriber_files import (RECORD_SIZE, SubscriberFile,
+                                      export_subscribers, import_subscribers,
+                                      write_subscribers)
+
+
+SUBSCRIBERS = [
+  ('ada', '001010000000001', '5550001', ''),
+  ('b, "the" second', 'IMSI001010000000002', '5550002', 'abcd'),
+  {'name': 'cy', 'imsi': '001010000000003', 'msisdn': '5550003'},
+]
+
+
+class SubscriberFileTest(unittest.TestCase):
+  """Testing reading and writing both file layouts."""
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'subscribers')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def read(self, fixed_width=False, start=None):
+    with SubscriberFile(self.path, fixed_width) as subscriber_file:
+      return list(subscriber_file.records(start))
+
+  def test_csv_round_trip(self):
+    self.assertEqual(write_subscribers(self.path, SUBSCRIBERS), 3)
+    records = self.read()
+    self.assertEqual([record for record, _ in records], [
+      ('ada', '001010000000001', '5550001', ''),
+      ('b, "the" second', '001010000000002', '5550002', 'abcd'),
+      ('cy', '001010000000003', '5550003', ''),
+    ])
+    self.assertEqual(records[-1][1], os.path.getsize(self.path))
+
+  def test_resume_from_offset(self):
+    write_subscribers(self.path, SUBSCRIBERS)
+    offset = self.read()[0][1]
+    self.assertEqual([record[0] for record, _ in self.read(start=offset)],
+                     ['b, "the" second', 'cy'])
+
+  def test_csv_header(self):
+    with open(self.path, 'w') as f:
+      f.write('IMSI,Name\n001010000000001,ada\n\n001010000000002\n')
+    records = [record for record, _ in self.read()]
+    self.assertEqual(records, [('ada', '001010000000001', '', ''),
+                               ('001010000000002',)])
+
+  def test_data_row_mentioning_imsi(self):
+    """Only a row naming the imsi column should be read as a header."""
+    with open(self.path, 'w') as f:
+      f.write('Kimsi,001010000000001,5550001\nada,001010000000002,5550002\n')
+    records = [record for record, _ in self.read()]
+    self.assertEqual(records, [('Kimsi', '001010000000001', '5550001'),
+                               ('ada', '001010000000002', '5550002')])
+
+  def test_fixed_width(self):
+    write_subscribers(self.path, SUBSCRIBERS, fixed_width=True)
+    self.assertEqual(os.path.getsize(self.path), 3 * RECORD_SIZE)
+    with SubscriberFile(self.path, fixed_width=True) as subscriber_file:
+      self.assertEqual(len(subscriber_file), 3)
+      record, _ = next(subscriber_file.records(subscriber_file.offset(2)))
+      self.assertEqual(record, ('cy', '001010000000003', '5550003', ''))
+      with self.assertRaises(ValueError):
+        next(subscriber_file.records(5))
+
+  def test_fixed_width_overflow(self):
+    with self.assertRaises(ValueError):
+      write_subscribers(self.path, [('x' * 65, '1', '2')], fixed_width=True)
+
+  def test_empty_file(self):
+    write_subscribers(self.path, [])
+    self.assertEqual(self.read(), [])
+
+
+class ImportExportTest(unittest.TestCase):
+  """Testing import and export against the simulator."""
+
+  ADDRESS = 'tcp://127.0.0.1:7900'
+
+  def setUp(self):
+    self.simulator = NodeManagerSimulator(self.ADDRESS, subscriber_count=5)
+    self.simulator.start()
+    self.pool = SocketPool()
+    self.connection = SIPAuthServe(address=self.ADDRESS, pipelined=True,
+                                   socket_pool=self.pool, codec='json-utf8',
+                                   socket_timeout=2)
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'subscribers')
+
+  def tearDown(self):
+    self.connection.close()
+    self.pool.clear()
+    self.simulator.stop()
+    shutil.rmtree(self.directory)
+
+  def test_export_then_import(self):
+    """An exported table should import back into an emptied node."""
+    self.assertEqual(export_subscribers(self.connection, self.path,
+                                        fixed_width=True), 5)
+    exported = dict(self.simulator.subscribers)
+    self.simulator.subscribers.clear()
+    offsets = []
+    report = import_subscribers(self.connection, self.path, fixed_width=True,
+                                max_in_flight=2, progress=offsets.append)
+    self.assertEqual((report.succeeded, report.failed), (5, 0))
+    self.assertEqual(self.simulator.subscribers, exported)
+    self.assertEqual(offsets, sorted(offsets))
+    self.assertEqual(offsets[-1], 5 * RECORD_SIZE)
+
+  def test_import_resumes(self):
+    export_subscribers(self.connection, self.path)
+    self.simulator.subscribers.clear()
+    with SubscriberFile(self.path) as subscriber_file:
+      records = list(subscriber_file.records())
+    report = import_subscribers(self.connection, self.path,
+                                start=records[1][1])
+    self.assertEqual(report.succeeded, 3)
+    self.assertEqual(sorted(self.simulator.subscribers),
+                     sorted(record[1] for record, _ in records[2:]))
@@ -0,0 +1,79 @@
+"""openbts.tests.subscriber_index_tests
+tests for the subscriber index
+"""
+
+import json
+import unittest
+
+import mock
+
+from openbts.components import SIPAuthServe
+from openbts.subscribers import SubscriberIndex
+
+
+class SubscriberIndexTestCase(unittest.TestCase):
+  """Testing the subscribers.SubscriberIndex class."""
+
+  def setUp(self):
+    self.sipauthserve_connection = SIPAuthServe()
+    self.sipauthserve_connection.socket = mock.Mock()
+    self.sent_messages = []
+    def recv():
+      message = json.loads(
+          self.sipauthserve_connection.socket.send.call_args[0][0])
+      self.sent_messages.append(message)
+      if message['action'] == 'read':
+        return json.dumps({'code': 200, 'data': [
+          {'name': 'ada', 'imsi': 'IMSI310150000000001', 'msisdn': '4567',
+           'ki': ''},
+          {'name': 'jon', 'imsi': 'IMSI310150000000002', 'msisdn': '8901',
+           'ki': ''},
+        ]})
+      return json.dumps({'code': 200})
+    self.sipauthserve_connection.socket.recv.side_effect = recv
+    self.index = SubscriberIndex(self.sipauthserve_connection)
+    self.index.refresh()
+    del self.sent_messages[:]
+
+  def test_lookups(self):
+    """Subscribers should be found by IMSI, with or without prefix, and by
+    MSISDN.
+    """
+    self.assertEqual(len(self.index), 2)
+    self.assertIn('310150000000001', self.index)
+    self.assertIn('IMSI310150000000001', self.index)
+    self.assertNotIn('310150000000003', self.index)
+    self.assertEqual(self.index.msisdn_for_imsi(310150000000002), '8901')
+    self.assertEqual(self.index.imsi_for_msisdn(4567), '310150000000001')
+    self.assertEqual(self.index.get('310150000000001')['name'], 'ada')
+    self.assertIsNone(self.index.get('310150000000003'))
+
+  def test_sync_sends_only_the_diff(self):
+    """Unchanged subscribers should not be touched by a sync."""
+    desired = [
+      ('ada', '310150000000001', '4567'),
+      ('jon', '310150000000002', '1111'),
+      ('bo', '310150000000003', '2345'),
+    ]
+    delete_report, create_report = self.index.sync(desired)
+    actions = [(m['action'], (m.get('fields') or m['match'])['imsi'])
+               for m in self.sent_messages]
+    self.assertEqual(actions, [
+      ('delete', '310150000000002'),
+      ('create', '310150000000002'),
+      ('create', '310150000000003'),
+    ])
+    self.assertEqual(delete_report.succeeded, 1)
+    self.assertEqual(create_report.succeeded, 2)
+    self.assertEqual(self.index.imsi_for_msisdn('1111'), '310150000000002')
+    self.assertIsNone(self.index.imsi_for_msisdn('8901'))
+    self.assertEqual(len(self.index), 3)
+
+  def test_sync_deletes_extra_subscribers(self):
+    """Subscribers absent from the desired state should be deleted."""
+    self.index.sync([('ada', '310150000000001', '4567')])
+    self.assertEqual([m['action'] for m in self.sent_messages], ['delete'])
+    self.assertNotIn('310150000000002', self.index)
+    del self.sent_messages[:]
+    self.index.sync([], delete_extra=False)
+    self.assertEqual(self.sent_messages, [])
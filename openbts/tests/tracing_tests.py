@@ -0,0 +1,80 @@
+"""openbts.tests.tracing_tests
+tests for request tracing hooks
+"""
+
+import json
+import unittest
+
+import mock
+
+from openbts.components import OpenBTS
+from openbts.core import BaseComponent
+from openbts.exceptions import InvalidRequestError
+from openbts.tracing import PhaseHistogram, SpanHook
+
+
+class TracingHooksTestCase(unittest.TestCase):
+  """Testing the hooks kwarg of core.BaseComponent."""
+
+  def setUp(self):
+    self.traces = []
+    self.openbts_connection = OpenBTS(hooks=[self.traces.append])
+    self.openbts_connection.socket = mock.Mock()
+    self.openbts_connection.socket.recv.return_value = json.dumps({
+      'code': 200,
+      'data': {'noiseRSSI': -67}
+    })
+
+  def test_phases_are_timed(self):
+    """A request should be traced through each of its phases."""
+    self.openbts_connection.monitor()
+    trace, = self.traces
+    self.assertEqual(list(trace.phases),
+                     ['encode', 'send', 'wait', 'recv', 'parse'])
+    self.assertEqual(trace.command, 'monitor')
+    self.assertEqual(trace.attempts, 1)
+    self.assertIsNone(trace.error)
+    self.assertAlmostEqual(trace.duration, sum(trace.phases.values()))
+
+  def test_errors_are_traced(self):
+    """A failed request should be traced along with its error."""
+    self.openbts_connection.socket.recv.return_value = json.dumps({
+      'code': 404
+    })
+    with self.assertRaises(InvalidRequestError):
+      self.openbts_connection.read_config('nonexistent-key')
+    self.assertIsInstance(self.traces[0].error, InvalidRequestError)
+
+  def test_pipelined_requests_are_traced(self):
+    """Pipelined requests should be traced individually."""
+    socket = mock.Mock()
+    socket.recv_multipart.side_effect = lambda: [
+      socket.send_multipart.call_args[0][0][0], b'', json.dumps({'code': 200})]
+    pool = mock.Mock()
+    pool.checkout.return_value = socket
+    component = BaseComponent(address='tcp://127.0.0.1:7894',
+                              socket_pool=pool, pipelined=True,
+                              hooks=[self.traces.append])
+    component.get_version()
+    self.assertEqual(list(self.traces[0].phases),
+                     ['encode', 'send', 'wait', 'parse'])
+
+  def test_phase_histogram(self):
+    """The histogram hook should count every phase of every request."""
+    histogram = PhaseHistogram()
+    self.openbts_connection.hooks.append(histogram)
+    self.openbts_connection.monitor()
+    self.openbts_connection.monitor()
+    self.assertEqual(sum(histogram.counts['wait']), 2)
+    self.assertIsNotNone(histogram.mean('parse'))
+    self.assertIsNone(histogram.mean('backoff'))
+
+  def test_span_hook(self):
+    """The span hook should start and end a span with an event per phase."""
+    tracer = mock.Mock()
+    self.openbts_connection.hooks.append(SpanHook(tracer))
+    self.openbts_connection.monitor()
+    span = tracer.start_span.return_value
+    self.assertEqual(tracer.start_span.call_args[0], ('openbts monitor ',))
+    self.assertEqual(span.add_event.call_count, 5)
+    self.assertTrue(span.end.called)
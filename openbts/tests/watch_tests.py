@@ -0,0 +1,140 @@
+"""openbts.tests.watch_tests
+tests for watching config keys
+"""
+
+import threading
+import time
+import unittest
+
+from openbts.components import OpenBTS
+from openbts.core import SocketPool
+from openbts.simulator import NodeManagerSimulator
+from openbts.watch import ConfigWatcher
+
+
+class FakeClock(object):
+  """A clock that only moves when told to."""
+
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+
+class ConfigWatcherTest(unittest.TestCase):
+  """Testing change detection against the simulator."""
+
+  ADDRESS = 'tcp://127.0.0.1:7901'
+  KEYS = ['GSM.Radio.C0', 'Bounce.Code']
+
+  def setUp(self):
+    self.simulator = NodeManagerSimulator(self.ADDRESS)
+    self.simulator.start()
+    self.pool = SocketPool()
+    self.connection = OpenBTS(address=self.ADDRESS, socket_pool=self.pool,
+                              codec='json-utf8', socket_timeout=2)
+    self.clock = FakeClock()
+    self.changes = []
+
+  def tearDown(self):
+    self.connection.close()
+    self.pool.clear()
+    self.simulator.stop()
+
+  def watcher(self, keys=KEYS):
+    return ConfigWatcher(self.connection, keys, self.changes.append,
+                         interval=1, max_interval=4, clock=self.clock)
+
+  def test_reports_only_changes(self):
+    watcher = self.watcher()
+    self.assertEqual(watcher.poll_once(), {})
+    self.assertEqual(watcher.values()['GSM.Radio.C0'], '51')
+    self.clock.now += 1
+    watcher.poll_once()
+    self.assertEqual(self.changes, [])
+    self.simulator.config['GSM.Radio.C0'] = '60'
+    del self.simulator.config['Bounce.Code']
+    self.clock.now += 2
+    watcher.poll_once()
+    self.assertEqual(self.changes, [{'GSM.Radio.C0': ('51', '60'),
+                                     'Bounce.Code': ('101', None)}])
+
+  def test_stable_keys_back_off(self):
+    watcher = self.watcher()
+    for _ in range(4):
+      watcher.poll_once()
+      self.clock.now = watcher.next_poll()
+    self.assertEqual(watcher.interval_of('GSM.Radio.C0'), 4)
+    requests = self.simulator.requests
+    # nothing is due until the backed-off interval has passed
+    self.clock.now -= 1
+    watcher.poll_once()
+    self.assertEqual(self.simulator.requests, requests)
+    self.simulator.config['GSM.Radio.C0'] = '60'
+    self.clock.now += 1
+    watcher.poll_once()
+    self.assertEqual(watcher.interval_of('GSM.Radio.C0'), 1)
+    self.assertEqual(watcher.interval_of('Bounce.Code'), 4)
+
+  def test_keys_coalesced_into_one_read(self):
+    watcher = self.watcher()
+    watcher.poll_once()
+    self.assertEqual(self.simulator.requests, 1)
+
+  def test_falls_back_to_key_reads(self):
+    """Without full reads, the due keys are read one by one."""
+    self.simulator._handle_config_original = self.simulator._handle_config
+    def handle_config(message):
+      if message.get('key') == '':
+        return {'code': 501}
+      return self.simulator._handle_config_original(message)
+    self.simulator._handle_config = handle_config
+    watcher = self.watcher(self.KEYS + ['Missing.Key'])
+    watcher.poll_once()
+    self.assertFalse(watcher.full_reads)
+    self.assertEqual(dict(watcher.values().values),
+                     {'GSM.Radio.C0': '51', 'Bounce.Code': '101',
+                      'Missing.Key': None})
+
+  def test_watch_thread(self):
+    """BaseComponent.watch should call back from a background thread."""
+    changed = threading.Event()
+    watcher = self.connection.watch(['GSM.Radio.C0'],
+                                    lambda changes: changed.set(),
+                                    interval=0.01)
+    try:
+      # let the first poll record the baseline before changing the value
+      deadline = time.time() + 2
+      while 'GSM.Radio.C0' not in watcher.values() and time.time() < deadline:
+        time.sleep(0.005)
+      self.simulator.config['GSM.Radio.C0'] = '60'
+      self.assertTrue(changed.wait(2))
+    finally:
+      watcher.stop()
+
+  def test_watch_keeps_caller_socket_usable(self):
+    """The watcher should not poll on the caller's own socket."""
+    watcher = self.connection.watch(['GSM.Radio.C0'], self.changes.append,
+                                    interval=0.001)
+    try:
+      self.assertIsNot(watcher.component, self.connection)
+      for _ in range(100):
+        self.assertEqual(self.connection.get_version().code, 200)
+    finally:
+      watcher.stop()
+    self.assertEqual(watcher.errors, 0)
+
+  def test_callback_errors_are_recorded(self):
+    """A failing callback should not stop the watcher."""
+    def callback(changes):
+      raise RuntimeError('callback failed')
+    watcher = ConfigWatcher(self.connection, self.KEYS, callback, interval=1,
+                            clock=self.clock)
+    watcher.poll_once()
+    self.simulator.config['GSM.Radio.C0'] = '60'
+    self.clock.now += 1
+    watcher.poll_once()
+    self.assertEqual(watcher.errors, 1)
+    self.assertIsInstance(watcher.last_error, RuntimeError)
+    self.assertEqual(watcher.values()['GSM.Radio.C0'], '60')
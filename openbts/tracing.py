@@ -0,0 +1,121 @@
+"""openbts.tracing
+per-phase timing of NodeManager requests
+"""
+
+import bisect
+import collections
+import threading
+import time
+
+
+# the phases of a request, in the order they happen
+PHASES = ('encode', 'send', 'wait', 'recv', 'parse', 'backoff')
+
+
+class RequestTrace(object):
+  """Timings of one request, handed to every hook once the request is done.
+
+  Phases that happen more than once (e.g. send and wait when a request is
+  retried) accumulate.  A pipelined request has no separate recv phase, its
+  reply is read as part of waiting.
+
+  Attributes:
+    message: the message dict that was sent
+    start: unix time the request started
+    phases: ordered dict mapping phase names to seconds spent in them
+    error: the exception raised for the request, if any
+    attempts: number of times the request was sent
+  """
+
+  __slots__ = ('message', 'start', 'phases', 'error', 'attempts', '_last')
+
+  def __init__(self, message):
+    self.message = message
+    self.start = self._last = time.time()
+    self.phases = collections.OrderedDict()
+    self.error = None
+    self.attempts = 0
+
+  def __repr__(self):
+    return 'RequestTrace of %s %s (%.6fs)' % (self.command, self.action,
+                                              self.duration)
+
+  @property
+  def command(self):
+    return self.message.get('command', '')
+
+  @property
+  def action(self):
+    return self.message.get('action', '')
+
+  @property
+  def duration(self):
+    """Seconds from the start of the request to the last marked phase."""
+    return self._last - self.start
+
+  def mark(self, phase):
+    """Ends a phase, attributing the time since the previous mark to it."""
+    now = time.time()
+    self.phases[phase] = self.phases.get(phase, 0) + now - self._last
+    self._last = now
+
+
+class PhaseHistogram(object):
+  """A hook keeping an in-process latency histogram for every phase.
+
+  Args:
+    buckets: upper bounds in seconds of the histogram buckets
+  """
+
+  def __init__(self, buckets=(0.0001, 0.001, 0.01, 0.1, 1, 10)):
+    self.buckets = tuple(buckets)
+    self._lock = threading.Lock()
+    # phase -> per-bucket counts, with a final +Inf bucket
+    self.counts = collections.defaultdict(
+      lambda: [0] * (len(self.buckets) + 1))
+    self.sums = collections.defaultdict(float)
+
+  def __call__(self, trace):
+    with self._lock:
+      for phase, seconds in trace.phases.items():
+        self.counts[phase][bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sums[phase] += seconds
+
+  def mean(self, phase):
+    """Gets the mean seconds spent in a phase, or None if never seen."""
+    with self._lock:
+      count = sum(self.counts[phase]) if phase in self.counts else 0
+      return self.sums[phase] / count if count else None
+
+
+class SpanHook(object):
+  """A hook turning traces into OpenTelemetry-style spans.
+
+  Works with any tracer offering the OpenTelemetry API (start_span with
+  start_time and attributes, span.add_event, span.end with end_time); the
+  package itself does not depend on OpenTelemetry.  Each phase becomes an
+  event at the time it ended.
+
+  Args:
+    tracer: e.g. opentelemetry.trace.get_tracer(__name__)
+  """
+
+  def __init__(self, tracer):
+    self.tracer = tracer
+
+  def __call__(self, trace):
+    start_ns = int(trace.start * 1e9)
+    span = self.tracer.start_span(
+      'openbts %s %s' % (trace.command, trace.action), start_time=start_ns,
+      attributes={'openbts.command': trace.command,
+                  'openbts.action': trace.action,
+                  'openbts.attempts': trace.attempts})
+    elapsed = 0
+    for phase, seconds in trace.phases.items():
+      elapsed += seconds
+      span.add_event(phase, {'duration_s': seconds},
+                     timestamp=start_ns + int(elapsed * 1e9))
+    if trace.error is not None:
+      span.set_attribute('error', True)
+      span.set_attribute('error.type', type(trace.error).__name__)
+    span.end(end_time=start_ns + int(trace.duration * 1e9))
@@ -0,0 +1,196 @@
+"""openbts.watch
+change detection for config keys
+"""
+
+import threading
+import time
+
+from openbts.exceptions import (InvalidRequestError, InvalidResponseError,
+                                OpenBTSError)
+from openbts.results import ConfigValue
+from openbts.snapshot import ConfigSnapshot
+
+
+class ConfigWatcher(object):
+  """Polls config keys in a background thread and reports changes.
+
+  Every key has its own polling interval.  A key that is read unchanged has
+  its interval multiplied by backoff, up to max_interval, and a key that
+  changed goes back to polling every interval.  So stable config costs
+  fewer and fewer requests, while a key that changes is watched closely.
+
+  The keys that are due at once are read together.  Where NodeManager
+  supports it, that is a single full config read (see
+  BaseComponent.snapshot).  That read also refreshes keys that are not due
+  yet, without changing their schedule.  Otherwise the due keys are read
+  through _pipeline, concurrently on a pipelined component.  The values are
+  diffed locally against the previous ones.  The callback is only invoked
+  when something changed, with a dict mapping each changed key to an
+  (old value, new value) tuple.  A key that disappears changes to None.  The
+  first read of each key only records its value.
+
+  Polls bypass any config cache.  The watcher shares the component's socket,
+  so give it a component of its own or a thread-safe one (see BaseComponent);
+  BaseComponent.watch takes care of that.  Errors raised by the callback are
+  recorded like failed polls rather than stopping the thread.
+
+    watcher = openbts_connection.watch(['GSM.Radio.C0'], on_change)
+    ...
+    watcher.stop()
+
+  Args:
+    component: the component to poll
+    keys: iterable of config keys to watch
+    callback: callable invoked with a dict of changes
+    interval: shortest seconds between polls of a key
+    max_interval: longest seconds between polls of a stable key
+    backoff: factor applied to a key's interval after each unchanged read
+    clock: callable returning the current time in seconds
+    close_component: if True, close the component when the watcher stops
+
+  Attributes:
+    errors: number of polls and callbacks that failed
+    last_error: the exception raised by the most recent failed poll or
+        callback
+  """
+
+  def __init__(self, component, keys, callback, interval=5.0,
+               max_interval=60.0, backoff=2.0, clock=time.time,
+               close_component=False):
+    self.component = component
+    self.keys = list(keys)
+    self.callback = callback
+    self.interval = interval
+    self.max_interval = max_interval
+    self.backoff = backoff
+    self.clock = clock
+    self.close_component = close_component
+    self.errors = 0
+    self.last_error = None
+    self.full_reads = True
+    self._values = {}
+    self._intervals = dict((key, interval) for key in self.keys)
+    # every key is due straight away, to record its initial value
+    self._due = dict((key, 0) for key in self.keys)
+    self._stop = threading.Event()
+    self._thread = None
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.stop()
+
+  def start(self):
+    """Starts polling in a daemon thread."""
+    if self._thread is not None:
+      return
+    self._stop.clear()
+    self._thread = threading.Thread(target=self._run)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def stop(self):
+    """Stops polling and waits for the thread to finish."""
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+    if self.close_component:
+      self.component.close()
+
+  def values(self):
+    """Gets the last value read for every key."""
+    return ConfigSnapshot(self._values, self.component.address)
+
+  def interval_of(self, key):
+    """Gets the current polling interval of a key, in seconds."""
+    return self._intervals[key]
+
+  def next_poll(self):
+    """Gets the time at which the next key is due."""
+    return min(self._due.values()) if self._due else None
+
+  def poll_once(self):
+    """Reads the keys that are due and reports any changes.
+
+    Returns:
+      dict of changes, as passed to the callback
+    """
+    now = self.clock()
+    due = [key for key in self.keys if self._due[key] <= now]
+    if not due:
+      return {}
+    try:
+      current = self._read(due)
+    except OpenBTSError as e:
+      self.errors += 1
+      self.last_error = e
+      for key in due:
+        self._due[key] = now + self._intervals[key]
+      return {}
+    seen = dict((key, self._values[key]) for key in current
+                if key in self._values)
+    changes = ConfigSnapshot(seen).diff(
+      dict((key, current[key]) for key in seen))
+    for key in current:
+      if key in changes:
+        self._intervals[key] = self.interval
+      elif key in due and key in seen:
+        self._intervals[key] = min(self._intervals[key] * self.backoff,
+                                   self.max_interval)
+      if key in due or key in changes:
+        self._due[key] = now + self._intervals[key]
+    # keys whose read failed are retried at their usual interval
+    for key in due:
+      if key not in current:
+        self._due[key] = now + self._intervals[key]
+    self._values.update(current)
+    if changes:
+      try:
+        self.callback(changes)
+      except Exception as e:
+        self.errors += 1
+        self.last_error = e
+    return changes
+
+  def _read(self, due):
+    """Reads config values, coalescing them into as few requests as possible.
+
+    Returns:
+      dict mapping keys to values (None for keys that do not exist); keys
+      whose read failed otherwise are left out
+    """
+    if self.full_reads and len(due) > 1:
+      try:
+        snapshot = self.component.snapshot()
+      except (InvalidRequestError, InvalidResponseError):
+        # NodeManager does not support full reads, stop trying them
+        self.full_reads = False
+      else:
+        return dict((key, snapshot.get(key)) for key in self.keys)
+    messages = (self.component._read_config_message(key) for key in due)
+    values = {}
+    error = None
+    for index, result in self.component._pipeline(messages):
+      key = due[index]
+      if isinstance(result, InvalidRequestError):
+        values[key] = None
+      elif isinstance(result, Exception):
+        error = result
+      else:
+        values[key] = ConfigValue.from_response(key, result).value
+    if error is not None:
+      self.errors += 1
+      self.last_error = error
+    return values
+
+  def _run(self):
+    """Polls keys as they fall due until stopped."""
+    while not self._stop.is_set():
+      self.poll_once()
+      next_poll = self.next_poll()
+      if next_poll is None:
+        next_poll = self.clock() + self.interval
+      self._stop.wait(max(0, next_poll - self.clock()))